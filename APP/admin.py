@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categoria, Receita, Despesa, PerfilEmpresa, ContaBancaria, DeclaracaoAnual, Fornecedor, DASN_SIMEI
+from .models import Categoria, Receita, Despesa, PerfilEmpresa, ContaBancaria, DeclaracaoAnual, Fornecedor, DASN_SIMEI, ResumoMensal, ExportacaoJob
 
 # Para mostrar as contas bancárias dentro do perfil da empresa
 class ContaBancariaInline(admin.TabularInline):
@@ -201,3 +201,32 @@ class DASN_SIMEIAdmin(admin.ModelAdmin):
         return "⏳ Pendente"
     status_display.short_description = 'Status'
     status_display.admin_order_field = 'declarada'
+
+
+# ==================== RESUMOS MENSAIS ====================
+@admin.register(ResumoMensal)
+class ResumoMensalAdmin(admin.ModelAdmin):
+    """Somente leitura: os resumos são mantidos pelos signals e pelo comando rebuild_rollups"""
+    list_display = ('ano', 'mes', 'tipo', 'categoria', 'fornecedor', 'total', 'quantidade', 'usuario')
+    list_filter = ('tipo', 'ano', 'usuario')
+    ordering = ('-ano', '-mes')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ExportacaoJob)
+class ExportacaoJobAdmin(admin.ModelAdmin):
+    """Somente leitura: os jobs são criados pela tela de relatórios"""
+    list_display = ('id', 'formato', 'status', 'processados', 'total', 'data_criacao', 'data_conclusao', 'usuario')
+    list_filter = ('formato', 'status', 'usuario')
+    ordering = ('-data_criacao',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,154 @@
+"""
+Feed incremental de alterações (/api/v1/changes/)
+
+Devolve categorias, fornecedores, receitas e despesas alterados desde uma
+marca d'água (data_atualizacao) e as exclusões registradas em
+RegistroExclusao, numa ordem total (data, fonte, id). O cursor aponta para
+depois do último item entregue, então cada sincronização custa o volume de
+alterações, não o tamanho das tabelas: cada fonte é lida pelo índice
+(usuario, data_atualizacao, id) a partir do cursor.
+
+Alterações feitas por UPDATE em lote que não passam pelo save() (por
+exemplo o SET_NULL de lançamentos ao excluir uma categoria ou fornecedor)
+não mudam data_atualizacao; o cliente recebe a exclusão que as causou.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Categoria, Despesa, Fornecedor, Receita, RegistroExclusao
+from .serializers import CategoriaSerializer, DespesaSerializer, FornecedorSerializer, ReceitaSerializer
+
+
+class Fonte:
+    """Uma tabela do feed: como filtrar por usuário, o campo de data e o serializer"""
+
+    def __init__(self, nome, modelo, campo_data, serializer=None, relacionados=()):
+        self.nome = nome
+        self.modelo = modelo
+        self.campo_data = campo_data
+        self.serializer = serializer
+        self.relacionados = relacionados
+
+    def queryset(self, usuario):
+        if self.modelo is Categoria:
+            filtro = Q(usuario=usuario) | Q(is_padrao=True)
+        elif self.modelo is RegistroExclusao:
+            filtro = Q(usuario=usuario) | Q(usuario__isnull=True)
+        else:
+            filtro = Q(usuario=usuario)
+        return self.modelo.objects.filter(filtro).select_related(*self.relacionados)
+
+
+# A posição na tupla é o desempate entre fontes com a mesma data
+FONTES = (
+    Fonte('categoria', Categoria, 'data_atualizacao', CategoriaSerializer, ('usuario',)),
+    Fonte('fornecedor', Fornecedor, 'data_atualizacao', FornecedorSerializer, ('usuario',)),
+    Fonte('receita', Receita, 'data_atualizacao', ReceitaSerializer, ('usuario', 'categoria', 'fornecedor')),
+    Fonte('despesa', Despesa, 'data_atualizacao', DespesaSerializer, ('usuario', 'categoria', 'fornecedor')),
+    Fonte('exclusao', RegistroExclusao, 'data_exclusao'),
+)
+
+
+# Datas no formato configurado para a API (REST_FRAMEWORK['DATETIME_FORMAT'])
+CAMPO_DATA = serializers.DateTimeField()
+
+
+def codificar_posicao(data, fonte, pk):
+    """Cursor opaco (base64) que aponta para depois de (data, fonte, id)"""
+    texto = json.dumps([data.isoformat(), fonte, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_posicao(cursor):
+    """Converte o cursor em (data, fonte, id); ValueError se inválido"""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data, fonte, pk = json.loads(texto)
+        posicao = (datetime.datetime.fromisoformat(data), int(fonte), int(pk))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as erro:
+        raise ValueError('Cursor inválido') from erro
+    if timezone.is_naive(posicao[0]) or not -1 <= posicao[1] < len(FONTES):
+        raise ValueError('Cursor inválido')
+    return posicao
+
+
+def posicao_desde(texto):
+    """
+    Posição inicial para `since` (data/hora ISO 8601, inclusiva). Sem fuso,
+    vale o do projeto. ValueError se inválida.
+    """
+    data = datetime.datetime.fromisoformat(texto)
+    if timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    # Fonte -1: inclui tudo o que tem exatamente essa data
+    return data, -1, 0
+
+
+def filtro_apos(posicao, indice, campo):
+    """Q com os registros da fonte `indice` que vêm depois de `posicao`"""
+    data, fonte, pk = posicao
+    if indice > fonte:
+        return Q(**{f'{campo}__gte': data})
+    if indice == fonte:
+        return Q(**{f'{campo}__gt': data}) | Q(**{campo: data, 'id__gt': pk})
+    return Q(**{f'{campo}__gt': data})
+
+
+def pagina_alteracoes(usuario, posicao, tamanho):
+    """
+    Até `tamanho` alterações depois de `posicao` (None: desde o início).
+    Retorna (itens, mais), com itens = [(data, indice_fonte, objeto)].
+
+    Só entram alterações mais antigas que CHANGES_ATRASO_SEGUNDOS: uma
+    transação ainda aberta pode gravar uma data anterior à de outra já
+    confirmada, e o atraso evita que o cursor passe por cima dela.
+    """
+    limite = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'CHANGES_ATRASO_SEGUNDOS', 5))
+    candidatos = []
+    for indice, fonte in enumerate(FONTES):
+        queryset = fonte.queryset(usuario).filter(**{f'{fonte.campo_data}__lte': limite})
+        if posicao is not None:
+            queryset = queryset.filter(filtro_apos(posicao, indice, fonte.campo_data))
+        for objeto in queryset.order_by(fonte.campo_data, 'id')[:tamanho + 1]:
+            candidatos.append((getattr(objeto, fonte.campo_data), indice, objeto))
+    candidatos.sort(key=lambda item: (item[0], item[1], item[2].pk))
+    return candidatos[:tamanho], len(candidatos) > tamanho
+
+
+def serializar_alteracoes(itens, context):
+    """Envelope de cada alteração, com os dados no formato dos endpoints de cada modelo"""
+    # Serializa cada fonte de uma vez (many=True), preservando a ordem do feed
+    dados = {}
+    for indice, fonte in enumerate(FONTES):
+        objetos = [objeto for _, i, objeto in itens if i == indice]
+        if objetos and fonte.serializer:
+            for objeto, serializado in zip(objetos, fonte.serializer(objetos, many=True, context=context).data):
+                dados[(indice, objeto.pk)] = serializado
+
+    resultado = []
+    for data, indice, objeto in itens:
+        fonte = FONTES[indice]
+        if fonte.modelo is RegistroExclusao:
+            resultado.append({
+                'modelo': objeto.modelo,
+                'operacao': 'delete',
+                'id': objeto.objeto_id,
+                'data_atualizacao': CAMPO_DATA.to_representation(data),
+                'dados': None,
+            })
+        else:
+            resultado.append({
+                'modelo': fonte.nome,
+                'operacao': 'upsert',
+                'id': objeto.pk,
+                'data_atualizacao': CAMPO_DATA.to_representation(data),
+                'dados': dados[(indice, objeto.pk)],
+            })
+    return resultado
@@ -11,9 +11,11 @@ from .api_views import (
     FornecedorViewSet,
     ReceitaViewSet,
     DespesaViewSet,
+    LancamentoViewSet,
     DeclaracaoAnualViewSet,
     PreferenciaUsuarioViewSet,
-    RelatorioViewSet
+    RelatorioViewSet,
+    AlteracoesViewSet
 )
 
 # Cria o roteador da API
@@ -26,9 +28,11 @@ router.register(r'categorias', CategoriaViewSet, basename='categoria')
 router.register(r'fornecedores', FornecedorViewSet, basename='fornecedor')
 router.register(r'receitas', ReceitaViewSet, basename='receita')
 router.register(r'despesas', DespesaViewSet, basename='despesa')
+router.register(r'lancamentos', LancamentoViewSet, basename='lancamento')
 router.register(r'declaracoes-anuais', DeclaracaoAnualViewSet, basename='declaracao-anual')
 router.register(r'preferencias', PreferenciaUsuarioViewSet, basename='preferencia')
 router.register(r'relatorios', RelatorioViewSet, basename='relatorio')
+router.register(r'changes', AlteracoesViewSet, basename='changes')
 
 # URLs da API
 urlpatterns = [
@@ -4,13 +4,16 @@ Endpoints completos para integração externa
 """
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Sum, Count, Q
+from django.http import FileResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 from .models import (
     PerfilEmpresa,
@@ -34,6 +37,76 @@ from .serializers import (
     RelatorioMensalSerializer,
     EstatisticasCategoriaSerializer
 )
+from .alteracoes import (
+    codificar_posicao,
+    decodificar_posicao,
+    pagina_alteracoes,
+    posicao_desde,
+    serializar_alteracoes,
+)
+from .busca import BuscaFornecedorFilter, BuscaTextualFilter, filtrar_busca
+from .cache_exportacoes import obter_ou_gerar
+from .condicional import RespostaCondicionalMixin
+from .exportacao import FORMATOS_COLUNARES, escrever_colunar, querysets_exportacao
+from .lancamentos import LancamentosUnificados, chave_lancamento
+from .listagem_rapida import ListagemRapidaMixin, modo_rapido
+from .lotes import LoteMixin
+from .paginacao import PaginacaoLancamentos
+from .periodos import filtro_periodo, intervalo_datas, intervalo_mes
+from .pivot import DIMENSOES, DIMENSOES_PADRAO, MEDIDAS, MEDIDAS_PADRAO, ler_lista, tabela_dinamica
+from .resumos import totais_mensais
+
+
+# Relacionados lidos pelos serializers de Receita/Despesa
+RELACIONADOS_LANCAMENTO = ('categoria', 'fornecedor', 'usuario')
+
+
+def filtro_periodo_da_requisicao(request):
+    """
+    Filtro data__gte/data__lt a partir de data_inicio/data_fim (fim inclusivo)
+    da query string. Datas inválidas resultam em HTTP 400.
+    """
+    try:
+        return filtro_periodo(*intervalo_datas(
+            request.query_params.get('data_inicio'),
+            request.query_params.get('data_fim'),
+        ))
+    except ValueError:
+        raise ValidationError({'error': 'data_inicio e data_fim devem estar no formato AAAA-MM-DD'})
+
+
+def querysets_da_requisicao(request):
+    """
+    {tipo: queryset} de receitas e despesas do usuário com os filtros da query
+    string: tipo (R ou D), categoria, fornecedor, conta, data_inicio,
+    data_fim, valor_min, valor_max e search. Valores inválidos resultam em HTTP 400.
+    """
+    params = request.query_params
+    tipo = params.get('tipo', '')
+    if tipo not in ('', 'R', 'D'):
+        raise ValidationError({'error': 'tipo deve ser R ou D'})
+
+    filtros = filtro_periodo_da_requisicao(request)
+    for parametro, campo in (('categoria', 'categoria_id'), ('fornecedor', 'fornecedor_id'),
+                             ('conta', 'conta_bancaria_id')):
+        if params.get(parametro):
+            if not params[parametro].isdigit():
+                raise ValidationError({'error': f'{parametro} deve ser um id numérico'})
+            filtros[campo] = int(params[parametro])
+    for parametro, lookup in (('valor_min', 'valor__gte'), ('valor_max', 'valor__lte')):
+        if params.get(parametro):
+            try:
+                filtros[lookup] = Decimal(params[parametro])
+            except InvalidOperation:
+                raise ValidationError({'error': f'{parametro} deve ser um número'})
+
+    querysets = {}
+    for codigo, modelo in (('R', Receita), ('D', Despesa)):
+        if tipo and tipo != codigo:
+            continue
+        queryset = modelo.objects.filter(usuario=request.user, **filtros)
+        querysets[codigo] = filtrar_busca(queryset, params.get('search', ''))
+    return querysets
 
 
 class PerfilEmpresaViewSet(viewsets.ModelViewSet):
@@ -87,7 +160,7 @@ class ContaBancariaViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     API endpoint para gerenciar Categorias
     
@@ -114,7 +187,7 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         """Filtra categorias do usuário logado"""
         return Categoria.objects.filter(
             Q(usuario=self.request.user) | Q(is_padrao=True)
-        )
+        ).select_related('usuario')
     
     @action(detail=False, methods=['get'])
     def receitas(self, request):
@@ -149,7 +222,7 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class FornecedorViewSet(viewsets.ModelViewSet):
+class FornecedorViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     API endpoint para gerenciar Fornecedores
     
@@ -166,7 +239,7 @@ class FornecedorViewSet(viewsets.ModelViewSet):
     queryset = Fornecedor.objects.all()
     serializer_class = FornecedorSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BuscaFornecedorFilter, filters.OrderingFilter]
     filterset_fields = ['tipo', 'ativo']
     search_fields = ['nome', 'nome_fantasia', 'cpf_cnpj', 'telefone', 'email']
     ordering_fields = ['nome', 'data_cadastro']
@@ -174,7 +247,7 @@ class FornecedorViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filtra fornecedores do usuário logado"""
-        return Fornecedor.objects.filter(usuario=self.request.user)
+        return Fornecedor.objects.filter(usuario=self.request.user).select_related('usuario')
     
     @action(detail=False, methods=['get'])
     def ativos(self, request):
@@ -198,16 +271,18 @@ class FornecedorViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ReceitaViewSet(viewsets.ModelViewSet):
+class ReceitaViewSet(ListagemRapidaMixin, LoteMixin, RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     API endpoint para gerenciar Receitas
     
-    list: Lista todas as receitas
+    list: Lista todas as receitas (com ?cursor= usa paginação por cursor)
+          ?mode=fast devolve os mesmos campos sem passar pelo serializer
     create: Cria uma nova receita
     retrieve: Retorna uma receita específica
     update: Atualiza uma receita
     partial_update: Atualiza parcialmente uma receita
     destroy: Remove uma receita
+    lote: Inclui (POST), edita (PATCH) ou exclui (DELETE) várias receitas de uma vez
     periodo: Filtra receitas por período
     total: Retorna o total de receitas
     por_categoria: Agrupa receitas por categoria
@@ -215,15 +290,17 @@ class ReceitaViewSet(viewsets.ModelViewSet):
     queryset = Receita.objects.all()
     serializer_class = ReceitaSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = PaginacaoLancamentos
+    filter_backends = [DjangoFilterBackend, BuscaTextualFilter, filters.OrderingFilter]
     filterset_fields = ['categoria', 'fornecedor', 'data']
-    search_fields = ['descricao']
+    search_fields = ['descricao', 'observacoes']
     ordering_fields = ['data', 'valor', 'data_cadastro']
     ordering = ['-data', '-data_cadastro']
     
     def get_queryset(self):
         """Filtra receitas do usuário logado"""
-        return Receita.objects.filter(usuario=self.request.user)
+        # Relacionados lidos pelo serializer (nomes e username) vêm no mesmo SELECT
+        return Receita.objects.filter(usuario=self.request.user).select_related(*RELACIONADOS_LANCAMENTO)
     
     def perform_create(self, serializer):
         """Ao criar, associa ao usuário logado"""
@@ -233,17 +310,11 @@ class ReceitaViewSet(viewsets.ModelViewSet):
     def periodo(self, request):
         """
         Filtra receitas por período
-        Query params: data_inicio, data_fim
+        Query params: data_inicio, data_fim, mode=fast (opcional)
         """
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
-        
-        queryset = self.get_queryset()
-        
-        if data_inicio:
-            queryset = queryset.filter(data__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data__lte=data_fim)
+        queryset = self.get_queryset().filter(**filtro_periodo_da_requisicao(request))
+        if modo_rapido(request):
+            return self.resposta_rapida(queryset, paginar=False)
         
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
@@ -257,18 +328,13 @@ class ReceitaViewSet(viewsets.ModelViewSet):
         data_inicio = request.query_params.get('data_inicio')
         data_fim = request.query_params.get('data_fim')
         
-        queryset = self.get_queryset()
+        queryset = self.get_queryset().filter(**filtro_periodo_da_requisicao(request))
         
-        if data_inicio:
-            queryset = queryset.filter(data__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data__lte=data_fim)
-        
-        total = queryset.aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
+        resumo = queryset.aggregate(total=Sum('valor'), quantidade=Count('id'))
         
         return Response({
-            'total': total,
-            'quantidade': queryset.count(),
+            'total': resumo['total'] or Decimal('0.00'),
+            'quantidade': resumo['quantidade'],
             'periodo': {
                 'data_inicio': data_inicio,
                 'data_fim': data_fim
@@ -278,15 +344,7 @@ class ReceitaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def por_categoria(self, request):
         """Agrupa receitas por categoria"""
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
-        
-        queryset = self.get_queryset()
-        
-        if data_inicio:
-            queryset = queryset.filter(data__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data__lte=data_fim)
+        queryset = self.get_queryset().filter(**filtro_periodo_da_requisicao(request))
         
         categorias = queryset.values(
             'categoria__id', 'categoria__nome', 'categoria__tipo'
@@ -298,16 +356,18 @@ class ReceitaViewSet(viewsets.ModelViewSet):
         return Response(categorias)
 
 
-class DespesaViewSet(viewsets.ModelViewSet):
+class DespesaViewSet(ListagemRapidaMixin, LoteMixin, RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     API endpoint para gerenciar Despesas
     
-    list: Lista todas as despesas
+    list: Lista todas as despesas (com ?cursor= usa paginação por cursor)
+          ?mode=fast devolve os mesmos campos sem passar pelo serializer
     create: Cria uma nova despesa
     retrieve: Retorna uma despesa específica
     update: Atualiza uma despesa
     partial_update: Atualiza parcialmente uma despesa
     destroy: Remove uma despesa
+    lote: Inclui (POST), edita (PATCH) ou exclui (DELETE) várias despesas de uma vez
     periodo: Filtra despesas por período
     total: Retorna o total de despesas
     por_categoria: Agrupa despesas por categoria
@@ -315,15 +375,17 @@ class DespesaViewSet(viewsets.ModelViewSet):
     queryset = Despesa.objects.all()
     serializer_class = DespesaSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = PaginacaoLancamentos
+    filter_backends = [DjangoFilterBackend, BuscaTextualFilter, filters.OrderingFilter]
     filterset_fields = ['categoria', 'fornecedor', 'data']
-    search_fields = ['descricao']
+    search_fields = ['descricao', 'observacoes']
     ordering_fields = ['data', 'valor', 'data_cadastro']
     ordering = ['-data', '-data_cadastro']
     
     def get_queryset(self):
         """Filtra despesas do usuário logado"""
-        return Despesa.objects.filter(usuario=self.request.user)
+        # Relacionados lidos pelo serializer (nomes e username) vêm no mesmo SELECT
+        return Despesa.objects.filter(usuario=self.request.user).select_related(*RELACIONADOS_LANCAMENTO)
     
     def perform_create(self, serializer):
         """Ao criar, associa ao usuário logado"""
@@ -333,17 +395,11 @@ class DespesaViewSet(viewsets.ModelViewSet):
     def periodo(self, request):
         """
         Filtra despesas por período
-        Query params: data_inicio, data_fim
+        Query params: data_inicio, data_fim, mode=fast (opcional)
         """
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
-        
-        queryset = self.get_queryset()
-        
-        if data_inicio:
-            queryset = queryset.filter(data__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data__lte=data_fim)
+        queryset = self.get_queryset().filter(**filtro_periodo_da_requisicao(request))
+        if modo_rapido(request):
+            return self.resposta_rapida(queryset, paginar=False)
         
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
@@ -357,18 +413,13 @@ class DespesaViewSet(viewsets.ModelViewSet):
         data_inicio = request.query_params.get('data_inicio')
         data_fim = request.query_params.get('data_fim')
         
-        queryset = self.get_queryset()
+        queryset = self.get_queryset().filter(**filtro_periodo_da_requisicao(request))
         
-        if data_inicio:
-            queryset = queryset.filter(data__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data__lte=data_fim)
-        
-        total = queryset.aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
+        resumo = queryset.aggregate(total=Sum('valor'), quantidade=Count('id'))
         
         return Response({
-            'total': total,
-            'quantidade': queryset.count(),
+            'total': resumo['total'] or Decimal('0.00'),
+            'quantidade': resumo['quantidade'],
             'periodo': {
                 'data_inicio': data_inicio,
                 'data_fim': data_fim
@@ -378,15 +429,7 @@ class DespesaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def por_categoria(self, request):
         """Agrupa despesas por categoria"""
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
-        
-        queryset = self.get_queryset()
-        
-        if data_inicio:
-            queryset = queryset.filter(data__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data__lte=data_fim)
+        queryset = self.get_queryset().filter(**filtro_periodo_da_requisicao(request))
         
         categorias = queryset.values(
             'categoria__id', 'categoria__nome', 'categoria__tipo'
@@ -398,6 +441,95 @@ class DespesaViewSet(viewsets.ModelViewSet):
         return Response(categorias)
 
 
+class LancamentoViewSet(RespostaCondicionalMixin, viewsets.ViewSet):
+    """
+    API endpoint somente leitura com receitas e despesas em uma única
+    listagem cronológica (mais recentes primeiro)
+    
+    list: Lançamentos das duas tabelas, unidos no banco (UNION ALL), cada um
+          com `tipo` (R ou D) e `saldo_acumulado`
+    Query params: tipo (R ou D), categoria, fornecedor, conta, data_inicio,
+                  data_fim, valor_min, valor_max, search; cursor (devolvido
+                  em `next`) e page_size
+    
+    A paginação é sempre por cursor. `totais` traz as receitas, despesas e o
+    saldo da página, o saldo_anterior (lançamentos filtrados mais antigos que
+    a página) e o saldo_acumulado ao fim da página, como em um extrato.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    TAMANHO_PADRAO = 25
+    TAMANHO_MAXIMO = 500
+    
+    SERIALIZER_POR_TIPO = {
+        'R': ReceitaSerializer,
+        'D': DespesaSerializer,
+    }
+    
+    def list(self, request):
+        try:
+            tamanho = int(request.query_params.get('page_size', self.TAMANHO_PADRAO))
+        except ValueError:
+            return Response(
+                {'error': 'page_size deve ser um número inteiro'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tamanho = max(1, min(tamanho, self.TAMANHO_MAXIMO))
+        
+        lancamentos = LancamentosUnificados(
+            querysets_da_requisicao(request), select_related=RELACIONADOS_LANCAMENTO
+        )
+        try:
+            pagina, proximo_cursor = lancamentos.pagina_apos(request.query_params.get('cursor'), tamanho)
+        except ValueError:
+            raise NotFound('Cursor inválido.')
+        
+        # Saldo de tudo o que vem depois da página; o acumulado sobe a partir dele
+        saldo_anterior = lancamentos.saldo_apos(chave_lancamento(pagina[-1])) if pagina else Decimal('0.00')
+        
+        # Um serializer (many=True) por tabela, remontado na ordem da página
+        tipos = ['R' if isinstance(lancamento, Receita) else 'D' for lancamento in pagina]
+        dados_por_tipo = {}
+        for tipo, serializer_class in self.SERIALIZER_POR_TIPO.items():
+            instancias = [lancamento for lancamento, t in zip(pagina, tipos) if t == tipo]
+            if instancias:
+                dados = serializer_class(instancias, many=True, context={'request': request}).data
+                dados_por_tipo[tipo] = iter(dados)
+        
+        # Acumulado em ordem cronológica: do fim da página para o início
+        saldos = [None] * len(pagina)
+        total_receitas = total_despesas = Decimal('0.00')
+        for indice in reversed(range(len(pagina))):
+            if tipos[indice] == 'R':
+                total_receitas += pagina[indice].valor
+            else:
+                total_despesas += pagina[indice].valor
+            saldos[indice] = saldo_anterior + total_receitas - total_despesas
+        
+        resultados = []
+        for tipo, saldo in zip(tipos, saldos):
+            item = next(dados_por_tipo[tipo])
+            item['tipo'] = tipo
+            item['saldo_acumulado'] = saldo
+            resultados.append(item)
+        
+        proximo = None
+        if proximo_cursor:
+            proximo = replace_query_param(request.build_absolute_uri(), 'cursor', proximo_cursor)
+        
+        return Response({
+            'next': proximo,
+            'totais': {
+                'receitas': total_receitas,
+                'despesas': total_despesas,
+                'saldo': total_receitas - total_despesas,
+                'saldo_anterior': saldo_anterior,
+                'saldo_acumulado': saldo_anterior + total_receitas - total_despesas,
+            },
+            'results': resultados,
+        })
+
+
 class DeclaracaoAnualViewSet(viewsets.ModelViewSet):
     """
     API endpoint para gerenciar Declarações Anuais
@@ -433,7 +565,7 @@ class PreferenciaUsuarioViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class RelatorioViewSet(viewsets.ViewSet):
+class RelatorioViewSet(RespostaCondicionalMixin, viewsets.ViewSet):
     """
     API endpoint para relatórios e estatísticas
     
@@ -441,44 +573,42 @@ class RelatorioViewSet(viewsets.ViewSet):
     mensal: Relatório mensal detalhado
     anual: Relatório anual consolidado
     fluxo_caixa: Fluxo de caixa período
+    pivot: Tabela dinâmica com dimensões e medidas à escolha
+    colunar: Lançamentos em Parquet/Arrow para ferramentas de BI
     """
     permission_classes = [IsAuthenticated]
     
+    # Limite de anos em uma única chamada do relatório anual
+    MAXIMO_ANOS_RELATORIO = 30
+    
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """
         Retorna dados consolidados para o dashboard
         Query params: mes, ano
         """
-        mes = request.query_params.get('mes', timezone.now().month)
-        ano = request.query_params.get('ano', timezone.now().year)
+        try:
+            mes = int(request.query_params.get('mes', timezone.now().month))
+            ano = int(request.query_params.get('ano', timezone.now().year))
+        except ValueError:
+            return Response(
+                {'error': 'mes e ano devem ser números inteiros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Totais mensais do ano, lidos dos resumos pré-calculados
+        totais = totais_mensais(request.user, ano)
         
         # Total de receitas e despesas do mês
-        receitas_mes = Receita.objects.filter(
-            usuario=request.user,
-            data__month=mes,
-            data__year=ano
-        ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-        
-        despesas_mes = Despesa.objects.filter(
-            usuario=request.user,
-            data__month=mes,
-            data__year=ano
-        ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
+        receitas_mes = totais[(ano, mes)]['R']
+        despesas_mes = totais[(ano, mes)]['D']
         
         # Saldo do mês
         saldo_mes = receitas_mes - despesas_mes
         
         # Total anual
-        receitas_ano = Receita.objects.filter(
-            usuario=request.user,
-            data__year=ano
-        ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-        
-        despesas_ano = Despesa.objects.filter(
-            usuario=request.user,
-            data__year=ano
-        ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
+        receitas_ano = sum((t['R'] for t in totais.values()), Decimal('0.00'))
+        despesas_ano = sum((t['D'] for t in totais.values()), Decimal('0.00'))
         
         return Response({
             'mes_atual': {
@@ -502,34 +632,36 @@ class RelatorioViewSet(viewsets.ViewSet):
         Relatório mensal detalhado com todas as transações
         Query params: mes, ano
         """
-        mes = request.query_params.get('mes', timezone.now().month)
-        ano = request.query_params.get('ano', timezone.now().year)
-        
-        receitas = Receita.objects.filter(
-            usuario=request.user,
-            data__month=mes,
-            data__year=ano
-        )
+        try:
+            mes = int(request.query_params.get('mes', timezone.now().month))
+            ano = int(request.query_params.get('ano', timezone.now().year))
+            periodo = filtro_periodo(*intervalo_mes(ano, mes))
+        except ValueError:
+            return Response(
+                {'error': 'mes e ano devem formar um mês válido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        despesas = Despesa.objects.filter(
-            usuario=request.user,
-            data__month=mes,
-            data__year=ano
-        )
+        receitas = Receita.objects.filter(usuario=request.user, **periodo).select_related(*RELACIONADOS_LANCAMENTO)
+        despesas = Despesa.objects.filter(usuario=request.user, **periodo).select_related(*RELACIONADOS_LANCAMENTO)
         
         receitas_serializer = ReceitaSerializer(receitas, many=True, context={'request': request})
         despesas_serializer = DespesaSerializer(despesas, many=True, context={'request': request})
         
+        # Total e quantidade de cada tabela em uma única agregação
+        resumo_receitas = receitas.aggregate(total=Sum('valor'), quantidade=Count('id'))
+        resumo_despesas = despesas.aggregate(total=Sum('valor'), quantidade=Count('id'))
+        
         return Response({
             'periodo': {
                 'mes': mes,
                 'ano': ano
             },
             'resumo': {
-                'total_receitas': receitas.aggregate(total=Sum('valor'))['total'] or Decimal('0.00'),
-                'total_despesas': despesas.aggregate(total=Sum('valor'))['total'] or Decimal('0.00'),
-                'quantidade_receitas': receitas.count(),
-                'quantidade_despesas': despesas.count()
+                'total_receitas': resumo_receitas['total'] or Decimal('0.00'),
+                'total_despesas': resumo_despesas['total'] or Decimal('0.00'),
+                'quantidade_receitas': resumo_receitas['quantidade'],
+                'quantidade_despesas': resumo_despesas['quantidade']
             },
             'receitas': receitas_serializer.data,
             'despesas': despesas_serializer.data
@@ -539,36 +671,125 @@ class RelatorioViewSet(viewsets.ViewSet):
     def anual(self, request):
         """
         Relatório anual consolidado por mês
-        Query params: ano
+        Query params: ano, ou ano_inicio e ano_fim para uma série de vários anos
+        
+        O custo é constante (uma consulta aos resumos mensais),
+        independentemente de quantos anos o intervalo cobre.
         """
-        ano = request.query_params.get('ano', timezone.now().year)
+        ano_padrao = request.query_params.get('ano', timezone.now().year)
+        try:
+            ano_inicio = int(request.query_params.get('ano_inicio', ano_padrao))
+            ano_fim = int(request.query_params.get('ano_fim', ano_inicio))
+        except ValueError:
+            return Response(
+                {'error': 'ano, ano_inicio e ano_fim devem ser números inteiros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if ano_inicio > ano_fim:
+            return Response(
+                {'error': 'ano_inicio deve ser menor ou igual a ano_fim'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if ano_fim - ano_inicio >= self.MAXIMO_ANOS_RELATORIO:
+            return Response(
+                {'error': f'O intervalo máximo é de {self.MAXIMO_ANOS_RELATORIO} anos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        totais = totais_mensais(request.user, ano_inicio, ano_fim)
         
         meses = []
-        for mes in range(1, 13):
-            receitas = Receita.objects.filter(
-                usuario=request.user,
-                data__month=mes,
-                data__year=ano
-            ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-            
-            despesas = Despesa.objects.filter(
-                usuario=request.user,
-                data__month=mes,
-                data__year=ano
-            ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-            
-            meses.append({
-                'mes': mes,
-                'receitas': receitas,
-                'despesas': despesas,
-                'saldo': receitas - despesas
+        for ano in range(ano_inicio, ano_fim + 1):
+            for mes in range(1, 13):
+                receitas = totais[(ano, mes)]['R']
+                despesas = totais[(ano, mes)]['D']
+                
+                meses.append({
+                    'ano': ano,
+                    'mes': mes,
+                    'receitas': receitas,
+                    'despesas': despesas,
+                    'saldo': receitas - despesas
+                })
+        
+        if ano_inicio == ano_fim:
+            return Response({
+                'ano': ano_inicio,
+                'meses': meses
             })
         
         return Response({
-            'ano': ano,
+            'ano_inicio': ano_inicio,
+            'ano_fim': ano_fim,
             'meses': meses
         })
     
+    @action(detail=False, methods=['get'])
+    def pivot(self, request):
+        """
+        Tabela dinâmica de receitas e despesas agrupada no banco
+        Query params: dimensoes (tipo, ano, trimestre, mes, categoria,
+        fornecedor, conta; padrão tipo), medidas (soma, quantidade, media,
+        minimo, maximo; padrão soma e quantidade) e os filtros de
+        /lancamentos/ (tipo, categoria, fornecedor, conta, data_inicio,
+        data_fim, valor_min, valor_max, search)
+        
+        Sem a dimensão tipo, as medidas somam receitas e despesas juntas.
+        """
+        try:
+            dimensoes = ler_lista(request.query_params.get('dimensoes'), tuple(DIMENSOES), DIMENSOES_PADRAO, 'dimensoes')
+            medidas = ler_lista(request.query_params.get('medidas'), MEDIDAS, MEDIDAS_PADRAO, 'medidas')
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'dimensoes': dimensoes,
+            'medidas': medidas,
+            'resultados': tabela_dinamica(querysets_da_requisicao(request), dimensoes, medidas),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def colunar(self, request):
+        """
+        Lançamentos (receitas e despesas, com categoria e fornecedor) em
+        arquivo colunar para ferramentas de BI (Power BI, pandas, DuckDB)
+        Query params: formato (parquet ou arrow), data_inicio, data_fim,
+        tipo_lancamento (R ou D), categoria
+        
+        O arquivo é gerado em row groups e guardado no cache de exportações
+        até os dados do usuário mudarem.
+        """
+        formato = request.query_params.get('formato', 'parquet')
+        if formato not in FORMATOS_COLUNARES:
+            return Response(
+                {'error': f"formato deve ser um de: {', '.join(FORMATOS_COLUNARES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return Response(
+                {'error': 'Exportação colunar indisponível: instale o pacote pyarrow'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        
+        # Só valida as datas; os filtros são aplicados por querysets_exportacao
+        filtro_periodo_da_requisicao(request)
+        querysets = querysets_exportacao(request.user, request.query_params)
+        arquivo = obter_ou_gerar(
+            request.user.pk, formato, request.query_params,
+            lambda destino: escrever_colunar(querysets, destino, formato),
+        )
+        
+        content_type = 'application/vnd.apache.parquet' if formato == 'parquet' else 'application/vnd.apache.arrow.file'
+        return FileResponse(
+            arquivo,
+            as_attachment=True,
+            filename=f'lancamentos_{timezone.localdate():%Y%m%d}.{formato}',
+            content_type=content_type,
+        )
+    
     @action(detail=False, methods=['get'])
     def fluxo_caixa(self, request):
         """
@@ -584,17 +805,9 @@ class RelatorioViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        receitas = Receita.objects.filter(
-            usuario=request.user,
-            data__gte=data_inicio,
-            data__lte=data_fim
-        )
-        
-        despesas = Despesa.objects.filter(
-            usuario=request.user,
-            data__gte=data_inicio,
-            data__lte=data_fim
-        )
+        periodo = filtro_periodo_da_requisicao(request)
+        receitas = Receita.objects.filter(usuario=request.user, **periodo)
+        despesas = Despesa.objects.filter(usuario=request.user, **periodo)
         
         total_receitas = receitas.aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
         total_despesas = despesas.aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
@@ -614,3 +827,69 @@ class RelatorioViewSet(viewsets.ViewSet):
             },
             'saldo': total_receitas - total_despesas
         })
+
+
+class AlteracoesViewSet(viewsets.ViewSet):
+    """
+    Feed incremental de alterações, para sincronizar (BI, integrações) sem
+    baixar as tabelas inteiras a cada vez
+    
+    list: Categorias, fornecedores, receitas e despesas incluídos, alterados
+          ou excluídos, em ordem de alteração
+    Query params: since (data/hora ISO 8601) na primeira chamada, depois
+                  cursor (devolvido em cada resposta); page_size
+    
+    Cada item traz modelo, operacao (upsert ou delete), id, data_atualizacao
+    e dados (o mesmo formato do endpoint do modelo; nulo nas exclusões).
+    Guarde o `cursor` da última resposta para continuar na próxima
+    sincronização; `next` só vem preenchido quando há mais itens agora.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    TAMANHO_PADRAO = 500
+    TAMANHO_MAXIMO = 5000
+    
+    def list(self, request):
+        cursor = request.query_params.get('cursor')
+        since = request.query_params.get('since')
+        try:
+            if cursor:
+                posicao = decodificar_posicao(cursor)
+            elif since:
+                posicao = posicao_desde(since)
+            else:
+                posicao = None
+        except ValueError:
+            return Response(
+                {'error': 'cursor inválido ou since fora do formato ISO 8601 (AAAA-MM-DDTHH:MM:SS)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            tamanho = int(request.query_params.get('page_size', self.TAMANHO_PADRAO))
+        except ValueError:
+            return Response(
+                {'error': 'page_size deve ser um número inteiro'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tamanho = max(1, min(tamanho, self.TAMANHO_MAXIMO))
+        
+        itens, mais = pagina_alteracoes(request.user, posicao, tamanho)
+        if itens:
+            data, indice, objeto = itens[-1]
+            proximo_cursor = codificar_posicao(data, indice, objeto.pk)
+        elif posicao is not None:
+            proximo_cursor = codificar_posicao(*posicao)
+        else:
+            proximo_cursor = None
+        
+        proximo = None
+        if mais:
+            url = remove_query_param(request.build_absolute_uri(), 'since')
+            proximo = replace_query_param(url, 'cursor', proximo_cursor)
+        
+        return Response({
+            'cursor': proximo_cursor,
+            'next': proximo,
+            'results': serializar_alteracoes(itens, {'request': request}),
+        })
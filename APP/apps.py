@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'APP'
+
+    def ready(self):
+        # Registra os signals (resumos mensais)
+        from . import signals  # noqa: F401
+        from .busca import restaurar_triggers_apos_migrar
+
+        # Triggers FTS5 descartados por reconstruções de tabela no SQLite
+        post_migrate.connect(restaurar_triggers_apos_migrar, sender=self)
@@ -0,0 +1,155 @@
+"""
+Busca textual em Receita/Despesa (descricao + observacoes)
+
+Usa o índice criado pela migração 0012_busca_textual: FTS5 no SQLite e
+to_tsvector('portuguese', unaccent(...)) com GIN no PostgreSQL. A busca
+ignora acentos e maiúsculas e cada palavra casa por prefixo ("alug" encontra
+"Aluguel"). Em bancos sem o índice cai no icontains de antes.
+
+O SQLite descarta os triggers que mantêm a tabela FTS5 quando uma migração
+reconstrói a tabela do modelo (AddField não nulo, AlterField...); após cada
+migrate, restaurar_triggers_busca recria os que faltarem e reindexa.
+
+Fornecedores são buscados por substring nas colunas normalizadas do modelo
+(nome sem acentos, documento e telefone só com dígitos), com índices de
+trigramas no PostgreSQL.
+"""
+import re
+from importlib import import_module
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import Despesa, Fornecedor, Receita
+from .normalizacao import normalizar_texto, somente_digitos
+
+# Tabela FTS5 (SQLite) / prefixo do índice GIN (PostgreSQL) de cada modelo
+TABELAS_BUSCA = {
+    Receita: 'APP_receita_busca',
+    Despesa: 'APP_despesa_busca',
+}
+
+# Bancos SQLite já verificados (nome do banco -> índice existe)
+_fts_disponivel = {}
+
+
+def palavras_busca(termo):
+    """Separa o termo em palavras; pontuação e operadores são descartados"""
+    return re.findall(r'\w+', termo or '')
+
+
+def indice_disponivel():
+    """Indica se o banco atual tem o índice de busca textual"""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    nome = connection.settings_dict['NAME']
+    if nome not in _fts_disponivel:
+        _fts_disponivel[nome] = TABELAS_BUSCA[Receita] in connection.introspection.table_names()
+    return _fts_disponivel[nome]
+
+
+def filtrar_busca(queryset, termo):
+    """Filtra o queryset de Receita/Despesa pelas palavras de `termo` (todas devem aparecer)"""
+    palavras = palavras_busca(termo)
+    if not palavras:
+        return queryset
+
+    modelo = queryset.model
+    if modelo not in TABELAS_BUSCA or not indice_disponivel():
+        filtro = Q()
+        for palavra in palavras:
+            filtro &= Q(descricao__icontains=palavra) | Q(observacoes__icontains=palavra)
+        return queryset.filter(filtro)
+
+    tabela = TABELAS_BUSCA[modelo]
+    if connection.vendor == 'sqlite':
+        consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        sql = f'SELECT rowid FROM "{tabela}" WHERE "{tabela}" MATCH %s'
+    else:
+        consulta = ' & '.join(f'{palavra}:*' for palavra in palavras)
+        sql = (
+            f'SELECT id FROM {connection.ops.quote_name(modelo._meta.db_table)} WHERE '
+            "to_tsvector('portuguese', elc_unaccent(coalesce(descricao, '') || ' ' || coalesce(observacoes, ''))) "
+            "@@ to_tsquery('portuguese', elc_unaccent(%s))"
+        )
+    return queryset.filter(pk__in=RawSQL(sql, [consulta]))
+
+
+def restaurar_triggers_busca(using=DEFAULT_DB_ALIAS):
+    """
+    Recria no SQLite os triggers do índice FTS5 que não existem mais e
+    reconstrói o índice (gravações feitas sem os triggers não estão nele).
+    Retorna os nomes dos triggers recriados.
+    """
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite':
+        return []
+    # As instruções são as da própria migração que criou o índice
+    migracao = import_module('APP.migrations.0012_busca_textual')
+    recriados = []
+    with conexao.cursor() as cursor:
+        tabelas = set(conexao.introspection.table_names(cursor))
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        triggers = {nome for (nome,) in cursor.fetchall()}
+        for tabela, busca in migracao.TABELAS:
+            faltando = [f'{busca}{sufixo}' for sufixo in ('_ai', '_ad', '_au') if f'{busca}{sufixo}' not in triggers]
+            if busca not in tabelas or not faltando:
+                continue
+            # CREATE TRIGGER IF NOT EXISTS de cada trigger e o 'rebuild' ao final
+            for sql in migracao.SQLITE_CRIAR[1:]:
+                cursor.execute(sql.format(tabela=tabela, busca=busca))
+            recriados += faltando
+    return recriados
+
+
+def restaurar_triggers_apos_migrar(sender, using=DEFAULT_DB_ALIAS, verbosity=1, stdout=None, **kwargs):
+    """Receiver de post_migrate (registrado em AppConfig.ready)"""
+    recriados = restaurar_triggers_busca(using)
+    if recriados and verbosity and stdout is not None:
+        stdout.write(f"  Triggers da busca textual recriados: {', '.join(recriados)}\n")
+
+
+class BuscaTextualFilter(filters.SearchFilter):
+    """
+    SearchFilter que usa o índice de busca textual para Receita/Despesa.
+    Outros modelos (e bancos sem o índice) seguem o comportamento padrão.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        termos = self.get_search_terms(request)
+        if not termos or queryset.model not in TABELAS_BUSCA or not indice_disponivel():
+            return super().filter_queryset(request, queryset, view)
+        return filtrar_busca(queryset, ' '.join(termos))
+
+
+# === FORNECEDORES ===
+
+def filtrar_fornecedores(queryset, termo):
+    """
+    Busca por parte do nome, nome fantasia, e-mail, CPF/CNPJ ou telefone
+    ('silva' encontra 'João Silva'). O documento casa com ou sem pontuação
+    ('12.345' ou '12345').
+    """
+    texto = normalizar_texto(termo)
+    if not texto:
+        return queryset
+
+    filtro = Q(nome_busca__contains=texto) | Q(nome_fantasia_busca__contains=texto) | Q(email_busca__contains=texto)
+    digitos = somente_digitos(termo)
+    if digitos:
+        filtro |= Q(cpf_cnpj_digitos__contains=digitos) | Q(telefone_digitos__contains=digitos)
+    return queryset.filter(filtro)
+
+
+class BuscaFornecedorFilter(filters.SearchFilter):
+    """SearchFilter do FornecedorViewSet usando as colunas normalizadas"""
+
+    def filter_queryset(self, request, queryset, view):
+        termos = self.get_search_terms(request)
+        if not termos or queryset.model is not Fornecedor:
+            return super().filter_queryset(request, queryset, view)
+        return filtrar_fornecedores(queryset, ' '.join(termos))
@@ -0,0 +1,158 @@
+"""
+Cache em disco dos arquivos exportados (CSV, Excel e PDF)
+
+Cada arquivo é guardado com o nome sha256(usuário, formato, filtros,
+versão dos dados). A versão (APP/versoes.py) muda a cada alteração nos
+dados do usuário, então uma entrada nunca fica desatualizada: ela só deixa
+de ser pedida, e a remoção das entradas antigas fica com o limite de
+tamanho (EXPORTACAO_CACHE_LIMITE), descartando as menos usadas primeiro.
+A data de modificação de cada arquivo é atualizada a cada acerto e serve
+de marcador de uso (LRU).
+
+Os arquivos são gravados em um temporário no mesmo diretório e movidos
+com os.replace, então leitores nunca veem um arquivo pela metade. Quem usa
+o cache recebe o arquivo já aberto: uma remoção pelo limite de tamanho (de
+outra requisição ou processo) não afeta a leitura em andamento, e o
+arquivo recém-gravado nunca é removido pelo despejo que se segue à gravação.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+
+from .versoes import versao_ledger
+
+# Filtros da tela de relatórios que mudam o conteúdo do arquivo
+CAMPOS_FILTRO = ('data_inicio', 'data_fim', 'tipo_lancamento', 'categoria')
+
+EXTENSOES = {
+    'csv': 'csv',
+    'excel': 'xlsx',
+    'pdf': 'pdf',
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+
+
+def diretorio_cache():
+    diretorio = getattr(settings, 'EXPORTACAO_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'exportacoes'))
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def chave_exportacao(usuario_id, formato, filtros, versao):
+    """Hash que identifica o arquivo: mesmos dados e filtros, mesmo arquivo"""
+    normalizados = {campo: (filtros.get(campo) or '').strip() for campo in CAMPOS_FILTRO}
+    numero, data_atualizacao = versao
+    conteudo = json.dumps([usuario_id, formato, normalizados, numero, data_atualizacao.isoformat()], sort_keys=True)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def caminho_exportacao(usuario_id, formato, filtros):
+    """Caminho do arquivo no cache para os dados atuais do usuário"""
+    chave = chave_exportacao(usuario_id, formato, filtros, versao_ledger(usuario_id))
+    return os.path.join(diretorio_cache(), f'{chave}.{EXTENSOES[formato]}')
+
+
+def abrir_em_cache(caminho):
+    """Arquivo do cache aberto para leitura ('rb'), marcando o uso, ou None"""
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(caminho)
+    except OSError:
+        # Removido depois de aberto: a leitura continua valendo
+        pass
+    return arquivo
+
+
+def gravar_no_cache(caminho, escrever):
+    """
+    Gera o arquivo com `escrever(destino)` e o coloca no cache. Retorna o
+    arquivo gravado, aberto para leitura.
+    """
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as destino:
+            escrever(destino)
+        # Aberto antes de entrar no cache: a partir daí pode ser removido
+        arquivo = open(temporario, 'rb')
+        try:
+            os.replace(temporario, caminho)
+        except BaseException:
+            arquivo.close()
+            raise
+    except BaseException:
+        os.unlink(temporario)
+        raise
+    despejar(preservar=caminho)
+    return arquivo
+
+
+def gravar_em_fluxo(caminho, blocos):
+    """
+    Repassa os blocos de texto (streaming) e, ao mesmo tempo, os grava no
+    cache. O arquivo só entra no cache se a geração chegar ao fim: se o
+    cliente desconectar, o temporário é descartado.
+    """
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as destino:
+            for bloco in blocos:
+                destino.write(bloco.encode('utf-8'))
+                yield bloco
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+    despejar(preservar=caminho)
+
+
+def obter_ou_gerar(usuario_id, formato, filtros, escrever):
+    """
+    Arquivo do cache aberto para leitura ('rb'), gerado com
+    `escrever(destino)` se preciso. Quem chama deve fechá-lo (FileResponse
+    fecha ao final do envio).
+    """
+    caminho = caminho_exportacao(usuario_id, formato, filtros)
+    return abrir_em_cache(caminho) or gravar_no_cache(caminho, escrever)
+
+
+def despejar(limite=None, preservar=None):
+    """
+    Remove os arquivos menos usados até o cache caber no limite (bytes).
+    O arquivo `preservar` (o que acabou de ser gravado) nunca é removido.
+    """
+    if limite is None:
+        limite = getattr(settings, 'EXPORTACAO_CACHE_LIMITE', 500 * 1024 * 1024)
+    arquivos = []
+    total = 0
+    with os.scandir(diretorio_cache()) as entradas:
+        for entrada in entradas:
+            if not entrada.is_file() or entrada.name.endswith('.tmp'):
+                continue
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+            total += info.st_size
+    if total <= limite:
+        return
+    for _, tamanho, caminho in sorted(arquivos):
+        if caminho == preservar:
+            continue
+        try:
+            os.unlink(caminho)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Ex.: no Windows, arquivo aberto por outro download
+            continue
+        total -= tamanho
+        if total <= limite:
+            break
@@ -0,0 +1,218 @@
+"""
+Compressão de respostas e arquivos estáticos (Brotli e gzip)
+
+CompressaoMiddleware comprime HTML e JSON acima de um tamanho mínimo com a
+melhor codificação que o cliente aceita (Accept-Encoding): Brotli quando
+disponível, senão gzip. Os níveis são moderados, pois a compressão roda a
+cada requisição.
+
+Os estáticos são comprimidos uma única vez, no collectstatic, com os níveis
+máximos (zopfli para o .gz e Brotli 11 para o .br). Os arquivos ficam ao
+lado do original em STATIC_ROOT para o servidor web entregá-los já
+comprimidos (gzip_static/brotli_static no nginx).
+
+Os pacotes Brotli e zopfli são opcionais: sem eles o middleware usa só
+gzip e o collectstatic gera o .gz com o módulo gzip da biblioteca padrão.
+"""
+import gzip
+import os
+import re
+import secrets
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+# Preferência entre as codificações aceitas com a mesma qualidade (q)
+CODIFICACOES = ('br', 'gzip')
+
+EXTENSOES_ESTATICAS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.ico', '.webmanifest')
+
+# Só vale guardar/enviar a versão comprimida se ela for menor que isto do original
+PROPORCAO_MAXIMA = 0.95
+
+# Comentário de tamanho aleatório que fecha o HTML enviado com Brotli
+PREENCHIMENTO_HTML = re.compile(rb'\n<!-- [0-9a-f]* -->\Z')
+
+# Espaços que o JSON admite depois do valor
+ESPACOS_JSON = b' \t\n\r'
+
+
+def _brotli():
+    """Módulo brotli, ou None se o pacote não estiver instalado"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def tamanho_minimo():
+    return getattr(settings, 'COMPRESSAO_TAMANHO_MINIMO', 1024)
+
+
+def codificacao_aceita(cabecalho, disponiveis=CODIFICACOES):
+    """
+    Melhor codificação de `disponiveis` aceita pelo cabeçalho Accept-Encoding
+    (respeitando q=0 e o curinga *), ou None
+    """
+    qualidades = {}
+    for item in (cabecalho or '').split(','):
+        nome, _, parametros = item.strip().partition(';')
+        nome = nome.strip().lower()
+        if not nome:
+            continue
+        qualidade = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith('q='):
+            try:
+                qualidade = float(parametro[2:])
+            except ValueError:
+                qualidade = 0.0
+        qualidades[nome] = qualidade
+
+    melhor, melhor_qualidade = None, 0.0
+    for codificacao in disponiveis:
+        qualidade = qualidades.get(codificacao, qualidades.get('*', 0.0))
+        if qualidade > melhor_qualidade:
+            melhor, melhor_qualidade = codificacao, qualidade
+    return melhor
+
+
+# === RESPOSTAS ===
+
+def preenchimento_html(maximo):
+    """Comentário HTML com até `maximo` bytes aleatórios (em hexadecimal)"""
+    return b'\n<!-- %s -->' % secrets.token_hex(secrets.randbelow(maximo + 1)).encode('ascii')
+
+
+def preenchimento_json(maximo):
+    """
+    Espaços aleatórios com até `maximo` bytes de entropia: cada caractere é
+    um dos quatro espaços do JSON (2 bits), então são até 4 * `maximo`
+    """
+    return bytes(ESPACOS_JSON[byte & 3] for byte in secrets.token_bytes(secrets.randbelow(4 * maximo + 1)))
+
+
+# Como cada tipo recebe o preenchimento aleatório no Brotli; os demais tipos
+# de COMPRESSAO_TIPOS só são enviados com gzip
+PREENCHIMENTOS = {
+    'text/html': preenchimento_html,
+    'application/json': preenchimento_json,
+}
+
+
+def sem_preenchimento(corpo):
+    """Corpo descomprimido sem o preenchimento aleatório, para comparar respostas"""
+    return PREENCHIMENTO_HTML.sub(b'', corpo).rstrip(ESPACOS_JSON)
+
+
+class CompressaoMiddleware(MiddlewareMixin):
+    """
+    Comprime respostas HTML/JSON com Brotli ou gzip conforme o Accept-Encoding.
+
+    Deve ficar no início do MIDDLEWARE, antes dos que leem ou alteram o corpo
+    da resposta. Como no GZipMiddleware do Django, o ETag passa a ser fraco
+    (o corpo muda, o recurso não) e o tamanho comprimido varia a cada
+    requisição contra BREACH: o gzip leva bytes aleatórios no cabeçalho e,
+    como o Brotli não tem onde guardá-los, o corpo enviado com Brotli termina
+    num preenchimento aleatório (comentário no HTML, espaços no JSON; ver
+    PREENCHIMENTOS). O token CSRF do HTML já é mascarado a cada requisição.
+    """
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.brotli = _brotli()
+        self.disponiveis = CODIFICACOES if self.brotli else ('gzip',)
+        self.tipos = tuple(getattr(settings, 'COMPRESSAO_TIPOS', ('text/html', 'application/json')))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if tipo not in self.tipos or len(response.content) < tamanho_minimo():
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        disponiveis = self.disponiveis if tipo in PREENCHIMENTOS else ('gzip',)
+        codificacao = codificacao_aceita(request.META.get('HTTP_ACCEPT_ENCODING'), disponiveis)
+        if codificacao is None:
+            return response
+
+        if codificacao == 'br':
+            comprimido = self.brotli.compress(
+                response.content + PREENCHIMENTOS[tipo](self.max_random_bytes), mode=self.brotli.MODE_TEXT,
+                quality=getattr(settings, 'COMPRESSAO_BROTLI_QUALIDADE', 5),
+            )
+        else:
+            comprimido = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacao
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+# === ESTÁTICOS ===
+
+def gzip_maximo(conteudo):
+    """gzip com zopfli (mais lento, ~5% menor) ou, sem o pacote, nível 9"""
+    try:
+        import zopfli.gzip
+    except ImportError:
+        return gzip.compress(conteudo, compresslevel=9, mtime=0)
+    return zopfli.gzip.compress(
+        conteudo, numiterations=getattr(settings, 'COMPRESSAO_ZOPFLI_ITERACOES', 15)
+    )
+
+
+def comprimir_arquivo(caminho):
+    """
+    Grava `caminho`.gz e `caminho`.br ao lado do arquivo. Versões em dia
+    (mais novas que o original) são mantidas; as que não ficam menores que
+    o original são removidas. Retorna True se alguma versão comprimida existe.
+    """
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    if len(conteudo) < tamanho_minimo():
+        return False
+
+    compressores = {'.gz': gzip_maximo}
+    brotli = _brotli()
+    if brotli is not None:
+        compressores['.br'] = lambda dados: brotli.compress(dados, quality=11)
+
+    modificado = os.path.getmtime(caminho)
+    existe = False
+    for extensao, comprimir in compressores.items():
+        destino = caminho + extensao
+        if os.path.exists(destino) and os.path.getmtime(destino) >= modificado:
+            existe = True
+            continue
+        comprimido = comprimir(conteudo)
+        if len(comprimido) <= len(conteudo) * PROPORCAO_MAXIMA:
+            with open(destino, 'wb') as arquivo:
+                arquivo.write(comprimido)
+            existe = True
+        elif os.path.exists(destino):
+            os.remove(destino)
+    return existe
+
+
+class ArmazenamentoEstaticoComprimido(StaticFilesStorage):
+    """StaticFilesStorage que grava .gz e .br dos arquivos de texto no collectstatic"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for nome in paths:
+            if nome.lower().endswith(EXTENSOES_ESTATICAS) and comprimir_arquivo(self.path(nome)):
+                yield nome, nome, True
@@ -0,0 +1,78 @@
+"""
+GET condicional (ETag / Last-Modified) para os endpoints do ledger
+
+As respostas de receitas, despesas, categorias, fornecedores e relatórios
+dependem só dos dados do usuário, cuja versão (VersaoLedger, APP/versoes.py)
+muda a cada gravação. O ETag combina essa versão com a URL, o formato da
+resposta e o dia atual (os relatórios usam o mês corrente), então um
+cliente que repete a requisição com If-None-Match recebe 304 depois de uma
+única consulta à tabela de versões, sem tocar nos lançamentos.
+"""
+import datetime
+import hashlib
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import APIException
+
+from .versoes import versao_ledger
+
+METODOS_CONDICIONAIS = ('GET', 'HEAD')
+
+
+class NaoModificado(APIException):
+    """Interrompe a view: o cliente já tem a versão atual"""
+    status_code = 304
+
+    def __init__(self, resposta):
+        super().__init__()
+        self.resposta = resposta
+
+
+def validadores(request, formato):
+    """(etag, last_modified) da resposta para os dados atuais do usuário"""
+    numero, data_atualizacao = versao_ledger(request.user.pk)
+    hoje = timezone.localdate()
+    conteudo = '\x1f'.join(map(str, (
+        request.user.pk, numero, data_atualizacao.isoformat(), hoje.isoformat(),
+        formato, request.get_full_path(),
+    )))
+    etag = quote_etag(hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:32])
+    # A virada do dia também muda a resposta (mês corrente dos relatórios)
+    inicio_do_dia = timezone.make_aware(datetime.datetime.combine(hoje, datetime.time.min))
+    # Datas HTTP têm resolução de segundos: com os microssegundos o
+    # If-Modified-Since devolvido pelo cliente nunca seria igual
+    return etag, max(data_atualizacao, inicio_do_dia).replace(microsecond=0)
+
+
+class RespostaCondicionalMixin:
+    """
+    Adiciona ETag e Last-Modified às leituras de um ViewSet e responde 304
+    quando If-None-Match/If-Modified-Since ainda valem
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validadores = None
+        if request.method in METODOS_CONDICIONAIS and request.user.is_authenticated:
+            self.validadores = validadores(request, request.accepted_renderer.format)
+            etag, modificado = self.validadores
+            resposta = get_conditional_response(request, etag=etag, last_modified=modificado.timestamp())
+            if resposta is not None:
+                raise NaoModificado(resposta)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NaoModificado):
+            return exc.resposta
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'validadores', None) and response.status_code in (200, 304):
+            etag, modificado = self.validadores
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modificado.timestamp())
+            # O cliente pode guardar, mas precisa revalidar a cada uso
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,615 @@
+"""
+Exportação de lançamentos do ELC_Contabil
+
+Os lançamentos são lidos em streaming: um único UNION ALL de receitas e
+despesas, já com os nomes de categoria/fornecedor via JOIN, ordenado no
+banco e percorrido com iterator(chunk_size). Nenhuma instância de modelo é
+criada e a memória fica constante, qualquer que seja o período exportado.
+
+O Excel usa Workbook(write_only=True): as linhas vão direto para o arquivo e
+os estilos são NamedStyles registrados uma vez, em vez de objetos de estilo
+por célula. O PDF é desenhado direto no canvas, em uma única passada.
+Parquet/Arrow (integração com BI) gravam colunas tipadas em row groups.
+"""
+import csv
+import io
+from decimal import Decimal
+
+from django.db.models import CharField, Count, Sum, Value
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+from .lancamentos import ORDENACAO_LANCAMENTOS
+from .models import Despesa, Receita
+from .periodos import converter_data, filtro_periodo_formulario
+from .versoes import versao_ledger
+
+# Linhas buscadas do banco por vez
+TAMANHO_LOTE = 2000
+
+CABECALHO_CSV = ['Data', 'Descricao', 'Tipo', 'Categoria', 'Fornecedor', 'CNPJ/CPF', 'Valor']
+
+NOME_TIPO = {
+    'R': 'Receita',
+    'D': 'Despesa',
+}
+
+# Colunas lidas de cada tabela; as quatro últimas só servem à ordenação
+COLUNAS = (
+    'data', 'descricao', 'categoria__nome', 'fornecedor__nome',
+    'fornecedor__cpf_cnpj', 'valor', 'tipo', 'data_cadastro', 'id',
+)
+
+
+def querysets_exportacao(usuario, filtros):
+    """
+    Receitas/despesas do usuário conforme os filtros da tela de relatórios:
+    data_inicio, data_fim (datas inválidas são ignoradas), tipo_lancamento
+    ('R', 'D' ou vazio) e categoria. Retorna {tipo: queryset}.
+    """
+    periodo = filtro_periodo_formulario(filtros.get('data_inicio'), filtros.get('data_fim'))
+    querysets = {}
+    for tipo, modelo in (('R', Receita), ('D', Despesa)):
+        if filtros.get('tipo_lancamento') in ('R', 'D') and filtros['tipo_lancamento'] != tipo:
+            continue
+        queryset = modelo.objects.filter(usuario=usuario, **periodo)
+        if filtros.get('categoria'):
+            queryset = queryset.filter(categoria_id=filtros['categoria'])
+        querysets[tipo] = queryset
+    return querysets
+
+
+def consulta_unificada(querysets, colunas):
+    """
+    UNION ALL dos querysets de {tipo: queryset} com values_list(*colunas),
+    na ordem da listagem (mais recentes primeiro). `tipo` é anotado em cada
+    parte; `colunas` precisa incluir tipo, data, data_cadastro e id, usados
+    na ordenação. Retorna None se não houver querysets.
+    """
+    partes = [
+        queryset.order_by().annotate(
+            tipo=Value(tipo, output_field=CharField(max_length=1))
+        ).values_list(*colunas)
+        for tipo, queryset in querysets.items()
+    ]
+    if not partes:
+        return None
+    consulta, *demais = partes
+    if demais:
+        consulta = consulta.union(*demais, all=True)
+    return consulta.order_by(*ORDENACAO_LANCAMENTOS)
+
+
+def linhas_lancamentos(querysets, tamanho_lote=TAMANHO_LOTE):
+    """
+    Gera (data, descricao, tipo, categoria, fornecedor, cpf_cnpj, valor) na
+    ordem da listagem (mais recentes primeiro), em lotes de `tamanho_lote`.
+    """
+    consulta = consulta_unificada(querysets, COLUNAS)
+    if consulta is None:
+        return
+
+    for data, descricao, categoria, fornecedor, cpf_cnpj, valor, tipo, _, _ in consulta.iterator(chunk_size=tamanho_lote):
+        yield data, descricao, tipo, categoria, fornecedor, cpf_cnpj, valor
+
+
+def linha_csv(data, descricao, tipo, categoria, fornecedor, cpf_cnpj, valor):
+    """Formata uma linha como no CSV original (datas dd/mm/aaaa e vírgula decimal)"""
+    return [
+        data.strftime('%d/%m/%Y'),
+        descricao,
+        NOME_TIPO[tipo],
+        categoria if categoria is not None else 'Sem Categoria',
+        fornecedor if fornecedor is not None else '-',
+        (cpf_cnpj or '') if fornecedor is not None else '-',
+        str(valor).replace('.', ','),
+    ]
+
+
+def gerar_csv(linhas, linhas_por_bloco=500):
+    """
+    Gera o CSV em blocos de texto, para uso em StreamingHttpResponse ou
+    para gravar em arquivo. Cada bloco tem até `linhas_por_bloco` linhas.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(CABECALHO_CSV)
+    # O cabeçalho sai antes da primeira consulta, para o download começar já
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    pendentes = 0
+    for linha in linhas:
+        writer.writerow(linha_csv(*linha))
+        pendentes += 1
+        if pendentes >= linhas_por_bloco:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendentes = 0
+    yield buffer.getvalue()
+
+
+def escrever_csv(querysets, destino, progresso=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava o CSV em `destino` (arquivo binário, UTF-8), no mesmo formato do
+    download direto. `progresso` é chamado com o número de linhas já gravadas.
+    Retorna o número de lançamentos exportados.
+    """
+    quantidade = 0
+
+    def contar(linhas):
+        nonlocal quantidade
+        for linha in linhas:
+            yield linha
+            quantidade += 1
+            if progresso and quantidade % tamanho_lote == 0:
+                progresso(quantidade)
+
+    for bloco in gerar_csv(contar(linhas_lancamentos(querysets, tamanho_lote))):
+        destino.write(bloco.encode('utf-8'))
+    if progresso:
+        progresso(quantidade)
+    return quantidade
+
+
+# === EXCEL ===
+
+# Colunas da planilha: (título, largura)
+COLUNAS_EXCEL = (
+    ('Data', 12),
+    ('Tipo', 10),
+    ('Descrição', 40),
+    ('Categoria', 25),
+    ('Fornecedor', 35),
+    ('CPF/CNPJ', 20),
+    ('Valor', 15),
+)
+
+FORMATO_MOEDA = 'R$ #,##0.00'
+COR_RECEITA = '198754'
+COR_DESPESA = 'DC3545'
+
+
+def estilos_excel():
+    """NamedStyles da planilha de lançamentos (criados uma vez por arquivo)"""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    lado = Side(style='thin')
+    borda = Border(left=lado, right=lado, top=lado, bottom=lado)
+
+    def estilo(nome, **atributos):
+        named_style = NamedStyle(name=nome)
+        for atributo, valor in atributos.items():
+            setattr(named_style, atributo, valor)
+        return named_style
+
+    return [
+        estilo('cabecalho', border=borda,
+               font=Font(bold=True, color='FFFFFF', size=12),
+               fill=PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid'),
+               alignment=Alignment(horizontal='center', vertical='center')),
+        estilo('celula', border=borda),
+        estilo('valor_receita', border=borda, number_format=FORMATO_MOEDA,
+               font=Font(color=COR_RECEITA, bold=True)),
+        estilo('valor_despesa', border=borda, number_format=FORMATO_MOEDA,
+               font=Font(color=COR_DESPESA, bold=True)),
+        estilo('rotulo_receita', font=Font(bold=True, color=COR_RECEITA)),
+        estilo('rotulo_despesa', font=Font(bold=True, color=COR_DESPESA)),
+        estilo('rotulo_balanco', font=Font(bold=True, size=12)),
+        estilo('total_receita', number_format=FORMATO_MOEDA, font=Font(bold=True, color=COR_RECEITA)),
+        estilo('total_despesa', number_format=FORMATO_MOEDA, font=Font(bold=True, color=COR_DESPESA)),
+        estilo('balanco_positivo', number_format=FORMATO_MOEDA, font=Font(bold=True, size=12, color=COR_RECEITA)),
+        estilo('balanco_negativo', number_format=FORMATO_MOEDA, font=Font(bold=True, size=12, color=COR_DESPESA)),
+    ]
+
+
+def escrever_excel(querysets, destino, progresso=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava em `destino` (caminho ou arquivo binário) a planilha com as receitas
+    e depois as despesas, cada grupo por data crescente, seguida dos totais.
+    `progresso`, se informado, é chamado com o número de linhas já gravadas.
+    Retorna o número de lançamentos exportados.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import Cell, WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Lançamentos')
+    for indice, (_, largura) in enumerate(COLUNAS_EXCEL, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = largura
+
+    # Resolve cada NamedStyle uma única vez; as células recebem uma cópia do
+    # StyleArray já resolvido em vez de procurar o estilo pelo nome (cerca de
+    # 30% mais rápido que WriteOnlyCell.style por célula). `_style` e
+    # Cell(style_array=...) são internos do openpyxl: a versão está fixada
+    # em requirements.txt e ExportacaoTest.test_excel confere os estilos
+    estilos = {}
+    for named_style in estilos_excel():
+        wb.add_named_style(named_style)
+        prototipo = WriteOnlyCell(ws)
+        prototipo.style = named_style.name
+        estilos[named_style.name] = prototipo._style
+
+    def celula(valor, estilo=None):
+        return Cell(ws, row=1, column=1, value=valor, style_array=estilos.get(estilo))
+
+    ws.append([celula(titulo, 'cabecalho') for titulo, _ in COLUNAS_EXCEL])
+
+    totais = {'R': Decimal('0.00'), 'D': Decimal('0.00')}
+    linhas = 0
+    for tipo in ('R', 'D'):
+        if tipo not in querysets:
+            continue
+        sinal, estilo_valor = (1, 'valor_receita') if tipo == 'R' else (-1, 'valor_despesa')
+        dados = querysets[tipo].order_by('data', 'id').values_list(
+            'data', 'descricao', 'categoria__nome', 'fornecedor__nome', 'fornecedor__cpf_cnpj', 'valor'
+        )
+        for data, descricao, categoria, fornecedor, cpf_cnpj, valor in dados.iterator(chunk_size=tamanho_lote):
+            ws.append([
+                celula(data.strftime('%d/%m/%Y'), 'celula'),
+                celula(NOME_TIPO[tipo], 'celula'),
+                celula(descricao, 'celula'),
+                celula(categoria if categoria is not None else '-', 'celula'),
+                celula(fornecedor if fornecedor is not None else '-', 'celula'),
+                celula(cpf_cnpj if fornecedor is not None else '-', 'celula'),
+                celula(sinal * float(valor), estilo_valor),
+            ])
+            totais[tipo] += valor
+            linhas += 1
+            if progresso and linhas % tamanho_lote == 0:
+                progresso(linhas)
+
+    # Resumo financeiro
+    balanco = totais['R'] - totais['D']
+    vazio = [None] * 5
+    ws.append([])
+    ws.append(vazio + [celula('Total Receitas:', 'rotulo_receita'), celula(float(totais['R']), 'total_receita')])
+    ws.append(vazio + [celula('Total Despesas:', 'rotulo_despesa'), celula(-float(totais['D']), 'total_despesa')])
+    ws.append(vazio + [
+        celula('BALANÇO:', 'rotulo_balanco'),
+        celula(float(balanco), 'balanco_positivo' if balanco >= 0 else 'balanco_negativo'),
+    ])
+
+    wb.save(destino)
+    if progresso:
+        progresso(linhas)
+    return linhas
+
+
+# === PDF ===
+
+def formatar_moeda(valor):
+    """1234.5 -> '1.234,50'"""
+    return f'{valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def truncar(texto, limite):
+    return texto[:limite] + '..' if len(texto) > limite else texto
+
+
+def descricao_periodo(filtros):
+    """Texto do período exibido no cabeçalho do PDF (datas inválidas são ignoradas)"""
+    datas = []
+    for campo in ('data_inicio', 'data_fim'):
+        try:
+            datas.append(converter_data(filtros.get(campo)))
+        except ValueError:
+            datas.append(None)
+    inicio, fim = datas
+    if inicio and fim:
+        return f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+    if inicio:
+        return f"Desde {inicio.strftime('%d/%m/%Y')}"
+    if fim:
+        return f"Até {fim.strftime('%d/%m/%Y')}"
+    return 'Todos os registros'
+
+
+def totais_exportacao(querysets):
+    """{tipo: (total, quantidade)} com um aggregate por tabela"""
+    totais = {}
+    for tipo, queryset in querysets.items():
+        resultado = queryset.order_by().aggregate(total=Sum('valor'), quantidade=Count('id'))
+        totais[tipo] = (resultado['total'] or Decimal('0.00'), resultado['quantidade'])
+    return totais
+
+
+class RelatorioPDF:
+    """
+    Desenha o relatório de lançamentos direto no canvas, linha a linha.
+
+    Fontes, cores, posições das colunas e alturas são calculadas uma vez;
+    cada linha custa alguns drawString e a grade de cada página é desenhada
+    de uma vez ao fechar a página. A paginação acontece em uma única
+    passada, enquanto as linhas chegam do banco.
+    """
+    MARGEM = 1.5 * cm
+    MARGEM_INFERIOR = 1.3 * cm
+    LARGURAS = (2.2 * cm, 4.5 * cm, 6.5 * cm, 3.8 * cm, 3 * cm)
+    TITULOS = ('Data', 'Categoria', 'Fornecedor', 'CNPJ/CPF', 'Valor')
+    # Alinhamento das células: (cabeçalho, linhas)
+    ALINHAMENTOS = (
+        ('CENTER', 'CENTER'),
+        ('LEFT', 'LEFT'),
+        ('LEFT', 'LEFT'),
+        ('LEFT', 'CENTER'),
+        ('RIGHT', 'RIGHT'),
+    )
+    PADDING_HORIZONTAL = 6
+    FONTE_CABECALHO = ('Helvetica-Bold', 7)
+    FONTE_LINHA = ('Helvetica', 6)
+    ALTURA_CABECALHO = 7 * 1.2 + 10
+    ALTURA_LINHA = 6 * 1.2 + 6
+
+    def __init__(self, destino, perfil, periodo, atualizado):
+        self.pagesize = landscape(A4)
+        self.largura, self.altura = self.pagesize
+        self.canvas = canvas.Canvas(destino, pagesize=self.pagesize)
+        self.perfil = perfil
+        self.periodo = periodo
+        # Data da última alteração nos dados (parte da chave do cache), e não
+        # a da geração: o mesmo arquivo é reaproveitado até os dados mudarem
+        self.atualizado = timezone.localtime(atualizado).strftime('%d/%m/%Y %H:%M')
+        self.pagina = 0
+
+        self.cor_verde = colors.Color(0, 0.6, 0)
+        self.cor_vermelha = colors.Color(0.8, 0, 0)
+        self.cor_cinza = colors.Color(0.3, 0.3, 0.3)
+        self.cor_zebra = colors.Color(0.95, 0.95, 0.95)
+        self.cor_grade = colors.grey
+        self.cores_valor = {'R': self.cor_verde, 'D': self.cor_vermelha}
+
+        # Bordas verticais da tabela e ponto de ancoragem do texto de cada coluna
+        self.xs = [self.MARGEM]
+        for largura in self.LARGURAS:
+            self.xs.append(self.xs[-1] + largura)
+        self.ancoras = []
+        for indice, (cabecalho, linha) in enumerate(self.ALINHAMENTOS):
+            esquerda, direita = self.xs[indice], self.xs[indice + 1]
+            self.ancoras.append(tuple(
+                (alinhamento, {
+                    'LEFT': esquerda + self.PADDING_HORIZONTAL,
+                    'CENTER': (esquerda + direita) / 2,
+                    'RIGHT': direita - self.PADDING_HORIZONTAL,
+                }[alinhamento])
+                for alinhamento in (cabecalho, linha)
+            ))
+
+    # --- página ---
+
+    def cabecalho_pagina(self):
+        p = self.canvas
+        self.pagina += 1
+        y = self.altura - 1 * cm
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(self.MARGEM, y, 'RELATÓRIO FINANCEIRO')
+        p.drawRightString(self.largura - self.MARGEM, y, f'Pág. {self.pagina}')
+        y -= 0.4 * cm
+
+        p.setFont('Helvetica', 7)
+        info = f"{self.perfil.razao_social or 'Empresa'}"
+        if self.perfil.cnpj:
+            info += f' - CNPJ: {self.perfil.cnpj}'
+        p.drawString(self.MARGEM, y, info)
+        p.drawRightString(self.largura - self.MARGEM, y, self.periodo)
+        y -= 0.3 * cm
+
+        p.setStrokeColor(self.cor_grade)
+        p.line(self.MARGEM, y, self.largura - self.MARGEM, y)
+        return y - 0.3 * cm
+
+    def rodape(self):
+        self.canvas.setFont('Helvetica', 6)
+        self.canvas.setFillColor(colors.black)
+        self.canvas.drawCentredString(self.largura / 2, 0.7 * cm, f'Dados atualizados em: {self.atualizado} | ELC Contábil')
+
+    def texto(self, coluna, texto, y, linha):
+        alinhamento, x = self.ancoras[coluna][linha]
+        if alinhamento == 'LEFT':
+            self.canvas.drawString(x, y, texto)
+        elif alinhamento == 'CENTER':
+            self.canvas.drawCentredString(x, y, texto)
+        else:
+            self.canvas.drawRightString(x, y, texto)
+
+    def cabecalho_tabela(self, y):
+        p = self.canvas
+        p.setFillColor(self.cor_cinza)
+        p.rect(self.xs[0], y - self.ALTURA_CABECALHO, self.xs[-1] - self.xs[0], self.ALTURA_CABECALHO, stroke=0, fill=1)
+        p.setFillColor(colors.white)
+        p.setFont(*self.FONTE_CABECALHO)
+        base = y - self.ALTURA_CABECALHO + 5 + 1.5
+        for coluna, titulo in enumerate(self.TITULOS):
+            self.texto(coluna, titulo, base, 0)
+        self.topo_tabela = y
+        self.linhas_pagina = [y, y - self.ALTURA_CABECALHO]
+        p.setFont(*self.FONTE_LINHA)
+        return y - self.ALTURA_CABECALHO
+
+    def fechar_tabela(self):
+        """Desenha a grade da página atual de uma vez"""
+        self.canvas.setStrokeColor(self.cor_grade)
+        self.canvas.setLineWidth(0.5)
+        self.canvas.grid(self.xs, self.linhas_pagina)
+
+    # --- relatório ---
+
+    def resumo(self, y, totais, contas):
+        p = self.canvas
+        total_receitas = totais.get('R', (Decimal('0.00'), 0))[0]
+        total_despesas = totais.get('D', (Decimal('0.00'), 0))[0]
+        balanco = total_receitas - total_despesas
+        p.setFont('Helvetica', 7)
+        p.setFillColor(self.cor_verde)
+        p.drawString(self.MARGEM, y, f'Receitas: R$ {formatar_moeda(total_receitas)}')
+        p.setFillColor(self.cor_vermelha)
+        p.drawString(self.MARGEM + 5 * cm, y, f'Despesas: R$ {formatar_moeda(total_despesas)}')
+        p.setFillColor(self.cor_verde if balanco >= 0 else self.cor_vermelha)
+        p.drawString(self.MARGEM + 10 * cm, y, f'Balanço: R$ {formatar_moeda(balanco)}')
+        p.setFillColor(colors.black)
+        y -= 0.6 * cm
+
+        # Contas (máx 2)
+        if contas:
+            p.setFont('Helvetica', 6)
+            for conta in contas[:2]:
+                p.drawString(self.MARGEM, y, f'• {conta.nome_banco} Ag:{conta.agencia} CC:{conta.conta_corrente}')
+                y -= 0.25 * cm
+            y -= 0.2 * cm
+
+        p.setFont('Helvetica-Bold', 7)
+        p.drawString(self.MARGEM, y, f'Lançamentos: {sum(quantidade for _, quantidade in totais.values())}')
+        return y - 0.35 * cm
+
+    def escrever(self, linhas, totais, contas, progresso=None, intervalo_progresso=TAMANHO_LOTE):
+        p = self.canvas
+        y = self.resumo(self.cabecalho_pagina(), totais, contas)
+        y = self.cabecalho_tabela(y)
+        zebra = False
+        quantidade = 0
+
+        for data, _, tipo, categoria, fornecedor, cpf_cnpj, valor in linhas:
+            if y - self.ALTURA_LINHA < self.MARGEM_INFERIOR:
+                self.fechar_tabela()
+                self.rodape()
+                p.showPage()
+                y = self.cabecalho_tabela(self.cabecalho_pagina() - 0.3 * cm)
+                zebra = False
+
+            inferior = y - self.ALTURA_LINHA
+            if zebra:
+                p.setFillColor(self.cor_zebra)
+                p.rect(self.xs[0], inferior, self.xs[-1] - self.xs[0], self.ALTURA_LINHA, stroke=0, fill=1)
+            zebra = not zebra
+
+            base = inferior + 3 + 1.2
+            p.setFillColor(colors.black)
+            self.texto(0, data.strftime('%d/%m/%Y'), base, 1)
+            self.texto(1, truncar(categoria, 23) if categoria is not None else '-', base, 1)
+            self.texto(2, truncar(fornecedor, 33) if fornecedor is not None else '-', base, 1)
+            self.texto(3, (cpf_cnpj or '') if fornecedor is not None else '-', base, 1)
+            p.setFillColor(self.cores_valor[tipo])
+            self.texto(4, f"{'+ ' if tipo == 'R' else '- '}R$ {formatar_moeda(valor)}", base, 1)
+
+            y = inferior
+            self.linhas_pagina.append(y)
+            quantidade += 1
+            if progresso and quantidade % intervalo_progresso == 0:
+                progresso(quantidade)
+
+        self.fechar_tabela()
+        self.rodape()
+        p.save()
+        if progresso:
+            progresso(quantidade)
+        return quantidade
+
+
+def escrever_pdf(querysets, destino, perfil, filtros, progresso=None):
+    """
+    Grava em `destino` o relatório PDF dos lançamentos (mais recentes primeiro).
+    Os totais do resumo vêm de um aggregate por tabela, então as linhas são
+    lidas do banco uma única vez, em streaming. Retorna o número de linhas.
+    """
+    contas = list(perfil.contas.all().order_by('-preferencial', 'nome_banco')[:2])
+    _, atualizado = versao_ledger(perfil.usuario_id)
+    relatorio = RelatorioPDF(destino, perfil, descricao_periodo(filtros), atualizado)
+    return relatorio.escrever(
+        linhas_lancamentos(querysets), totais_exportacao(querysets), contas, progresso=progresso,
+    )
+
+
+# === COLUNAR (Parquet / Arrow IPC) ===
+
+# Colunas do arquivo: (nome, campo consultado). Os tipos estão em esquema_colunar()
+COLUNAS_COLUNAR = (
+    ('id', 'id'),
+    ('tipo', 'tipo'),
+    ('data', 'data'),
+    ('descricao', 'descricao'),
+    ('valor', 'valor'),
+    ('categoria_id', 'categoria_id'),
+    ('categoria', 'categoria__nome'),
+    ('fornecedor_id', 'fornecedor_id'),
+    ('fornecedor', 'fornecedor__nome'),
+    ('fornecedor_cpf_cnpj', 'fornecedor__cpf_cnpj'),
+    ('observacoes', 'observacoes'),
+    ('data_cadastro', 'data_cadastro'),
+)
+
+# Linhas por row group (Parquet) / record batch (Arrow)
+LINHAS_POR_GRUPO = 50000
+
+FORMATOS_COLUNARES = ('parquet', 'arrow')
+
+
+def esquema_colunar():
+    import pyarrow as pa
+
+    tipos = {
+        'id': pa.int64(),
+        'tipo': pa.string(),
+        'data': pa.date32(),
+        'descricao': pa.string(),
+        'valor': pa.decimal128(10, 2),
+        'categoria_id': pa.int64(),
+        'categoria': pa.string(),
+        'fornecedor_id': pa.int64(),
+        'fornecedor': pa.string(),
+        'fornecedor_cpf_cnpj': pa.string(),
+        'observacoes': pa.string(),
+        'data_cadastro': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([pa.field(nome, tipos[nome]) for nome, _ in COLUNAS_COLUNAR])
+
+
+def escrever_colunar(querysets, destino, formato='parquet', progresso=None, linhas_por_grupo=LINHAS_POR_GRUPO):
+    """
+    Grava em `destino` os lançamentos (receitas e despesas juntas, com
+    categoria e fornecedor desnormalizados) em Parquet ou Arrow IPC
+    ('arrow'), com tipos nativos: datas, decimal(10,2) e timestamps.
+    As linhas são lidas em streaming e gravadas a cada `linhas_por_grupo`
+    (um row group / record batch), então a memória não cresce com o
+    período exportado. Retorna o número de lançamentos exportados.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = esquema_colunar()
+    if formato == 'parquet':
+        escritor = pq.ParquetWriter(destino, esquema, compression='zstd')
+    else:
+        escritor = pa.ipc.new_file(destino, esquema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    def gravar_grupo(linhas):
+        # Transpõe as linhas em colunas e monta o lote já com os tipos do esquema
+        colunas = zip(*linhas)
+        escritor.write_batch(pa.record_batch(
+            [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)],
+            schema=esquema,
+        ))
+
+    quantidade = 0
+    consulta = consulta_unificada(querysets, [campo for _, campo in COLUNAS_COLUNAR])
+    with escritor:
+        if consulta is not None:
+            grupo = []
+            for linha in consulta.iterator(chunk_size=TAMANHO_LOTE):
+                grupo.append(linha)
+                if len(grupo) >= linhas_por_grupo:
+                    gravar_grupo(grupo)
+                    quantidade += len(grupo)
+                    grupo = []
+                    if progresso:
+                        progresso(quantidade)
+            if grupo:
+                gravar_grupo(grupo)
+                quantidade += len(grupo)
+    if progresso:
+        progresso(quantidade)
+    return quantidade
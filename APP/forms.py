@@ -124,6 +124,37 @@ class ContaBancariaForm(forms.ModelForm):
         }
 
 
+class ImportacaoExtratoForm(forms.Form):
+    """Upload de extrato bancário (OFX ou CSV) para uma das contas do usuário"""
+    FORMATO_CHOICES = [
+        ('', 'Detectar pelo arquivo'),
+        ('ofx', 'OFX'),
+        ('csv', 'CSV'),
+    ]
+
+    conta = forms.ModelChoiceField(
+        queryset=ContaBancaria.objects.none(),
+        label='Conta Bancária',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    arquivo = forms.FileField(
+        label='Arquivo do extrato',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.ofx,.qfx,.csv,.txt'}),
+    )
+    formato = forms.ChoiceField(
+        choices=FORMATO_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        # Apenas as contas do perfil do usuário logado
+        if user:
+            self.fields['conta'].queryset = ContaBancaria.objects.filter(perfil_empresa__usuario=user)
+
+
 class FornecedorForm(forms.ModelForm):
     class Meta:
         model = Fornecedor
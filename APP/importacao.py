@@ -0,0 +1,424 @@
+"""
+Importação de extratos bancários (OFX e CSV)
+
+O arquivo é lido em fluxo: as linhas do extrato viram receitas (valores
+positivos) ou despesas (negativos) ligadas a uma ContaBancaria e são
+gravadas em lotes com bulk_create, então o arquivo nunca fica inteiro em
+memória.
+
+Cada linha recebe um hash (hash_importacao) com a conta e o FITID do OFX ou,
+sem ele, data, valor, descrição e a ordem da linha entre as iguais do mesmo
+dia. Como os extratos nem sempre vêm em ordem de data, essa ordem é contada
+no arquivo todo: a única memória que cresce com o arquivo é um resumo de 8
+bytes por linha distinta sem FITID (cerca de 100 bytes com o dicionário).
+Linhas já importadas são ignoradas, então o mesmo extrato (ou extratos com
+períodos sobrepostos) pode ser importado de novo sem duplicar nada, mesmo
+com duas importações simultâneas.
+
+Como nos endpoints em lote, os receivers dos lançamentos ficam suspensos e
+os resumos mensais são atualizados uma vez por lote; a versão dos dados do
+usuário é incrementada uma vez, ao final.
+"""
+import codecs
+import csv
+import datetime
+import functools
+import hashlib
+import html
+import io
+import re
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from .models import Despesa, Receita
+from .normalizacao import normalizar_texto
+from .resumos import estado_lancamento, registrar_alteracoes
+from .signals import operacao_em_lote
+from .versoes import incrementar_versao
+
+FORMATOS_EXTRATO = ('ofx', 'csv')
+
+# Linhas gravadas por transação
+TAMANHO_LOTE = 1000
+
+# Bytes lidos por vez do arquivo
+TAMANHO_BLOCO = 64 * 1024
+
+# Quantas mensagens de linhas inválidas guardar (as demais só são contadas)
+MAXIMO_ERROS = 20
+
+TAMANHO_DESCRICAO = Receita._meta.get_field('descricao').max_length
+
+# Maior valor que cabe no campo (max_digits=10, decimal_places=2)
+_campo_valor = Receita._meta.get_field('valor')
+LIMITE_VALOR = Decimal(10) ** (_campo_valor.max_digits - _campo_valor.decimal_places)
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser importado (formato ou colunas não reconhecidos)"""
+
+
+class ResultadoImportacao:
+    """Contadores de uma importação"""
+
+    def __init__(self):
+        self.lidas = 0
+        self.receitas = 0
+        self.despesas = 0
+        self.duplicadas = 0
+        self.ignoradas = 0
+        self.invalidas = 0
+        self.erros = []
+        self.segundos = 0.0
+
+    @property
+    def inseridas(self):
+        return self.receitas + self.despesas
+
+    @property
+    def linhas_por_segundo(self):
+        return self.lidas / self.segundos if self.segundos else 0.0
+
+    def linha_invalida(self, numero, mensagem):
+        self.invalidas += 1
+        if len(self.erros) < MAXIMO_ERROS:
+            self.erros.append(f'Linha {numero}: {mensagem}')
+
+
+# === LEITURA ===
+
+def detectar_formato(nome, inicio):
+    """'ofx' ou 'csv' pela extensão do arquivo ou, sem ela, pelo conteúdo"""
+    extensao = nome.rsplit('.', 1)[-1].lower() if '.' in nome else ''
+    if extensao in ('ofx', 'qfx'):
+        return 'ofx'
+    if extensao in ('csv', 'txt'):
+        return 'csv'
+    cabecalho = inicio.lstrip().upper()
+    return 'ofx' if cabecalho.startswith(b'OFXHEADER') or b'<OFX>' in cabecalho else 'csv'
+
+
+def abrir_texto(arquivo, codificacao):
+    """Texto do arquivo (binário) decodificado em fluxo"""
+    arquivo.seek(0)
+    # UploadedFile/File do Django: o TextIOWrapper usa o arquivo por baixo
+    return io.TextIOWrapper(getattr(arquivo, 'file', arquivo), encoding=codificacao, errors='replace', newline='')
+
+
+def codificacao_ofx(inicio):
+    """OFX 1.x declara CHARSET no cabeçalho (1252 na maioria dos bancos)"""
+    cabecalho = inicio.upper()
+    if b'CHARSET:1252' in cabecalho or b'CHARSET: 1252' in cabecalho:
+        return 'cp1252'
+    if b'ISO-8859-1' in cabecalho or b'CHARSET:8859-1' in cabecalho:
+        return 'latin-1'
+    return 'utf-8'
+
+
+def codificacao_csv(inicio):
+    """UTF-8 (com ou sem BOM) se o início do arquivo for válido, senão Windows-1252"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(inicio, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+TAG_OFX = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def tags_ofx(texto):
+    """Gera (tag, fechamento, valor) lendo o OFX em blocos"""
+    resto = ''
+    while True:
+        bloco = texto.read(TAMANHO_BLOCO)
+        buffer = resto + bloco
+        if not bloco:
+            limite = len(buffer)
+        else:
+            # Uma tag pode estar cortada no fim do bloco: fica para o próximo
+            limite = buffer.rfind('<')
+            if limite <= 0:
+                resto = buffer
+                continue
+        for encontrado in TAG_OFX.finditer(buffer, 0, limite):
+            yield encontrado.group(2).upper(), bool(encontrado.group(1)), encontrado.group(3)
+        resto = buffer[limite:]
+        if not bloco:
+            return
+
+
+def ler_ofx(texto):
+    """Gera (numero, data, descricao, valor, identificador) das transações (STMTTRN)"""
+    transacao = None
+    numero = 0
+    for tag, fechamento, valor in tags_ofx(texto):
+        if tag == 'STMTTRN' and not fechamento:
+            transacao = {}
+            numero += 1
+        elif tag in ('STMTTRN', 'BANKTRANLIST') and transacao is not None:
+            yield linha_ofx(numero, transacao)
+            transacao = None
+        elif transacao is not None and not fechamento:
+            transacao[tag] = html.unescape(valor.strip())
+
+
+def linha_ofx(numero, transacao):
+    nome = transacao.get('NAME', '')
+    memo = transacao.get('MEMO', '')
+    descricao = f'{nome} - {memo}' if nome and memo and nome != memo else (memo or nome)
+    try:
+        postada = transacao.get('DTPOSTED', '')
+        data = datetime.date(int(postada[:4]), int(postada[4:6]), int(postada[6:8]))
+    except ValueError:
+        data = None
+    return numero, data, descricao, converter_valor(transacao.get('TRNAMT', '')), transacao.get('FITID') or None
+
+
+# Cabeçalhos aceitos em CSV, por campo: minúsculos, sem acentos, pontuação
+# ou unidades entre parênteses ('Crédito (R$)' -> 'credito')
+COLUNAS_CSV = {
+    'data': ('data', 'data lancamento', 'data do lancamento', 'data movimento', 'data mov', 'date'),
+    'descricao': ('descricao', 'historico', 'lancamento', 'memo', 'description'),
+    'valor': ('valor', 'montante', 'amount'),
+    'credito': ('credito', 'entrada', 'entradas'),
+    'debito': ('debito', 'saida', 'saidas'),
+    # Só identificadores únicos por conta; número de documento se repete
+    'identificador': ('id', 'fitid'),
+}
+
+FORMATOS_DATA_CSV = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y', '%d.%m.%Y')
+
+
+def mapear_colunas(cabecalho):
+    """{campo: índice da coluna}; ErroImportacao se faltar coluna obrigatória"""
+    nomes = [
+        ' '.join(re.sub(r'[^a-z0-9 ]', ' ', re.sub(r'\(.*?\)', '', normalizar_texto(nome))).split())
+        for nome in cabecalho
+    ]
+    colunas = {}
+    for campo, aceitos in COLUNAS_CSV.items():
+        for indice, nome in enumerate(nomes):
+            if nome in aceitos and indice not in colunas.values():
+                colunas[campo] = indice
+                break
+    if 'data' not in colunas or 'descricao' not in colunas or not (
+        'valor' in colunas or 'credito' in colunas or 'debito' in colunas
+    ):
+        raise ErroImportacao(
+            'Cabeçalho do CSV não reconhecido: são necessárias as colunas Data, Descrição '
+            '(ou Histórico) e Valor (ou Crédito/Débito).'
+        )
+    return colunas
+
+
+def ler_csv(texto):
+    """Gera (numero, data, descricao, valor, identificador) das linhas do CSV"""
+    amostra = texto.read(TAMANHO_BLOCO)
+    try:
+        delimitador = csv.Sniffer().sniff(amostra.split('\n', 1)[0], delimiters=';,\t|').delimiter
+    except csv.Error:
+        delimitador = ';'
+    leitor = csv.reader(_concatenar(amostra, texto), delimiter=delimitador)
+
+    colunas = None
+    for numero, campos in enumerate(leitor, start=1):
+        if not any(campo.strip() for campo in campos):
+            continue
+        if colunas is None:
+            colunas = mapear_colunas(campos)
+            continue
+
+        def coluna(nome):
+            indice = colunas.get(nome)
+            return campos[indice].strip() if indice is not None and indice < len(campos) else ''
+
+        if 'valor' in colunas:
+            valor = converter_valor(coluna('valor'))
+        else:
+            credito = converter_valor(coluna('credito') or '0')
+            debito = converter_valor(coluna('debito') or '0')
+            valor = credito - abs(debito) if credito is not None and debito is not None else None
+        yield numero, converter_data(coluna('data')), coluna('descricao'), valor, coluna('identificador') or None
+    if colunas is None:
+        raise ErroImportacao('O arquivo CSV está vazio.')
+
+
+def _concatenar(amostra, texto):
+    """Linhas da amostra já lida seguidas das do restante do arquivo"""
+    yield from io.StringIO(amostra + texto.readline())
+    yield from texto
+
+
+def converter_valor(texto):
+    """'1.234,56', '-1234.56', 'R$ 10,00 D' -> Decimal com sinal; None se inválido"""
+    texto = texto.replace('R$', '').replace(' ', '').replace('\xa0', '').upper()
+    # Sufixo D (débito) ou parênteses marcam valores negativos
+    negativo = texto.endswith('D') or (texto.startswith('(') and texto.endswith(')'))
+    texto = texto.strip('()CD')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        return None
+    if not valor.is_finite():
+        return None
+    return -abs(valor) if negativo else valor
+
+
+# Extratos repetem a mesma data em muitas linhas seguidas
+@functools.lru_cache(maxsize=1024)
+def converter_data(texto):
+    for formato in FORMATOS_DATA_CSV:
+        try:
+            return datetime.datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+# === GRAVAÇÃO ===
+
+# normalizar_texto é a parte mais cara do hash; descrições se repetem muito
+descricao_normalizada = functools.lru_cache(maxsize=4096)(normalizar_texto)
+
+
+def hash_linha(conta_id, data, descricao, valor, identificador, ocorrencia):
+    """Hash que identifica a linha do extrato entre importações"""
+    if identificador:
+        partes = (conta_id, 'id', identificador)
+    else:
+        partes = (conta_id, data.isoformat(), f'{valor:.2f}', descricao_normalizada(descricao), ocorrencia)
+    return hashlib.sha256('\x1f'.join(map(str, partes)).encode('utf-8')).hexdigest()
+
+
+def gravar_lote(lancamentos, usuario, resultado):
+    """Grava um lote de Receita/Despesa ainda não importados"""
+    por_modelo = {Receita: [], Despesa: []}
+    for lancamento in lancamentos:
+        por_modelo[type(lancamento)].append(lancamento)
+
+    with transaction.atomic(), operacao_em_lote():
+        for modelo, objetos in por_modelo.items():
+            if not objetos:
+                continue
+            existentes = set(modelo.objects.filter(
+                usuario=usuario, hash_importacao__in=[objeto.hash_importacao for objeto in objetos]
+            ).values_list('hash_importacao', flat=True))
+            novos = []
+            for objeto in objetos:
+                if objeto.hash_importacao in existentes:
+                    resultado.duplicadas += 1
+                else:
+                    existentes.add(objeto.hash_importacao)
+                    novos.append(objeto)
+            try:
+                with transaction.atomic():
+                    modelo.objects.bulk_create(novos)
+            except IntegrityError:
+                # Outra importação gravou parte das linhas depois da consulta
+                novos = inserir_um_a_um(novos, resultado)
+            registrar_alteracoes(modelo, [(None, estado_lancamento(objeto)) for objeto in novos])
+            if modelo is Receita:
+                resultado.receitas += len(novos)
+            else:
+                resultado.despesas += len(novos)
+
+
+def inserir_um_a_um(lancamentos, resultado):
+    """Grava os lançamentos um a um, contando como duplicados os que já existem"""
+    gravados = []
+    for lancamento in lancamentos:
+        try:
+            with transaction.atomic():
+                type(lancamento).objects.bulk_create([lancamento])
+        except IntegrityError:
+            resultado.duplicadas += 1
+        else:
+            gravados.append(lancamento)
+    return gravados
+
+
+def importar_extrato(arquivo, usuario, conta, formato=None, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Importa o extrato `arquivo` (binário, com seek) para a `conta` do
+    usuário. `formato` é 'ofx' ou 'csv' (None: detecta). `progresso(lidas)`
+    é chamado a cada lote. Retorna um ResultadoImportacao.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoImportacao()
+
+    arquivo.seek(0)
+    amostra = arquivo.read(1024)
+    formato = formato or detectar_formato(getattr(arquivo, 'name', '') or '', amostra)
+    if formato == 'ofx':
+        texto = abrir_texto(arquivo, codificacao_ofx(amostra))
+        linhas = ler_ofx(texto)
+    elif formato == 'csv':
+        texto = abrir_texto(arquivo, codificacao_csv(amostra))
+        linhas = ler_csv(texto)
+    else:
+        raise ErroImportacao(f'Formato inválido: {formato}')
+
+    try:
+        gravar_linhas(linhas, usuario, conta, resultado, tamanho_lote, progresso)
+    finally:
+        # Devolve o arquivo aberto a quem chamou (o TextIOWrapper o fecharia)
+        texto.detach()
+    if resultado.inseridas:
+        incrementar_versao(usuario.pk)
+    if progresso:
+        progresso(resultado.lidas)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def gravar_linhas(linhas, usuario, conta, resultado, tamanho_lote, progresso=None):
+    """Converte as linhas do extrato em lançamentos e os grava em lotes"""
+    lote = []
+    ocorrencias = {}
+    for numero, data, descricao, valor, identificador in linhas:
+        resultado.lidas += 1
+        if data is None:
+            resultado.linha_invalida(numero, 'data inválida')
+            continue
+        if valor is None or abs(valor) >= LIMITE_VALOR:
+            resultado.linha_invalida(numero, 'valor inválido')
+            continue
+        # Saldos não são lançamentos
+        if not valor or descricao_normalizada(descricao).startswith('saldo'):
+            resultado.ignoradas += 1
+            continue
+
+        # Linhas idênticas no mesmo dia (duas compras iguais) são distintas.
+        # O contador vale para o arquivo todo (a n-ésima ocorrência tem sempre
+        # o mesmo hash, em qualquer ordem) e guarda só um resumo de cada linha
+        ocorrencia = 1
+        if not identificador:
+            chave = hashlib.blake2b(
+                f'{data.isoformat()}\x1f{valor:.2f}\x1f{descricao_normalizada(descricao)}'.encode('utf-8'),
+                digest_size=8,
+            ).digest()
+            ocorrencias[chave] = ocorrencia = ocorrencias.get(chave, 0) + 1
+
+        modelo = Receita if valor > 0 else Despesa
+        lote.append(modelo(
+            usuario=usuario,
+            conta_bancaria=conta,
+            descricao=(descricao or 'Lançamento importado')[:TAMANHO_DESCRICAO],
+            valor=abs(valor).quantize(Decimal('0.01')),
+            data=data,
+            hash_importacao=hash_linha(conta.pk, data, descricao, valor, identificador, ocorrencia),
+        ))
+        if len(lote) >= tamanho_lote:
+            gravar_lote(lote, usuario, resultado)
+            lote = []
+            if progresso:
+                progresso(resultado.lidas)
+
+    if lote:
+        gravar_lote(lote, usuario, resultado)
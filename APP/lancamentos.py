@@ -0,0 +1,216 @@
+"""
+Listagem unificada de lançamentos (receitas + despesas)
+
+As duas tabelas são combinadas no banco com UNION ALL e um discriminador
+`tipo` ('R'/'D'). A ordenação e o LIMIT/OFFSET também rodam no banco, e só
+os lançamentos da página são carregados como instâncias. Assim a primeira
+página custa o mesmo para uma conta com 200 ou com 200 mil lançamentos.
+
+Para páginas profundas há também a paginação por cursor (keyset): o cursor
+guarda a chave (data, data_cadastro, tipo, id) do último item exibido e a
+próxima página é buscada com WHERE chave < cursor, sem OFFSET. O custo por
+página é constante e inclusões concorrentes não duplicam nem pulam itens.
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.db.models import CharField, F, Q, Sum, Value
+
+from .models import Despesa, Receita
+
+# Discriminador de cada modelo no UNION
+MODELO_POR_TIPO = {
+    'R': Receita,
+    'D': Despesa,
+}
+
+# Mais recentes primeiro; '-tipo' mantém receitas antes de despesas no
+# mesmo instante e o id desempata, para que a ordem seja total e estável.
+# data_cadastro pode ser nulo (registros antigos): nulos vão sempre para o fim,
+# em qualquer banco, para que o cursor funcione igual no SQLite e no PostgreSQL.
+ORDENACAO_LANCAMENTOS = (
+    F('data').desc(),
+    F('data_cadastro').desc(nulls_last=True),
+    F('tipo').desc(),
+    F('id').desc(),
+)
+
+# Mesma ordem para uma tabela só (ReceitaViewSet/DespesaViewSet)
+ORDENACAO_CURSOR = (
+    F('data').desc(),
+    F('data_cadastro').desc(nulls_last=True),
+    F('id').desc(),
+)
+
+
+# === CURSOR (KEYSET) ===
+
+def chave_lancamento(lancamento, modelo=None):
+    """
+    Chave de ordenação de uma instância de Receita/Despesa ou de uma linha
+    de values() (dict) do `modelo`
+    """
+    if isinstance(lancamento, dict):
+        tipo = next(t for t, m in MODELO_POR_TIPO.items() if m is modelo)
+        return {
+            'data': lancamento['data'],
+            'data_cadastro': lancamento['data_cadastro'],
+            'tipo': tipo,
+            'id': lancamento['id'],
+        }
+    tipo = next(t for t, modelo in MODELO_POR_TIPO.items() if isinstance(lancamento, modelo))
+    return {
+        'data': lancamento.data,
+        'data_cadastro': lancamento.data_cadastro,
+        'tipo': tipo,
+        'id': lancamento.pk,
+    }
+
+
+def codificar_cursor(chave):
+    """Gera o cursor opaco (base64) que aponta para depois de `chave`"""
+    valores = [
+        chave['data'].isoformat(),
+        chave['data_cadastro'].isoformat() if chave['data_cadastro'] else None,
+        chave['tipo'],
+        chave['id'],
+    ]
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Converte o cursor em {'data', 'data_cadastro', 'tipo', 'id'}; ValueError se inválido"""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data, data_cadastro, tipo, pk = json.loads(texto)
+        chave = {
+            'data': datetime.date.fromisoformat(data),
+            'data_cadastro': datetime.datetime.fromisoformat(data_cadastro) if data_cadastro else None,
+            'tipo': tipo,
+            'id': int(pk),
+        }
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as erro:
+        raise ValueError('Cursor inválido') from erro
+    if chave['tipo'] not in MODELO_POR_TIPO:
+        raise ValueError('Cursor inválido')
+    return chave
+
+
+def filtro_apos_cursor(chave, tipo=None):
+    """
+    Q com os lançamentos que vêm depois de `chave` na ordenação decrescente.
+    `tipo` é o discriminador da tabela filtrada; com None (uma tabela só) o
+    desempate é apenas pelo id.
+    """
+    if tipo is None or tipo == chave['tipo']:
+        empate = Q(id__lt=chave['id'])
+    elif tipo < chave['tipo']:
+        # Tabela inteira vem depois no desempate por tipo ('-tipo')
+        empate = Q()
+    else:
+        empate = None
+
+    if chave['data_cadastro'] is None:
+        mesmo_dia = Q(data_cadastro__isnull=True) & empate if empate is not None else None
+    else:
+        mesmo_dia = Q(data_cadastro__lt=chave['data_cadastro']) | Q(data_cadastro__isnull=True)
+        if empate is not None:
+            mesmo_dia |= Q(data_cadastro=chave['data_cadastro']) & empate
+
+    filtro = Q(data__lt=chave['data'])
+    if mesmo_dia is not None:
+        filtro |= Q(data=chave['data']) & mesmo_dia
+    return filtro
+
+
+class LancamentosUnificados:
+    """
+    Sequência preguiçosa de receitas e despesas, compatível com o Paginator.
+
+    `querysets` é um dicionário {tipo: queryset} já filtrado; informe só os
+    tipos desejados (ex.: {'R': receitas} para listar apenas receitas).
+    """
+
+    def __init__(self, querysets, select_related=('categoria', 'fornecedor')):
+        self.querysets = querysets
+        self.select_related = select_related
+        self._total = None
+
+    def chaves(self, cursor=None):
+        """
+        UNION ALL com (id, data, data_cadastro, tipo) ordenado no banco.
+        Com `cursor`, cada tabela é filtrada para depois da chave antes do UNION.
+        """
+        partes = []
+        for tipo, queryset in self.querysets.items():
+            if cursor is not None:
+                queryset = queryset.filter(filtro_apos_cursor(cursor, tipo))
+            partes.append(queryset.order_by().annotate(
+                tipo=Value(tipo, output_field=CharField(max_length=1))
+            ).values('id', 'data', 'data_cadastro', 'tipo'))
+        if not partes:
+            return Receita.objects.none().values('id', 'data', 'data_cadastro')
+        primeira, *demais = partes
+        if demais:
+            primeira = primeira.union(*demais, all=True)
+        return primeira.order_by(*ORDENACAO_LANCAMENTOS)
+
+    def count(self):
+        """Total de lançamentos, somando um COUNT(*) por tabela"""
+        if self._total is None:
+            self._total = sum(queryset.order_by().count() for queryset in self.querysets.values())
+        return self._total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, indice):
+        if not isinstance(indice, slice):
+            return self[indice:indice + 1][0]
+        return self.carregar(list(self.chaves()[indice]))
+
+    def pagina_apos(self, cursor, tamanho):
+        """
+        Página por cursor: até `tamanho` lançamentos depois de `cursor`
+        (None = primeira página). Retorna (lancamentos, proximo_cursor), com
+        proximo_cursor None na última página.
+        """
+        chave = decodificar_cursor(cursor) if cursor else None
+        chaves = list(self.chaves(chave)[:tamanho + 1])
+        proximo = codificar_cursor(chaves[tamanho - 1]) if len(chaves) > tamanho else None
+        return self.carregar(chaves[:tamanho]), proximo
+
+    def saldo_apos(self, chave):
+        """
+        Receitas menos despesas de todos os lançamentos que vêm depois de
+        `chave` na ordenação (os mais antigos). Uma agregação por tabela.
+        """
+        saldo = Decimal('0.00')
+        for tipo, queryset in self.querysets.items():
+            if chave is not None:
+                queryset = queryset.filter(filtro_apos_cursor(chave, tipo))
+            total = queryset.order_by().aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
+            saldo += total if tipo == 'R' else -total
+        return saldo
+
+    def carregar(self, chaves):
+        """Busca as instâncias das chaves da página, preservando a ordem"""
+        ids_por_tipo = {}
+        for chave in chaves:
+            ids_por_tipo.setdefault(chave['tipo'], []).append(chave['id'])
+
+        instancias = {}
+        for tipo, ids in ids_por_tipo.items():
+            objetos = MODELO_POR_TIPO[tipo].objects.select_related(*self.select_related).in_bulk(ids)
+            for pk, objeto in objetos.items():
+                instancias[(tipo, pk)] = objeto
+
+        return [
+            instancias[(chave['tipo'], chave['id'])]
+            for chave in chaves
+            if (chave['tipo'], chave['id']) in instancias
+        ]
@@ -0,0 +1,96 @@
+"""
+Listagem rápida (?mode=fast) de Receitas e Despesas
+
+Para leituras grandes (sincronização, planilhas, BI) a listagem pode pular
+o serializer: os lançamentos são lidos com values(), já com os nomes de
+categoria, fornecedor e usuário vindos do JOIN, e cada linha vira um dict
+com as mesmas chaves e os mesmos formatos da resposta normal. As URLs dos
+comprovantes são montadas a partir da URL base de mídia, calculada uma vez
+por requisição.
+
+O modo é opcional e somente leitura: os formatos de valor e datas vêm dos
+próprios campos do serializer, então as duas respostas são iguais.
+"""
+from django.conf import settings
+from django.utils.encoding import filepath_to_uri
+from rest_framework.response import Response
+
+# Colunas lidas do banco: campos do lançamento e nomes dos relacionados
+CAMPOS_RAPIDOS = (
+    'id', 'descricao', 'valor', 'data',
+    'categoria', 'categoria__nome', 'fornecedor', 'fornecedor__nome',
+    'comprovante', 'usuario', 'usuario__username', 'observacoes',
+    'data_cadastro', 'data_atualizacao',
+)
+
+# Linhas lidas por vez do cursor do banco (listagens sem paginação)
+TAMANHO_LOTE = 2000
+
+
+def modo_rapido(request):
+    """True se a requisição pediu a representação leve (?mode=fast)"""
+    return request.query_params.get('mode') == 'fast'
+
+
+class RepresentacaoRapida:
+    """Converte linhas de values(CAMPOS_RAPIDOS) no formato do serializer"""
+
+    def __init__(self, serializer_class, request):
+        campos = serializer_class().fields
+        # Mesmos formatos da resposta normal (REST_FRAMEWORK e casas decimais)
+        self.valor = campos['valor'].to_representation
+        self.data = campos['data'].to_representation
+        self.data_cadastro = campos['data_cadastro'].to_representation
+        self.data_atualizacao = campos['data_atualizacao'].to_representation
+        self.base_media = request.build_absolute_uri(settings.MEDIA_URL)
+
+    def __call__(self, linha):
+        comprovante = linha['comprovante']
+        url = self.base_media + filepath_to_uri(comprovante).lstrip('/') if comprovante else None
+        data_cadastro = linha['data_cadastro']
+        data_atualizacao = linha['data_atualizacao']
+        representacao = {
+            'id': linha['id'],
+            'descricao': linha['descricao'],
+            'valor': self.valor(linha['valor']),
+            'data': self.data(linha['data']),
+            'categoria': linha['categoria'],
+        }
+        # Como no serializer, os nomes ficam de fora quando não há relacionado
+        if linha['categoria'] is not None:
+            representacao['categoria_nome'] = linha['categoria__nome']
+        representacao['fornecedor'] = linha['fornecedor']
+        if linha['fornecedor'] is not None:
+            representacao['fornecedor_nome'] = linha['fornecedor__nome']
+        representacao.update({
+            'comprovante': url,
+            'comprovante_url': url,
+            'usuario': linha['usuario'],
+            'usuario_username': linha['usuario__username'],
+            'observacoes': linha['observacoes'],
+            'data_cadastro': self.data_cadastro(data_cadastro) if data_cadastro is not None else None,
+            'data_atualizacao': self.data_atualizacao(data_atualizacao) if data_atualizacao is not None else None,
+        })
+        return representacao
+
+
+class ListagemRapidaMixin:
+    """
+    Adiciona ?mode=fast ao list de um ViewSet de lançamentos. As ações que
+    devolvem listas (periodo, por exemplo) usam resposta_rapida().
+    """
+
+    def resposta_rapida(self, queryset, paginar=True):
+        """Response com os lançamentos de `queryset` na representação leve"""
+        representar = RepresentacaoRapida(self.get_serializer_class(), self.request)
+        linhas = queryset.values(*CAMPOS_RAPIDOS)
+        if paginar:
+            pagina = self.paginate_queryset(linhas)
+            if pagina is not None:
+                return self.get_paginated_response([representar(linha) for linha in pagina])
+        return Response([representar(linha) for linha in linhas.iterator(chunk_size=TAMANHO_LOTE)])
+
+    def list(self, request, *args, **kwargs):
+        if not modo_rapido(request):
+            return super().list(request, *args, **kwargs)
+        return self.resposta_rapida(self.filter_queryset(self.get_queryset()))
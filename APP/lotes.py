@@ -0,0 +1,234 @@
+"""
+Inclusão, edição e exclusão de Receitas e Despesas em lote
+
+POST, PATCH e DELETE em /api/v1/receitas/lote/ e /api/v1/despesas/lote/:
+
+    POST   [{"descricao": ..., "valor": ..., "data": ...}, ...]
+    PATCH  [{"id": 10, "valor": ...}, ...]
+    DELETE [10, 11, ...]
+
+Todos os itens são validados antes de gravar qualquer um: se algum for
+inválido nada é gravado e a resposta (400) traz os erros de cada item pelo
+índice. Caso contrário o lote é gravado numa transação só, com bulk_create,
+bulk_update ou um único DELETE, e a resposta traz o resultado de cada item.
+
+Os receivers de APP/signals.py ficam suspensos durante o lote; os resumos
+mensais, a versão dos dados do usuário e os registros de exclusão do feed
+são atualizados uma vez, ao final.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import Categoria, Fornecedor, RegistroExclusao
+from .resumos import estado_lancamento, registrar_alteracoes
+from .signals import operacao_em_lote
+from .versoes import incrementar_versao
+
+MENSAGEM_ITENS_INVALIDOS = 'Nenhum item foi gravado: corrija os itens com erro.'
+
+
+def tamanho_maximo_lote():
+    return getattr(settings, 'API_LOTE_MAXIMO', 1000)
+
+
+def e_id(valor):
+    # bool é subclasse de int, mas true/false no JSON não são ids
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+class ChavePrimariaPreCarregada(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que procura o objeto em context['relacionados']
+    (carregado uma vez para o lote inteiro) em vez de um SELECT por item
+    """
+
+    def to_internal_value(self, data):
+        carregados = self.context.get('relacionados', {}).get(self.queryset.model)
+        if carregados is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return carregados[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+def serializer_lote(serializer_class):
+    """
+    Serializer do lote: o usuário vem sempre da requisição e os relacionados
+    são buscados em context['relacionados']
+    """
+    meta = type('Meta', (serializer_class.Meta,), {
+        'read_only_fields': [*serializer_class.Meta.read_only_fields, 'usuario'],
+    })
+    return type(f'{serializer_class.__name__}Lote', (serializer_class,), {
+        'Meta': meta,
+        'serializer_related_field': ChavePrimariaPreCarregada,
+    })
+
+
+def carregar_relacionados(usuario, itens):
+    """
+    Categorias (do usuário ou padrão) e fornecedores (do usuário) citados no
+    lote, em uma consulta por modelo. Ids de outros usuários ficam de fora e
+    são recusados na validação.
+    """
+    ids = {'categoria': set(), 'fornecedor': set()}
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        for campo, encontrados in ids.items():
+            valor = item.get(campo)
+            if e_id(valor) or (isinstance(valor, str) and valor.isdigit()):
+                encontrados.add(int(valor))
+    return {
+        Categoria: Categoria.objects.filter(Q(usuario=usuario) | Q(is_padrao=True)).in_bulk(ids['categoria']),
+        Fornecedor: Fornecedor.objects.filter(usuario=usuario).in_bulk(ids['fornecedor']),
+    }
+
+
+def erro_lote(mensagem, erros=None):
+    corpo = {'error': mensagem}
+    if erros:
+        corpo['resultados'] = erros
+    return Response(corpo, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LoteMixin:
+    """Adiciona a ação `lote` (POST/PATCH/DELETE) a um ViewSet de lançamentos"""
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def lote(self, request):
+        """
+        Inclui (POST), edita (PATCH, itens com "id") ou exclui (DELETE, lista
+        de ids) vários lançamentos de uma vez
+        """
+        itens = request.data
+        if not isinstance(itens, list) or not itens:
+            return erro_lote('Envie uma lista não vazia de itens.')
+        if len(itens) > tamanho_maximo_lote():
+            return erro_lote(f'O lote aceita no máximo {tamanho_maximo_lote()} itens.')
+
+        if request.method == 'POST':
+            return self.incluir_lote(itens)
+        if request.method == 'PATCH':
+            return self.editar_lote(itens)
+        return self.excluir_lote(itens)
+
+    def validar_itens(self, itens, instancias=None):
+        """Valida todos os itens; retorna (dados validados, erros por índice)"""
+        classe = serializer_lote(self.get_serializer_class())
+        context = {
+            **self.get_serializer_context(),
+            'relacionados': carregar_relacionados(self.request.user, itens),
+        }
+        # Um serializer só para o lote: montar os campos de um ModelSerializer
+        # custa mais que validar um item
+        serializer = classe(context=context, partial=instancias is not None)
+        validos, erros = [], []
+        for indice, item in enumerate(itens):
+            if not isinstance(item, dict):
+                erros.append({'indice': indice, 'erros': {'non_field_errors': ['Item inválido.']}})
+                continue
+            serializer.instance = instancias[indice] if instancias is not None else None
+            try:
+                validos.append(serializer.run_validation(item))
+            except serializers.ValidationError as erro:
+                erros.append({'indice': indice, 'erros': serializers.as_serializer_error(erro)})
+        return validos, erros
+
+    def incluir_lote(self, itens):
+        modelo = self.get_queryset().model
+        validos, erros = self.validar_itens(itens)
+        if erros:
+            return erro_lote(MENSAGEM_ITENS_INVALIDOS, erros)
+
+        usuario = self.request.user
+        objetos = [modelo(usuario=usuario, **dados) for dados in validos]
+        with transaction.atomic(), operacao_em_lote():
+            objetos = modelo.objects.bulk_create(objetos)
+            registrar_alteracoes(modelo, [(None, estado_lancamento(objeto)) for objeto in objetos])
+            incrementar_versao(usuario.pk)
+
+        return Response({'resultados': [
+            {'indice': indice, 'id': objeto.pk, 'status': 'criado'}
+            for indice, objeto in enumerate(objetos)
+        ]}, status=status.HTTP_201_CREATED)
+
+    def editar_lote(self, itens):
+        modelo = self.get_queryset().model
+        ids = [item.get('id') if isinstance(item, dict) else None for item in itens]
+        existentes = self.get_queryset().in_bulk([pk for pk in ids if e_id(pk)])
+
+        erros = []
+        vistos = set()
+        for indice, pk in enumerate(ids):
+            if not e_id(pk) or pk not in existentes:
+                erros.append({'indice': indice, 'erros': {'id': ['Lançamento não encontrado.']}})
+            elif pk in vistos:
+                erros.append({'indice': indice, 'erros': {'id': ['Lançamento repetido no lote.']}})
+            else:
+                vistos.add(pk)
+        if erros:
+            return erro_lote(MENSAGEM_ITENS_INVALIDOS, erros)
+
+        instancias = [existentes[pk] for pk in ids]
+        validos, erros = self.validar_itens(itens, instancias)
+        if erros:
+            return erro_lote(MENSAGEM_ITENS_INVALIDOS, erros)
+
+        # auto_now não vale no bulk_update: a data de atualização (usada pelo
+        # feed de alterações) é gravada explicitamente
+        agora = timezone.now()
+        campos = {'data_atualizacao'}
+        alteracoes = []
+        for instancia, dados in zip(instancias, validos):
+            anterior = estado_lancamento(instancia)
+            for campo, valor in dados.items():
+                setattr(instancia, campo, valor)
+            instancia.data_atualizacao = agora
+            campos.update(dados)
+            alteracoes.append((anterior, estado_lancamento(instancia)))
+
+        with transaction.atomic(), operacao_em_lote():
+            modelo.objects.bulk_update(instancias, sorted(campos), batch_size=500)
+            registrar_alteracoes(modelo, alteracoes)
+            incrementar_versao(self.request.user.pk)
+
+        return Response({'resultados': [
+            {'indice': indice, 'id': instancia.pk, 'status': 'atualizado'}
+            for indice, instancia in enumerate(instancias)
+        ]})
+
+    def excluir_lote(self, ids):
+        modelo = self.get_queryset().model
+        existentes = self.get_queryset().in_bulk([pk for pk in ids if e_id(pk)])
+        erros = [
+            {'indice': indice, 'erros': {'id': ['Lançamento não encontrado.']}}
+            for indice, pk in enumerate(ids) if not e_id(pk) or pk not in existentes
+        ]
+        if erros:
+            return erro_lote(MENSAGEM_ITENS_INVALIDOS, erros)
+
+        usuario = self.request.user
+        with transaction.atomic(), operacao_em_lote():
+            modelo.objects.filter(pk__in=existentes).delete()
+            registrar_alteracoes(modelo, [(estado_lancamento(objeto), None) for objeto in existentes.values()])
+            RegistroExclusao.objects.bulk_create([
+                RegistroExclusao(usuario=usuario, modelo=modelo._meta.model_name, objeto_id=pk)
+                for pk in existentes
+            ])
+            incrementar_versao(usuario.pk)
+
+        return Response({'resultados': [
+            {'indice': indice, 'id': pk, 'status': 'excluido'}
+            for indice, pk in enumerate(ids)
+        ]})
@@ -0,0 +1,122 @@
+"""
+Benchmark da compressão das respostas (bytes trafegados)
+
+Gera lançamentos sintéticos para um usuário temporário e busca o dashboard
+(HTML) e uma página de 1000 receitas da API (JSON) sem compressão, com gzip
+e com Brotli, passando por todo o MIDDLEWARE. Mostra o tamanho enviado, a
+redução e o tempo de cada variação, e confere que o conteúdo descomprimido
+é idêntico (a menos do token CSRF, que muda a cada requisição, e do
+preenchimento aleatório que acompanha o Brotli). Tudo roda
+dentro de uma transação revertida ao final.
+
+Uso:
+    python manage.py benchmark_compressao --linhas 1000
+"""
+import datetime
+import gzip
+import random
+import re
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from APP.compressao import _brotli, sem_preenchimento
+from APP.models import Despesa, Receita
+
+# Token CSRF do HTML, mascarado de novo a cada requisição
+TOKEN_CSRF = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def sem_token_csrf(corpo):
+    """Corpo sem as ocorrências do token CSRF, para comparar respostas"""
+    encontrado = TOKEN_CSRF.search(corpo)
+    return corpo.replace(encontrado.group(1), b'') if encontrado else corpo
+
+
+class Command(BaseCommand):
+    help = 'Mede o tamanho e o tempo das respostas sem compressão, com gzip e com Brotli'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1000,
+                            help='Receitas (e despesas) a gerar; a página da API traz todas as receitas')
+        parser.add_argument('--repeticoes', type=int, default=5,
+                            help='Requisições de cada variação (vale a mediana)')
+
+    def handle(self, *args, **options):
+        brotli = _brotli()
+        codificacoes = ['identity', 'gzip'] + (['br'] if brotli else [])
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('Pacote Brotli não instalado: medindo só gzip'))
+
+        with transaction.atomic():
+            usuario = self.popular(options['linhas'])
+            cliente = Client(HTTP_HOST='localhost')
+            cliente.force_login(usuario)
+
+            hoje = datetime.date.today()
+            urls = {
+                'Dashboard (HTML)': reverse('dashboard'),
+                f"API, {options['linhas']} receitas (JSON)": (
+                    f'/api/v1/receitas/periodo/?data_inicio={hoje - datetime.timedelta(days=3650)}'
+                    f'&data_fim={hoje}&format=json'
+                ),
+            }
+            for nome, url in urls.items():
+                self.stdout.write(nome)
+                original = None
+                for codificacao in codificacoes:
+                    corpo, tamanho, mediana = self.medir(cliente, url, codificacao, options['repeticoes'])
+                    if codificacao == 'gzip':
+                        corpo = gzip.decompress(corpo)
+                    elif codificacao == 'br':
+                        corpo = brotli.decompress(corpo)
+                    corpo = sem_token_csrf(sem_preenchimento(corpo))
+                    if original is None:
+                        original = (corpo, tamanho)
+                    elif corpo != original[0]:
+                        raise CommandError(f'Conteúdo diferente com {codificacao} em {url}')
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  {codificacao:>8}: {tamanho / 1024:8.1f} KB '
+                        f'({tamanho / original[1]:6.1%}) em {mediana * 1000:.1f} ms'
+                    ))
+
+            # Nada do benchmark permanece no banco
+            transaction.set_rollback(True)
+
+    def popular(self, linhas):
+        """Gera um usuário com receitas e despesas nos últimos 12 meses"""
+        rng = random.Random(42)
+        usuario = User.objects.create(username=f'benchmark_compressao_{time.time_ns()}')
+        hoje = datetime.date.today()
+        for modelo, nome in ((Receita, 'Receita'), (Despesa, 'Despesa')):
+            modelo.objects.bulk_create([
+                modelo(
+                    usuario=usuario,
+                    descricao=f'{nome} {i}',
+                    valor=Decimal(rng.randint(100, 500000)) / 100,
+                    data=hoje - datetime.timedelta(days=rng.randint(0, 364)),
+                )
+                for i in range(linhas)
+            ], batch_size=5000)
+        self.stdout.write(f'{linhas} receitas e {linhas} despesas geradas')
+        return usuario
+
+    def medir(self, cliente, url, codificacao, repeticoes):
+        """(corpo, bytes enviados, tempo mediano) de `url` com o Accept-Encoding dado"""
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resposta = cliente.get(url, HTTP_ACCEPT_ENCODING=codificacao)
+            tempos.append(time.perf_counter() - inicio)
+        if resposta.status_code != 200:
+            raise CommandError(f'{url} respondeu {resposta.status_code}')
+        recebida = resposta.get('Content-Encoding', 'identity')
+        if recebida != codificacao:
+            raise CommandError(f'{url} veio com {recebida} em vez de {codificacao}')
+        return resposta.content, len(resposta.content), statistics.median(tempos)
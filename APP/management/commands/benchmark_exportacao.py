@@ -0,0 +1,138 @@
+"""
+Benchmark das exportações de lançamentos
+
+Gera lançamentos sintéticos para um usuário temporário e compara a
+exportação Excel atual (write_only + NamedStyles) com a implementação
+anterior (Workbook comum com estilos célula a célula): tempo total e pico
+de memória (tracemalloc, medido em uma segunda execução). Tudo roda dentro
+de uma transação revertida ao final.
+
+Uso:
+    python manage.py benchmark_exportacao --linhas 100000
+"""
+import datetime
+import random
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from APP.exportacao import escrever_excel, querysets_exportacao
+from APP.models import Categoria, Despesa, Fornecedor, Receita
+
+
+def excel_legado(querysets, destino):
+    """Exportação Excel como era feita antes (mantida só para comparação)"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Lançamentos'
+    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    header_font = Font(bold=True, color='FFFFFF', size=12)
+    border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                    top=Side(style='thin'), bottom=Side(style='thin'))
+
+    headers = ['Data', 'Tipo', 'Descrição', 'Categoria', 'Fornecedor', 'CPF/CNPJ', 'Valor']
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.border = border
+
+    row = 2
+    for tipo, nome, sinal, cor in (('R', 'Receita', 1, '198754'), ('D', 'Despesa', -1, 'DC3545')):
+        if tipo not in querysets:
+            continue
+        for lancamento in querysets[tipo].select_related('categoria', 'fornecedor').order_by('data'):
+            ws.cell(row=row, column=1, value=lancamento.data.strftime('%d/%m/%Y'))
+            ws.cell(row=row, column=2, value=nome)
+            ws.cell(row=row, column=3, value=lancamento.descricao)
+            ws.cell(row=row, column=4, value=lancamento.categoria.nome if lancamento.categoria else '-')
+            ws.cell(row=row, column=5, value=lancamento.fornecedor.nome if lancamento.fornecedor else '-')
+            ws.cell(row=row, column=6, value=lancamento.fornecedor.cpf_cnpj if lancamento.fornecedor else '-')
+            ws.cell(row=row, column=7, value=sinal * float(lancamento.valor))
+            for col in range(1, 8):
+                cell = ws.cell(row=row, column=col)
+                cell.border = border
+                if col == 7:
+                    cell.number_format = 'R$ #,##0.00'
+                    cell.font = Font(color=cor, bold=True)
+            row += 1
+    wb.save(destino)
+
+
+class Command(BaseCommand):
+    help = 'Compara tempo e pico de memória das exportações de lançamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=100000,
+                            help='Total de lançamentos a gerar (metade receitas, metade despesas)')
+        parser.add_argument('--sem-legado', action='store_true',
+                            help='Não executa a implementação anterior (lenta em volumes grandes)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            usuario = self.popular(options['linhas'])
+            querysets = querysets_exportacao(usuario, {})
+
+            exportacoes = [('Excel write_only', escrever_excel)]
+            if not options['sem_legado']:
+                exportacoes.append(('Excel legado', excel_legado))
+            for nome, exportar in exportacoes:
+                self.medir(nome, lambda destino: exportar(querysets, destino))
+
+            # Nada do benchmark permanece no banco
+            transaction.set_rollback(True)
+
+    def popular(self, linhas):
+        """Gera um usuário com categorias, fornecedores e lançamentos"""
+        rng = random.Random(42)
+        usuario = User.objects.create(username=f'benchmark_exportacao_{time.time_ns()}')
+        categorias = Categoria.objects.bulk_create([
+            Categoria(usuario=usuario, nome=f'Categoria {i}', tipo=tipo)
+            for i in range(10) for tipo in ('R', 'D')
+        ])
+        fornecedores = Fornecedor.objects.bulk_create([
+            Fornecedor(usuario=usuario, nome=f'Fornecedor {i}', cpf_cnpj=f'{i:014d}')
+            for i in range(100)
+        ])
+        hoje = datetime.date.today()
+        for modelo in (Receita, Despesa):
+            modelo.objects.bulk_create([
+                modelo(
+                    usuario=usuario,
+                    descricao=f'Lançamento {i}',
+                    valor=Decimal(rng.randint(100, 500000)) / 100,
+                    data=hoje - datetime.timedelta(days=rng.randint(0, 3650)),
+                    categoria=rng.choice(categorias),
+                    fornecedor=rng.choice(fornecedores + [None]),
+                )
+                for i in range(linhas // 2)
+            ], batch_size=5000)
+        self.stdout.write(f'{linhas} lançamentos gerados')
+        return usuario
+
+    def medir(self, nome, exportar):
+        # Tempo e memória em execuções separadas: o tracemalloc deixa cada
+        # alocação bem mais lenta e distorceria o tempo
+        with tempfile.TemporaryFile() as destino:
+            inicio = time.perf_counter()
+            exportar(destino)
+            duracao = time.perf_counter() - inicio
+            tamanho = destino.tell()
+        with tempfile.TemporaryFile() as destino:
+            tracemalloc.start()
+            exportar(destino)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.stdout.write(self.style.SUCCESS(
+            f'{nome}: {duracao:.2f}s, pico de memória {pico / 1024 / 1024:.1f} MB, '
+            f'arquivo {tamanho / 1024 / 1024:.1f} MB'
+        ))
@@ -0,0 +1,153 @@
+"""
+Benchmark dos índices compostos de Receita/Despesa
+
+Popula o banco configurado com lançamentos sintéticos, mede o plano de
+execução (EXPLAIN) e a latência das consultas mais usadas com e sem os
+índices compostos e desfaz tudo ao final (a execução inteira roda dentro
+de uma transação revertida). Use uma cópia do banco de produção.
+
+Uso:
+    python manage.py benchmark_indices --linhas 1000000
+"""
+import datetime
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from APP.models import Categoria, Despesa, Fornecedor, Receita
+
+
+class Command(BaseCommand):
+    help = 'Compara plano e latência das consultas de lançamentos com e sem os índices compostos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1000000,
+                            help='Total de lançamentos a gerar (metade receitas, metade despesas)')
+        parser.add_argument('--usuarios', type=int, default=20,
+                            help='Quantidade de usuários entre os quais os lançamentos são distribuídos')
+        parser.add_argument('--repeticoes', type=int, default=5,
+                            help='Execuções de cada consulta (é reportado o melhor tempo)')
+
+    def handle(self, *args, **options):
+        # O SQLite só permite alterar o schema dentro da transação com as
+        # checagens de chave estrangeira desligadas antes de ela começar
+        with connection.constraint_checks_disabled(), transaction.atomic():
+            alvo = self.popular(options['linhas'], options['usuarios'])
+            consultas = self.consultas(*alvo)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== Sem índices compostos =='))
+            self.remover_indices()
+            self.medir(consultas, options['repeticoes'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== Com índices compostos =='))
+            self.criar_indices()
+            self.medir(consultas, options['repeticoes'])
+
+            # Nada do benchmark permanece no banco
+            transaction.set_rollback(True)
+
+    def popular(self, linhas, quantidade_usuarios):
+        """Gera usuários, categorias, fornecedores e lançamentos com bulk_create"""
+        inicio = time.perf_counter()
+        rng = random.Random(42)
+        User.objects.bulk_create([
+            User(username=f'benchmark_indices_{i}') for i in range(quantidade_usuarios)
+        ])
+        usuarios = list(User.objects.filter(username__startswith='benchmark_indices_'))
+
+        Categoria.objects.bulk_create([
+            Categoria(usuario=usuario, nome=f'Categoria {i}', tipo=tipo)
+            for usuario in usuarios for i in range(10) for tipo in ('R', 'D')
+        ])
+        Fornecedor.objects.bulk_create([
+            Fornecedor(usuario=usuario, nome=f'Fornecedor {i}')
+            for usuario in usuarios for i in range(50)
+        ])
+        categorias, fornecedores = defaultdict(list), defaultdict(list)
+        for categoria in Categoria.objects.filter(usuario__in=usuarios):
+            categorias[categoria.usuario_id].append(categoria)
+        for fornecedor in Fornecedor.objects.filter(usuario__in=usuarios):
+            fornecedores[fornecedor.usuario_id].append(fornecedor)
+
+        hoje = datetime.date.today()
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        lote = 10000
+        for modelo in (Receita, Despesa):
+            pendentes = []
+            for i in range(linhas // 2):
+                usuario = usuarios[i % len(usuarios)]
+                pendentes.append(modelo(
+                    usuario=usuario,
+                    descricao=f'Lançamento {i}',
+                    valor=Decimal(rng.randint(100, 500000)) / 100,
+                    data=hoje - datetime.timedelta(days=rng.randint(0, 3650)),
+                    categoria=rng.choice(categorias[usuario.pk]),
+                    fornecedor=rng.choice(fornecedores[usuario.pk]),
+                    data_cadastro=agora,
+                ))
+                if len(pendentes) == lote:
+                    modelo.objects.bulk_create(pendentes)
+                    pendentes = []
+            modelo.objects.bulk_create(pendentes)
+
+        self.stdout.write(f'{linhas} lançamentos gerados em {time.perf_counter() - inicio:.1f}s')
+        usuario = usuarios[0]
+        return usuario, categorias[usuario.pk][0], fornecedores[usuario.pk][0]
+
+    def consultas(self, usuario, categoria, fornecedor):
+        """Consultas representativas de APP/views.py e APP/api_views.py"""
+        hoje = datetime.date.today()
+        inicio_mes = hoje.replace(day=1)
+        inicio_ano = datetime.date(hoje.year, 1, 1)
+        return [
+            ('Total do mês (dashboard)',
+             Receita.objects.filter(usuario=usuario, data__gte=inicio_mes, data__lte=hoje).order_by(),
+             lambda qs: qs.aggregate(Sum('valor'))),
+            ('Primeira página da listagem',
+             Receita.objects.filter(usuario=usuario).order_by('-data', '-data_cadastro'),
+             lambda qs: list(qs[:25])),
+            ('Filtro por categoria no ano',
+             Despesa.objects.filter(usuario=usuario, categoria=categoria, data__gte=inicio_ano).order_by(),
+             lambda qs: qs.aggregate(Sum('valor'))),
+            ('Lançamentos do fornecedor',
+             Despesa.objects.filter(fornecedor=fornecedor).order_by('-data'),
+             lambda qs: list(qs[:25])),
+        ]
+
+    def medir(self, consultas, repeticoes):
+        for nome, queryset, executar in consultas:
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                executar(queryset.all())
+                tempos.append(time.perf_counter() - inicio)
+            self.stdout.write(self.style.SUCCESS(f'{nome}: {min(tempos) * 1000:.2f} ms'))
+            self.stdout.write(f'  plano: {queryset.explain()}')
+
+    def indices(self):
+        for modelo in (Receita, Despesa):
+            for indice in modelo._meta.indexes:
+                yield modelo, indice
+
+    def remover_indices(self):
+        with connection.schema_editor(atomic=False) as editor:
+            for modelo, indice in self.indices():
+                editor.remove_index(modelo, indice)
+        self.atualizar_estatisticas()
+
+    def criar_indices(self):
+        with connection.schema_editor(atomic=False) as editor:
+            for modelo, indice in self.indices():
+                editor.add_index(modelo, indice)
+        self.atualizar_estatisticas()
+
+    def atualizar_estatisticas(self):
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
@@ -0,0 +1,97 @@
+"""
+Benchmark da listagem de lançamentos pela API
+
+Gera receitas sintéticas para um usuário temporário e mede o endpoint
+/api/v1/receitas/periodo/ (lista sem paginação) com o serializer e com
+?mode=fast (values() sem serializer), incluindo a geração do JSON. Confere
+também que as duas respostas são iguais. Tudo roda dentro de uma transação
+revertida ao final.
+
+Uso:
+    python manage.py benchmark_listagem --linhas 10000
+"""
+import datetime
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from APP.api_views import ReceitaViewSet
+from APP.models import Categoria, Fornecedor, Receita
+
+
+class Command(BaseCommand):
+    help = 'Compara a listagem de receitas com serializer e com ?mode=fast'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=10000,
+                            help='Total de receitas a gerar')
+        parser.add_argument('--repeticoes', type=int, default=5,
+                            help='Execuções de cada modo (vale a mediana)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            usuario = self.popular(options['linhas'])
+            view = ReceitaViewSet.as_view({'get': 'periodo'})
+
+            respostas = {}
+            for nome, parametros in (('Serializer', {}), ('mode=fast', {'mode': 'fast'})):
+                respostas[nome] = self.medir(nome, view, usuario, parametros, options['repeticoes'])
+
+            if respostas['Serializer'] != respostas['mode=fast']:
+                raise CommandError('As respostas dos dois modos são diferentes')
+            self.stdout.write('Respostas idênticas nos dois modos')
+
+            # Nada do benchmark permanece no banco
+            transaction.set_rollback(True)
+
+    def popular(self, linhas):
+        """Gera um usuário com categorias, fornecedores e receitas"""
+        rng = random.Random(42)
+        usuario = User.objects.create(username=f'benchmark_listagem_{time.time_ns()}')
+        categorias = Categoria.objects.bulk_create([
+            Categoria(usuario=usuario, nome=f'Categoria {i}', tipo='R') for i in range(10)
+        ])
+        fornecedores = Fornecedor.objects.bulk_create([
+            Fornecedor(usuario=usuario, nome=f'Fornecedor {i}', cpf_cnpj=f'{i:014d}')
+            for i in range(100)
+        ])
+        hoje = datetime.date.today()
+        Receita.objects.bulk_create([
+            Receita(
+                usuario=usuario,
+                descricao=f'Receita {i}',
+                valor=Decimal(rng.randint(100, 500000)) / 100,
+                data=hoje - datetime.timedelta(days=rng.randint(0, 3650)),
+                categoria=rng.choice(categorias + [None]),
+                fornecedor=rng.choice(fornecedores + [None]),
+                comprovante=f'comprovantes/receitas/2024/01/nota {i}.pdf' if rng.random() < 0.2 else '',
+            )
+            for i in range(linhas)
+        ], batch_size=5000)
+        self.stdout.write(f'{linhas} receitas geradas')
+        return usuario
+
+    def medir(self, nome, view, usuario, parametros, repeticoes):
+        """Tempo mediano da requisição (consulta + JSON) e tamanho da resposta"""
+        fabrica = APIRequestFactory()
+        tempos = []
+        for _ in range(repeticoes):
+            requisicao = fabrica.get('/api/v1/receitas/periodo/', {**parametros, 'format': 'json'},
+                                     HTTP_HOST='localhost')
+            force_authenticate(requisicao, user=usuario)
+            inicio = time.perf_counter()
+            resposta = view(requisicao)
+            resposta.render()
+            tempos.append(time.perf_counter() - inicio)
+        mediana = statistics.median(tempos)
+        self.stdout.write(self.style.SUCCESS(
+            f'{nome}: {mediana * 1000:.0f} ms (mediana de {repeticoes}), '
+            f'{len(resposta.content) / 1024:.0f} KB'
+        ))
+        return resposta.content
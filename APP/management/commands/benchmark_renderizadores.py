@@ -0,0 +1,121 @@
+"""
+Benchmark dos renderizadores JSON da API
+
+Gera lançamentos sintéticos para um usuário temporário, obtém os dados
+(ainda não renderizados) de /api/v1/receitas/periodo/, /relatorios/mensal/
+e /relatorios/pivot/ e mede só a geração do JSON com o JSONRenderer do DRF
+e com o JSONRapidoRenderer, com o orjson e com o json da biblioteca
+padrão. Confere também que as duas variações do renderizador rápido geram
+exatamente os mesmos bytes. Tudo roda dentro de uma transação revertida ao
+final.
+
+Uso:
+    python manage.py benchmark_renderizadores --linhas 10000
+"""
+import datetime
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from APP.api_views import ReceitaViewSet, RelatorioViewSet
+from APP.models import Categoria, Despesa, Receita
+from APP.renderizadores import JSONRapidoRenderer, _orjson
+
+
+class Command(BaseCommand):
+    help = 'Compara o tempo de geração do JSON do DRF com o do renderizador rápido (orjson e json)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=10000,
+                            help='Receitas (e despesas) a gerar')
+        parser.add_argument('--repeticoes', type=int, default=7,
+                            help='Renderizações de cada variação (vale a mediana)')
+
+    def handle(self, *args, **options):
+        python = JSONRapidoRenderer()
+        python.usar_orjson = False
+        renderizadores = {'DRF JSONRenderer': JSONRenderer(), 'Rápido (json)': python}
+        if _orjson() is not None:
+            renderizadores['Rápido (orjson)'] = JSONRapidoRenderer()
+        else:
+            self.stdout.write(self.style.WARNING('Pacote orjson não instalado: medindo só o json'))
+
+        with transaction.atomic():
+            usuario = self.popular(options['linhas'])
+            hoje = datetime.date.today()
+            cargas = {
+                f"periodo ({options['linhas']} receitas)": self.dados(
+                    ReceitaViewSet, 'periodo', usuario,
+                    {'data_inicio': f'{hoje.year}-01-01', 'data_fim': f'{hoje.year}-12-31'},
+                ),
+                'mensal': self.dados(RelatorioViewSet, 'mensal', usuario, {'mes': hoje.month, 'ano': hoje.year}),
+                'pivot (mes x categoria)': self.dados(
+                    RelatorioViewSet, 'pivot', usuario,
+                    {'dimensoes': 'tipo,mes,categoria', 'medidas': 'soma,quantidade,media,minimo,maximo'},
+                ),
+            }
+
+            for nome, dados in cargas.items():
+                self.stdout.write(nome)
+                base = None
+                saidas = {}
+                for rotulo, renderizador in renderizadores.items():
+                    conteudo, mediana = self.medir(renderizador, dados, options['repeticoes'])
+                    saidas[rotulo] = conteudo
+                    base = base or mediana
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  {rotulo:>17}: {mediana * 1000:8.2f} ms ({base / mediana:4.1f}x), '
+                        f'{len(conteudo) / 1024:.0f} KB'
+                    ))
+                if 'Rápido (orjson)' in saidas and saidas['Rápido (orjson)'] != saidas['Rápido (json)']:
+                    raise CommandError(f'orjson e json geraram saídas diferentes em {nome}')
+
+            # Nada do benchmark permanece no banco
+            transaction.set_rollback(True)
+
+    def popular(self, linhas):
+        """Gera um usuário com categorias, receitas e despesas no ano atual"""
+        rng = random.Random(42)
+        usuario = User.objects.create(username=f'benchmark_renderizadores_{time.time_ns()}')
+        hoje = datetime.date.today()
+        for modelo, tipo, nome in ((Receita, 'R', 'Receita'), (Despesa, 'D', 'Despesa')):
+            categorias = Categoria.objects.bulk_create([
+                Categoria(usuario=usuario, nome=f'{nome} {i}', tipo=tipo) for i in range(10)
+            ])
+            modelo.objects.bulk_create([
+                modelo(
+                    usuario=usuario,
+                    descricao=f'{nome} {i}',
+                    valor=Decimal(rng.randint(100, 500000)) / 100,
+                    data=datetime.date(hoje.year, rng.randint(1, 12), rng.randint(1, 28)),
+                    categoria=rng.choice(categorias + [None]),
+                )
+                for i in range(linhas)
+            ], batch_size=5000)
+        self.stdout.write(f'{linhas} receitas e {linhas} despesas geradas')
+        return usuario
+
+    def dados(self, viewset, acao, usuario, parametros):
+        """Dados da resposta de uma action, antes da renderização"""
+        requisicao = APIRequestFactory().get('/', parametros, HTTP_HOST='localhost')
+        force_authenticate(requisicao, user=usuario)
+        resposta = viewset.as_view({'get': acao})(requisicao)
+        if resposta.status_code != 200:
+            raise CommandError(f'{acao} respondeu {resposta.status_code}')
+        return resposta.data
+
+    def medir(self, renderizador, dados, repeticoes):
+        """(JSON gerado, tempo mediano de renderização)"""
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            conteudo = renderizador.render(dados, 'application/json')
+            tempos.append(time.perf_counter() - inicio)
+        return conteudo, statistics.median(tempos)
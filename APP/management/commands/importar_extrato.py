@@ -0,0 +1,64 @@
+"""
+Importa um extrato bancário (OFX ou CSV) pela linha de comando
+
+Mesma importação da tela de lançamentos (APP/importacao.py), útil para
+carregar históricos grandes. Mostra o andamento e as linhas por segundo.
+
+Uso:
+    python manage.py importar_extrato extrato.ofx --usuario joao --conta 3
+"""
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from APP.importacao import FORMATOS_EXTRATO, TAMANHO_LOTE, ErroImportacao, importar_extrato
+from APP.models import ContaBancaria
+
+
+class Command(BaseCommand):
+    help = 'Importa um extrato OFX/CSV como receitas e despesas de uma conta bancária'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo OFX ou CSV')
+        parser.add_argument('--usuario', required=True, help='Username do dono da conta')
+        parser.add_argument('--conta', type=int, required=True, help='Id da ContaBancaria')
+        parser.add_argument('--formato', choices=FORMATOS_EXTRATO,
+                            help='Formato do arquivo (padrão: detectar)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Linhas gravadas por transação')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário '{options['usuario']}' não encontrado")
+        try:
+            conta = ContaBancaria.objects.get(pk=options['conta'], perfil_empresa__usuario=usuario)
+        except ContaBancaria.DoesNotExist:
+            raise CommandError(f"Conta {options['conta']} não encontrada para o usuário")
+        if not os.path.isfile(options['arquivo']):
+            raise CommandError(f"Arquivo não encontrado: {options['arquivo']}")
+
+        def progresso(lidas):
+            self.stdout.write(f'{lidas} linhas lidas', ending='\r')
+            self.stdout.flush()
+
+        with open(options['arquivo'], 'rb') as arquivo:
+            try:
+                resultado = importar_extrato(
+                    arquivo, usuario, conta, options['formato'], options['lote'], progresso
+                )
+            except ErroImportacao as erro:
+                raise CommandError(str(erro))
+
+        self.stdout.write('')
+        for erro in resultado.erros:
+            self.stdout.write(self.style.WARNING(erro))
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.lidas} linhas em {resultado.segundos:.1f}s '
+            f'({resultado.linhas_por_segundo:.0f} linhas/s): '
+            f'{resultado.receitas} receitas e {resultado.despesas} despesas criadas, '
+            f'{resultado.duplicadas} já importadas, {resultado.ignoradas} ignoradas, '
+            f'{resultado.invalidas} inválidas'
+        ))
@@ -0,0 +1,32 @@
+"""
+Reconstrói a tabela de resumos mensais (ResumoMensal) a partir dos lançamentos
+
+Uso:
+    python manage.py rebuild_rollups
+    python manage.py rebuild_rollups --usuario joao
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from APP.resumos import reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os resumos mensais de receitas e despesas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='Username do usuário a reconstruir (padrão: todos)',
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário '{options['usuario']}' não encontrado")
+
+        total = reconstruir_resumos(usuario)
+        self.stdout.write(self.style.SUCCESS(f'{total} resumo(s) mensal(is) reconstruído(s).'))
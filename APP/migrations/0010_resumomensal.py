@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def popular_resumos(apps, schema_editor):
+    """Gera os resumos mensais dos lançamentos já existentes"""
+    ResumoMensal = apps.get_model('APP', 'ResumoMensal')
+    novos = []
+    for nome_modelo, tipo in (('Receita', 'R'), ('Despesa', 'D')):
+        modelo = apps.get_model('APP', nome_modelo)
+        agrupados = modelo.objects.annotate(
+            ano=ExtractYear('data'),
+            mes=ExtractMonth('data'),
+        ).values(
+            'usuario_id', 'ano', 'mes', 'categoria_id', 'fornecedor_id'
+        ).annotate(soma=Sum('valor'), qtd=Count('id')).order_by()
+        for item in agrupados:
+            novos.append(ResumoMensal(
+                usuario_id=item['usuario_id'],
+                ano=item['ano'],
+                mes=item['mes'],
+                tipo=tipo,
+                categoria_id=item['categoria_id'],
+                fornecedor_id=item['fornecedor_id'],
+                total=item['soma'],
+                quantidade=item['qtd'],
+            ))
+    ResumoMensal.objects.bulk_create(novos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0009_dasn_simei'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.IntegerField()),
+                ('mes', models.IntegerField()),
+                ('tipo', models.CharField(choices=[('R', 'Receita'), ('D', 'Despesa')], max_length=1)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='APP.categoria')),
+                ('fornecedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='APP.fornecedor')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal',
+                'verbose_name_plural': 'Resumos Mensais',
+                'indexes': [models.Index(fields=['usuario', 'ano', 'mes', 'tipo'], name='resumo_usuario_periodo_idx')],
+            },
+        ),
+        migrations.RunPython(popular_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0010_resumomensal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='despesa',
+            index=models.Index(fields=['usuario', 'data', 'data_cadastro'], name='despesa_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despesa',
+            index=models.Index(fields=['usuario', 'categoria', 'data'], name='despesa_usu_cat_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despesa',
+            index=models.Index(fields=['fornecedor', 'data'], name='despesa_fornec_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['usuario', 'data', 'data_cadastro'], name='receita_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['usuario', 'categoria', 'data'], name='receita_usu_cat_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['fornecedor', 'data'], name='receita_fornec_data_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+"""
+Índice de busca textual de Receita/Despesa (descricao + observacoes)
+
+SQLite: tabela FTS5 de conteúdo externo por modelo, com tokenizer
+unicode61 sem acentos, mantida por triggers.
+PostgreSQL: índice GIN sobre to_tsvector('portuguese', unaccent(...)).
+Nos demais bancos nada é criado e a busca continua usando icontains.
+"""
+from django.db import migrations
+
+TABELAS = (
+    ('APP_receita', 'APP_receita_busca'),
+    ('APP_despesa', 'APP_despesa_busca'),
+)
+
+SQLITE_CRIAR = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS "{busca}" USING fts5(
+        descricao, observacoes,
+        content='{tabela}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS "{busca}_ai" AFTER INSERT ON "{tabela}" BEGIN
+        INSERT INTO "{busca}"(rowid, descricao, observacoes)
+        VALUES (new.id, new.descricao, new.observacoes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS "{busca}_ad" AFTER DELETE ON "{tabela}" BEGIN
+        INSERT INTO "{busca}"("{busca}", rowid, descricao, observacoes)
+        VALUES ('delete', old.id, old.descricao, old.observacoes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS "{busca}_au" AFTER UPDATE OF descricao, observacoes ON "{tabela}" BEGIN
+        INSERT INTO "{busca}"("{busca}", rowid, descricao, observacoes)
+        VALUES ('delete', old.id, old.descricao, old.observacoes);
+        INSERT INTO "{busca}"(rowid, descricao, observacoes)
+        VALUES (new.id, new.descricao, new.observacoes);
+    END""",
+    """INSERT INTO "{busca}"("{busca}") VALUES ('rebuild')""",
+)
+
+SQLITE_REMOVER = (
+    'DROP TRIGGER IF EXISTS "{busca}_ai"',
+    'DROP TRIGGER IF EXISTS "{busca}_ad"',
+    'DROP TRIGGER IF EXISTS "{busca}_au"',
+    'DROP TABLE IF EXISTS "{busca}"',
+)
+
+# unaccent() não é IMMUTABLE e não pode ir direto em um índice
+POSTGRES_FUNCAO = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE OR REPLACE FUNCTION elc_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+"""
+
+POSTGRES_CRIAR = """
+CREATE INDEX IF NOT EXISTS "{busca}_idx" ON "{tabela}" USING GIN (
+    to_tsvector('portuguese', elc_unaccent(coalesce(descricao, '') || ' ' || coalesce(observacoes, '')))
+);
+"""
+
+POSTGRES_REMOVER = 'DROP INDEX IF EXISTS "{busca}_idx";'
+
+
+def sqlite_com_fts5(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def criar_indices_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if sqlite_com_fts5(schema_editor):
+        for tabela, busca in TABELAS:
+            for sql in SQLITE_CRIAR:
+                schema_editor.execute(sql.format(tabela=tabela, busca=busca))
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FUNCAO)
+        for tabela, busca in TABELAS:
+            schema_editor.execute(POSTGRES_CRIAR.format(tabela=tabela, busca=busca))
+
+
+def remover_indices_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for tabela, busca in TABELAS:
+            for sql in SQLITE_REMOVER:
+                schema_editor.execute(sql.format(busca=busca))
+    elif vendor == 'postgresql':
+        for tabela, busca in TABELAS:
+            schema_editor.execute(POSTGRES_REMOVER.format(busca=busca))
+        schema_editor.execute('DROP FUNCTION IF EXISTS elc_unaccent(text);')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0011_indices_compostos_lancamentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices_busca, remover_indices_busca),
+    ]
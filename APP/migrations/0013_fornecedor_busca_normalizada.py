@@ -0,0 +1,113 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:30
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+CAMPOS_BUSCA = ('nome_busca', 'nome_fantasia_busca', 'cpf_cnpj_digitos', 'telefone_digitos', 'email_busca')
+
+
+def normalizar_texto(valor):
+    if not valor:
+        return ''
+    sem_acentos = ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', str(valor))
+        if not unicodedata.combining(caractere)
+    )
+    return ' '.join(sem_acentos.lower().split())
+
+
+def somente_digitos(valor):
+    return re.sub(r'\D', '', str(valor)) if valor else ''
+
+
+def popular_colunas_busca(apps, schema_editor):
+    """Preenche as colunas normalizadas dos fornecedores existentes"""
+    Fornecedor = apps.get_model('APP', 'Fornecedor')
+    fornecedores = list(Fornecedor.objects.all())
+    for fornecedor in fornecedores:
+        fornecedor.nome_busca = normalizar_texto(fornecedor.nome)
+        fornecedor.nome_fantasia_busca = normalizar_texto(fornecedor.nome_fantasia)
+        fornecedor.cpf_cnpj_digitos = somente_digitos(fornecedor.cpf_cnpj)
+        fornecedor.telefone_digitos = somente_digitos(fornecedor.telefone)
+        fornecedor.email_busca = normalizar_texto(fornecedor.email)
+    Fornecedor.objects.bulk_update(fornecedores, CAMPOS_BUSCA, batch_size=1000)
+
+
+def criar_indices_trigrama(apps, schema_editor):
+    """No PostgreSQL a busca usa LIKE '%termo%' com índices GIN de trigramas"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for campo in CAMPOS_BUSCA:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "fornec_{campo}_trgm_idx" '
+            f'ON "APP_fornecedor" USING GIN ("{campo}" gin_trgm_ops)'
+        )
+
+
+def remover_indices_trigrama(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for campo in CAMPOS_BUSCA:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "fornec_{campo}_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0012_busca_textual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fornecedor',
+            name='cpf_cnpj_digitos',
+            field=models.CharField(blank=True, default='', editable=False, max_length=14),
+        ),
+        migrations.AddField(
+            model_name='fornecedor',
+            name='email_busca',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='fornecedor',
+            name='nome_busca',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='fornecedor',
+            name='nome_fantasia_busca',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='fornecedor',
+            name='telefone_digitos',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'nome_busca'], name='fornec_usuario_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'nome_fantasia_busca'], name='fornec_usuario_fantasia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'cpf_cnpj_digitos'], name='fornec_usuario_doc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'telefone_digitos'], name='fornec_usuario_telefone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'email_busca'], name='fornec_usuario_email_idx'),
+        ),
+        migrations.RunPython(popular_colunas_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indices_trigrama, remover_indices_trigrama),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0013_fornecedor_busca_normalizada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacaoJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel'), ('pdf', 'PDF')], max_length=10)),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Gerando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=15)),
+                ('processados', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('arquivo', models.FileField(blank=True, null=True, upload_to='exportacoes/')),
+                ('erro', models.TextField(blank=True, default='')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['usuario', 'data_criacao'], name='exportacao_usuario_data_idx')],
+            },
+        ),
+    ]
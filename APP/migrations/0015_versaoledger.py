@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0014_exportacaojob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('versao', models.BigIntegerField(default=0)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='versao_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Versão dos Lançamentos',
+                'verbose_name_plural': 'Versões dos Lançamentos',
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def preencher_data_atualizacao(apps, schema_editor):
+    """
+    O feed de alterações usa data_atualizacao como marca d'água: registros
+    antigos sem a data recebem a de cadastro (ou a atual)
+    """
+    agora = timezone.now()
+    for nome in ('Receita', 'Despesa'):
+        modelo = apps.get_model('APP', nome)
+        modelo.objects.filter(data_atualizacao__isnull=True).update(
+            data_atualizacao=Coalesce('data_cadastro', Value(agora))
+        )
+    Categoria = apps.get_model('APP', 'Categoria')
+    Categoria.objects.filter(data_atualizacao__isnull=True).update(data_atualizacao=agora)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0015_versaoledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('categoria', 'Categoria'), ('fornecedor', 'Fornecedor'), ('receita', 'Receita'), ('despesa', 'Despesa')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('data_exclusao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Registro de Exclusão',
+                'verbose_name_plural': 'Registros de Exclusão',
+            },
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='categoria_usuario_atual_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despesa',
+            index=models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='despesa_usuario_atual_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='fornec_usuario_atual_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='receita_usuario_atual_idx'),
+        ),
+        migrations.AddField(
+            model_name='registroexclusao',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='registroexclusao',
+            index=models.Index(fields=['usuario', 'data_exclusao', 'id'], name='exclusao_usuario_data_idx'),
+        ),
+        migrations.RunPython(preencher_data_atualizacao, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0016_feed_alteracoes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despesa',
+            name='conta_bancaria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='despesas', to='APP.contabancaria', verbose_name='Conta Bancária'),
+        ),
+        migrations.AddField(
+            model_name='despesa',
+            name='hash_importacao',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='receita',
+            name='conta_bancaria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receitas', to='APP.contabancaria', verbose_name='Conta Bancária'),
+        ),
+        migrations.AddField(
+            model_name='receita',
+            name='hash_importacao',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='despesa',
+            constraint=models.UniqueConstraint(condition=models.Q(('hash_importacao__isnull', False)), fields=('usuario', 'hash_importacao'), name='despesa_hash_importacao_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='receita',
+            constraint=models.UniqueConstraint(condition=models.Q(('hash_importacao__isnull', False)), fields=('usuario', 'hash_importacao'), name='receita_hash_importacao_unico'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+CHAVE = ('usuario_id', 'ano', 'mes', 'tipo', 'categoria_id', 'fornecedor_id')
+
+
+def mesclar_duplicados(apps, schema_editor):
+    """
+    Exclusões de categorias/fornecedores (SET_NULL) deixaram buckets com a
+    mesma chave: soma cada grupo no primeiro registro e apaga os demais
+    """
+    ResumoMensal = apps.get_model('APP', 'ResumoMensal')
+    duplicados = (
+        ResumoMensal.objects.values(*CHAVE)
+        .annotate(n=Count('id'), primeiro=Min('id'), soma=Sum('total'), qtd=Sum('quantidade'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for grupo in duplicados:
+        chave = {campo: grupo[campo] for campo in CHAVE}
+        ResumoMensal.objects.filter(**chave).exclude(pk=grupo['primeiro']).delete()
+        ResumoMensal.objects.filter(pk=grupo['primeiro']).update(total=grupo['soma'], quantidade=grupo['qtd'])
+    ResumoMensal.objects.filter(quantidade=0, total=0).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0017_importacao_extratos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(mesclar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resumomensal',
+            constraint=models.UniqueConstraint(condition=models.Q(('categoria__isnull', False), ('fornecedor__isnull', False)), fields=('usuario', 'ano', 'mes', 'tipo', 'categoria', 'fornecedor'), name='resumo_chave_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumomensal',
+            constraint=models.UniqueConstraint(condition=models.Q(('categoria__isnull', True), ('fornecedor__isnull', False)), fields=('usuario', 'ano', 'mes', 'tipo', 'fornecedor'), name='resumo_chave_unica_sem_categoria'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumomensal',
+            constraint=models.UniqueConstraint(condition=models.Q(('categoria__isnull', False), ('fornecedor__isnull', True)), fields=('usuario', 'ano', 'mes', 'tipo', 'categoria'), name='resumo_chave_unica_sem_fornecedor'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumomensal',
+            constraint=models.UniqueConstraint(condition=models.Q(('categoria__isnull', True), ('fornecedor__isnull', True)), fields=('usuario', 'ano', 'mes', 'tipo'), name='resumo_chave_unica_sem_categoria_fornecedor'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('APP', '0018_resumo_chave_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacaojob',
+            name='data_batimento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportacaojob',
+            name='processo',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .normalizacao import normalizar_texto, somente_digitos
 
 class PerfilEmpresa(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -60,6 +62,9 @@ class Categoria(models.Model):
     
     # Para categorias padrão do sistema
     is_padrao = models.BooleanField(default=False, help_text='Categoria padrão do sistema')
+    
+    # Controle
+    data_atualizacao = models.DateTimeField(auto_now=True, null=True, blank=True)
 
     def __str__(self):
         return f"{self.nome} ({self.get_tipo_display()})"
@@ -67,9 +72,82 @@ class Categoria(models.Model):
     class Meta:
         unique_together = ('nome', 'tipo', 'usuario')
         ordering = ['tipo', 'nome']
+        # Feed de alterações (APP/alteracoes.py)
+        indexes = [
+            models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='categoria_usuario_atual_idx'),
+        ]
 
 
 # --- MODELO FORNECEDOR ---
+# Campo de origem -> (coluna normalizada para busca, função que a preenche)
+COLUNAS_BUSCA_FORNECEDOR = {
+    'nome': ('nome_busca', normalizar_texto),
+    'nome_fantasia': ('nome_fantasia_busca', normalizar_texto),
+    'cpf_cnpj': ('cpf_cnpj_digitos', somente_digitos),
+    'telefone': ('telefone_digitos', somente_digitos),
+    'email': ('email_busca', normalizar_texto),
+}
+
+
+def colunas_com_busca(campos):
+    """`campos` mais as colunas normalizadas dos campos de origem entre eles"""
+    return set(campos) | {
+        COLUNAS_BUSCA_FORNECEDOR[campo][0] for campo in campos if campo in COLUNAS_BUSCA_FORNECEDOR
+    }
+
+
+class FornecedorQuerySet(models.QuerySet):
+    """
+    Mantém as colunas normalizadas também nas gravações que não passam pelo
+    save(): bulk_create, bulk_update e update. Como o save(), o update (usado
+    também pelo bulk_update) renova data_atualizacao e a versão dos dados dos
+    usuários afetados, para a alteração aparecer no feed de alterações e
+    invalidar ETag e cache de exportações.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for fornecedor in objs:
+            fornecedor.preencher_colunas_busca()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for fornecedor in objs:
+            fornecedor.preencher_colunas_busca()
+        return super().bulk_update(objs, colunas_com_busca(fields), *args, **kwargs)
+
+    def update(self, **kwargs):
+        from .versoes import incrementar_versao
+
+        kwargs.setdefault('data_atualizacao', timezone.now())
+        origens = [campo for campo in kwargs if campo in COLUNAS_BUSCA_FORNECEDOR]
+        expressoes = any(hasattr(kwargs[campo], 'resolve_expression') for campo in origens)
+        if not expressoes:
+            # Valores literais: as colunas normalizadas vão no mesmo UPDATE
+            for campo in origens:
+                coluna, normalizar = COLUNAS_BUSCA_FORNECEDOR[campo]
+                kwargs[coluna] = normalizar(kwargs[campo])
+
+        base = self.model._base_manager.using(self.db)
+        with transaction.atomic(using=self.db):
+            usuarios = dict(self.order_by().values_list('pk', 'usuario_id'))
+            linhas = super().update(**kwargs)
+            if expressoes:
+                # Expressões (F(), Concat...): o valor final só existe no banco
+                colunas = [COLUNAS_BUSCA_FORNECEDOR[campo][0] for campo in origens]
+                fornecedores = list(base.filter(pk__in=usuarios))
+                for fornecedor in fornecedores:
+                    fornecedor.preencher_colunas_busca()
+                base.bulk_update(fornecedores, colunas, batch_size=1000)
+            afetados = set(usuarios.values())
+            if 'usuario' in kwargs or 'usuario_id' in kwargs:
+                afetados.update(base.filter(pk__in=usuarios).values_list('usuario_id', flat=True))
+            for usuario_id in afetados:
+                incrementar_versao(usuario_id)
+        return linhas
+
+
 class Fornecedor(models.Model):
     TIPO_CHOICES = [
         ('PF', 'Pessoa Física'),
@@ -110,13 +188,46 @@ class Fornecedor(models.Model):
     data_cadastro = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
     
+    # Colunas normalizadas para busca (preenchidas no save)
+    nome_busca = models.CharField(max_length=255, blank=True, default='', editable=False)
+    nome_fantasia_busca = models.CharField(max_length=255, blank=True, default='', editable=False)
+    cpf_cnpj_digitos = models.CharField(max_length=14, blank=True, default='', editable=False)
+    telefone_digitos = models.CharField(max_length=20, blank=True, default='', editable=False)
+    email_busca = models.CharField(max_length=254, blank=True, default='', editable=False)
+    
+    objects = FornecedorQuerySet.as_manager()
+    
     class Meta:
         ordering = ['nome']
         verbose_name = 'Fornecedor'
         verbose_name_plural = 'Fornecedores'
+        # Índices das colunas de busca (APP/busca.py): a busca por substring
+        # percorre só as entradas do usuário, sem ler a tabela
+        indexes = [
+            models.Index(fields=['usuario', 'nome_busca'], name='fornec_usuario_nome_idx'),
+            models.Index(fields=['usuario', 'nome_fantasia_busca'], name='fornec_usuario_fantasia_idx'),
+            models.Index(fields=['usuario', 'cpf_cnpj_digitos'], name='fornec_usuario_doc_idx'),
+            models.Index(fields=['usuario', 'telefone_digitos'], name='fornec_usuario_telefone_idx'),
+            models.Index(fields=['usuario', 'email_busca'], name='fornec_usuario_email_idx'),
+            # Feed de alterações (APP/alteracoes.py)
+            models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='fornec_usuario_atual_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} ({self.get_tipo_display()})"
+    
+    def preencher_colunas_busca(self):
+        """Atualiza as colunas normalizadas a partir dos campos de origem"""
+        for campo, (coluna, normalizar) in COLUNAS_BUSCA_FORNECEDOR.items():
+            setattr(self, coluna, normalizar(getattr(self, campo)))
+
+    def save(self, *args, **kwargs):
+        self.preencher_colunas_busca()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Mantém as colunas normalizadas junto dos campos de origem
+            kwargs['update_fields'] = colunas_com_busca(update_fields)
+        super().save(*args, **kwargs)
 
 
 class Receita(models.Model):
@@ -142,11 +253,38 @@ class Receita(models.Model):
     data_atualizacao = models.DateTimeField(auto_now=True, null=True, blank=True)
     observacoes = models.TextField(blank=True, null=True)
 
+    # Importação de extratos (APP/importacao.py): conta de origem e hash da
+    # linha do extrato, que impede importar a mesma linha duas vezes
+    conta_bancaria = models.ForeignKey(
+        ContaBancaria,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='receitas',
+        verbose_name='Conta Bancária'
+    )
+    hash_importacao = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
     def __str__(self):
         return self.descricao
     
     class Meta:
         ordering = ['-data', '-data_cadastro']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'hash_importacao'],
+                condition=models.Q(hash_importacao__isnull=False),
+                name='receita_hash_importacao_unico',
+            ),
+        ]
+        # Índices compostos para os filtros por usuário/período mais usados
+        indexes = [
+            models.Index(fields=['usuario', 'data', 'data_cadastro'], name='receita_usuario_data_idx'),
+            models.Index(fields=['usuario', 'categoria', 'data'], name='receita_usu_cat_data_idx'),
+            models.Index(fields=['fornecedor', 'data'], name='receita_fornec_data_idx'),
+            # Feed de alterações (APP/alteracoes.py)
+            models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='receita_usuario_atual_idx'),
+        ]
 
 
 class Despesa(models.Model):
@@ -172,11 +310,38 @@ class Despesa(models.Model):
     data_atualizacao = models.DateTimeField(auto_now=True, null=True, blank=True)
     observacoes = models.TextField(blank=True, null=True)
 
+    # Importação de extratos (APP/importacao.py): conta de origem e hash da
+    # linha do extrato, que impede importar a mesma linha duas vezes
+    conta_bancaria = models.ForeignKey(
+        ContaBancaria,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='despesas',
+        verbose_name='Conta Bancária'
+    )
+    hash_importacao = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
     def __str__(self):
         return self.descricao
     
     class Meta:
         ordering = ['-data', '-data_cadastro']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'hash_importacao'],
+                condition=models.Q(hash_importacao__isnull=False),
+                name='despesa_hash_importacao_unico',
+            ),
+        ]
+        # Índices compostos para os filtros por usuário/período mais usados
+        indexes = [
+            models.Index(fields=['usuario', 'data', 'data_cadastro'], name='despesa_usuario_data_idx'),
+            models.Index(fields=['usuario', 'categoria', 'data'], name='despesa_usu_cat_data_idx'),
+            models.Index(fields=['fornecedor', 'data'], name='despesa_fornec_data_idx'),
+            # Feed de alterações (APP/alteracoes.py)
+            models.Index(fields=['usuario', 'data_atualizacao', 'id'], name='despesa_usuario_atual_idx'),
+        ]
     
 class DeclaracaoAnual(models.Model):
     # Link para o perfil da empresa
@@ -278,3 +443,165 @@ class DASN_SIMEI(models.Model):
     def __str__(self):
         status = "Declarada" if self.declarada else "Pendente"
         return f"DASN-SIMEI {self.ano_calendario} - {status}"
+
+
+class ResumoMensal(models.Model):
+    """
+    Totais mensais pré-calculados de receitas e despesas.
+    Mantido pelos signals de Receita/Despesa (ver APP/resumos.py) e
+    reconstruído pelo comando `rebuild_rollups`.
+    """
+    TIPO_CHOICES = [
+        ('R', 'Receita'),
+        ('D', 'Despesa'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resumos_mensais')
+    ano = models.IntegerField()
+    mes = models.IntegerField()
+    tipo = models.CharField(max_length=1, choices=TIPO_CHOICES)
+    categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fornecedor = models.ForeignKey(Fornecedor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    # Valores agregados
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    quantidade = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Resumo Mensal'
+        verbose_name_plural = 'Resumos Mensais'
+        indexes = [
+            models.Index(fields=['usuario', 'ano', 'mes', 'tipo'], name='resumo_usuario_periodo_idx'),
+        ]
+        # Um bucket por chave. NULL não conflita em UNIQUE, então há uma
+        # restrição parcial para cada combinação de categoria/fornecedor nulos
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'ano', 'mes', 'tipo', 'categoria', 'fornecedor'],
+                condition=models.Q(categoria__isnull=False, fornecedor__isnull=False),
+                name='resumo_chave_unica',
+            ),
+            models.UniqueConstraint(
+                fields=['usuario', 'ano', 'mes', 'tipo', 'fornecedor'],
+                condition=models.Q(categoria__isnull=True, fornecedor__isnull=False),
+                name='resumo_chave_unica_sem_categoria',
+            ),
+            models.UniqueConstraint(
+                fields=['usuario', 'ano', 'mes', 'tipo', 'categoria'],
+                condition=models.Q(categoria__isnull=False, fornecedor__isnull=True),
+                name='resumo_chave_unica_sem_fornecedor',
+            ),
+            models.UniqueConstraint(
+                fields=['usuario', 'ano', 'mes', 'tipo'],
+                condition=models.Q(categoria__isnull=True, fornecedor__isnull=True),
+                name='resumo_chave_unica_sem_categoria_fornecedor',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.mes:02d}/{self.ano}: {self.total}"
+
+
+class VersaoLedger(models.Model):
+    """
+    Versão dos dados de cada usuário, incrementada pelos signals a cada
+    alteração em lançamentos, categorias, fornecedores ou perfil (ver
+    APP/versoes.py). Serve de chave para o cache de arquivos exportados.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='versao_ledger')
+    versao = models.BigIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Versão dos Lançamentos'
+        verbose_name_plural = 'Versões dos Lançamentos'
+
+    def __str__(self):
+        return f"{self.usuario.username}: v{self.versao}"
+
+
+class RegistroExclusao(models.Model):
+    """
+    Registro de exclusão (tombstone) de categorias, fornecedores, receitas e
+    despesas, criado pelos signals. O feed /api/v1/changes/ o usa para
+    informar as exclusões a quem sincroniza os dados de forma incremental.
+    """
+    MODELO_CHOICES = [
+        ('categoria', 'Categoria'),
+        ('fornecedor', 'Fornecedor'),
+        ('receita', 'Receita'),
+        ('despesa', 'Despesa'),
+    ]
+
+    # Nulo para categorias padrão, compartilhadas entre os usuários
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    data_exclusao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Registro de Exclusão'
+        verbose_name_plural = 'Registros de Exclusão'
+        indexes = [
+            models.Index(fields=['usuario', 'data_exclusao', 'id'], name='exclusao_usuario_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_modelo_display()} #{self.objeto_id} excluído em {self.data_exclusao}"
+
+
+class ExportacaoJob(models.Model):
+    """
+    Exportação de lançamentos gerada em segundo plano (ver APP/tarefas.py).
+    Guarda os filtros da tela de relatórios, o andamento e o arquivo gerado.
+    """
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+        ('pdf', 'PDF'),
+    ]
+    STATUS_CHOICES = [
+        ('pendente', 'Na fila'),
+        ('processando', 'Gerando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exportacoes')
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    filtros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pendente')
+
+    # Andamento: linhas já gravadas de um total contado antes de começar
+    processados = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    arquivo = models.FileField(upload_to='exportacoes/', null=True, blank=True)
+    erro = models.TextField(blank=True, default='')
+
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+
+    # Processo que gera o arquivo e o último sinal de vida dele, renovado
+    # enquanto o job está na fila ou em andamento (ver tarefas.job_abandonado)
+    processo = models.CharField(max_length=100, blank=True, default='')
+    data_batimento = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-data_criacao']
+        verbose_name = 'Exportação'
+        verbose_name_plural = 'Exportações'
+        indexes = [
+            models.Index(fields=['usuario', 'data_criacao'], name='exportacao_usuario_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_formato_display()} #{self.pk} - {self.get_status_display()}"
+
+    @property
+    def percentual(self):
+        if self.status == 'concluido':
+            return 100
+        if not self.total:
+            return 0
+        return min(99, self.processados * 100 // self.total)
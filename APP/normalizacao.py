@@ -0,0 +1,26 @@
+"""
+Normalização de textos para busca
+Usada para preencher as colunas *_busca / *_digitos dos modelos e para
+normalizar o termo digitado, de forma que os dois lados sejam comparáveis.
+"""
+import re
+import unicodedata
+
+
+def normalizar_texto(valor):
+    """Minúsculas, sem acentos e com espaços simples: ' São  JOÃO ' -> 'sao joao'"""
+    if not valor:
+        return ''
+    sem_acentos = ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', str(valor))
+        if not unicodedata.combining(caractere)
+    )
+    return ' '.join(sem_acentos.lower().split())
+
+
+def somente_digitos(valor):
+    """Remove tudo que não é dígito: '12.345.678/0001-90' -> '12345678000190'"""
+    if not valor:
+        return ''
+    return re.sub(r'\D', '', str(valor))
+
@@ -0,0 +1,65 @@
+"""
+Paginação da API do ELC_Contabil
+
+PaginacaoLancamentos mantém a paginação por número de página (padrão do
+projeto) e oferece, opcionalmente, paginação por cursor para Receitas e
+Despesas: basta enviar o parâmetro `cursor` (vazio na primeira página).
+No modo cursor a ordem é sempre data, data_cadastro e id decrescentes, o
+parâmetro `ordering` é ignorado e a resposta não traz `count`.
+"""
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .lancamentos import (
+    ORDENACAO_CURSOR,
+    chave_lancamento,
+    codificar_cursor,
+    decodificar_cursor,
+    filtro_apos_cursor,
+)
+
+
+class PaginacaoLancamentos(PageNumberPagination):
+    """Paginação por página ou, com ?cursor=, por keyset"""
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.modo_cursor = self.cursor_query_param in request.query_params
+        if not self.modo_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        tamanho = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(filtro_apos_cursor(decodificar_cursor(cursor)))
+            except ValueError:
+                raise NotFound('Cursor inválido.')
+
+        itens = list(queryset.order_by(*ORDENACAO_CURSOR)[:tamanho + 1])
+        self.proximo_cursor = None
+        if len(itens) > tamanho:
+            itens = itens[:tamanho]
+            self.proximo_cursor = codificar_cursor(chave_lancamento(itens[-1], queryset.model))
+        return itens
+
+    def get_next_link(self):
+        if not self.modo_cursor:
+            return super().get_next_link()
+        if self.proximo_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.proximo_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.modo_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,92 @@
+"""
+Filtros de período do ELC_Contabil
+
+Todos os períodos (mês, trimestre, ano ou intervalo livre) são convertidos
+em intervalos semiabertos [inicio, fim) e aplicados como data__gte/data__lt.
+Assim as consultas usam range scan nos índices de data, ao contrário de
+data__year/data__month, que viram strftime()/EXTRACT() e impedem o uso do índice.
+"""
+import datetime
+
+from django.utils.dateparse import parse_date
+
+
+def deslocar_mes(data, meses):
+    """Primeiro dia do mês `meses` meses depois (ou antes, se negativo) de `data`"""
+    indice = data.year * 12 + (data.month - 1) + meses
+    return datetime.date(indice // 12, indice % 12 + 1, 1)
+
+
+def intervalo_mes(ano, mes):
+    """Intervalo [1º dia do mês, 1º dia do mês seguinte)"""
+    inicio = datetime.date(int(ano), int(mes), 1)
+    return inicio, deslocar_mes(inicio, 1)
+
+
+def intervalo_trimestre(ano, trimestre):
+    """Intervalo do trimestre (1 a 4) do ano"""
+    trimestre = int(trimestre)
+    if not 1 <= trimestre <= 4:
+        raise ValueError('O trimestre deve estar entre 1 e 4')
+    inicio = datetime.date(int(ano), 3 * (trimestre - 1) + 1, 1)
+    return inicio, deslocar_mes(inicio, 3)
+
+
+def intervalo_ano(ano):
+    """Intervalo [1º de janeiro, 1º de janeiro do ano seguinte)"""
+    ano = int(ano)
+    return datetime.date(ano, 1, 1), datetime.date(ano + 1, 1, 1)
+
+
+def converter_data(valor):
+    """
+    Converte 'AAAA-MM-DD' (ou date) em date.
+    Valores vazios retornam None; valores inválidos levantam ValueError.
+    """
+    if not valor:
+        return None
+    if isinstance(valor, datetime.date):
+        return valor
+    data = parse_date(str(valor))
+    if data is None:
+        raise ValueError(f'Data inválida: {valor}')
+    return data
+
+
+def intervalo_datas(data_inicio=None, data_fim=None):
+    """
+    Converte um intervalo com fim inclusivo (como vem dos formulários e da API)
+    em um intervalo semiaberto. Qualquer uma das pontas pode ser omitida.
+    O fim em date.max (9999-12-31) não tem dia seguinte e vira "sem limite".
+    """
+    inicio = converter_data(data_inicio)
+    fim = converter_data(data_fim)
+    if fim is not None:
+        fim = fim + datetime.timedelta(days=1) if fim < datetime.date.max else None
+    return inicio, fim
+
+
+def filtro_periodo(inicio, fim, campo='data'):
+    """Monta os kwargs de filter() para o intervalo [inicio, fim)"""
+    filtro = {}
+    if inicio is not None:
+        filtro[f'{campo}__gte'] = inicio
+    if fim is not None:
+        filtro[f'{campo}__lt'] = fim
+    return filtro
+
+
+def filtro_periodo_formulario(data_inicio, data_fim):
+    """
+    Filtro data__gte/data__lt a partir dos parâmetros de formulário (fim inclusivo).
+    Datas inválidas são ignoradas, como se o campo não tivesse sido preenchido.
+    """
+    try:
+        inicio, _ = intervalo_datas(data_inicio, None)
+    except ValueError:
+        inicio = None
+    try:
+        _, fim = intervalo_datas(None, data_fim)
+    except ValueError:
+        fim = None
+    return filtro_periodo(inicio, fim)
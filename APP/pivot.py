@@ -0,0 +1,122 @@
+"""
+Tabela dinâmica (pivot) de receitas e despesas
+
+O cliente escolhe as dimensões (tipo, ano, trimestre, mês, categoria,
+fornecedor, conta) e as medidas (soma, quantidade, média, mínimo, máximo)
+e recebe uma linha por combinação de dimensões. Cada tabela é agrupada no
+banco e as duas vão juntas em um único UNION ALL; em Python só se juntam
+as linhas de receitas e despesas com a mesma chave (quando `tipo` não é
+uma das dimensões), então o custo não depende de quantos lançamentos há.
+"""
+from decimal import Decimal
+
+from django.db.models import CharField, Count, F, Max, Min, Sum, Value
+from django.db.models.functions import ExtractMonth, ExtractQuarter, ExtractYear
+
+# Dimensão -> colunas que ela acrescenta ao resultado
+DIMENSOES = {
+    'tipo': ('tipo',),
+    'ano': ('ano',),
+    'trimestre': ('trimestre',),
+    'mes': ('mes',),
+    'categoria': ('categoria_id', 'categoria_nome'),
+    'fornecedor': ('fornecedor_id', 'fornecedor_nome'),
+    'conta': ('conta_bancaria_id', 'conta_bancaria_nome'),
+}
+
+# Colunas calculadas; as demais são campos do modelo ou o discriminador `tipo`
+EXPRESSOES = {
+    'ano': ExtractYear('data'),
+    'trimestre': ExtractQuarter('data'),
+    'mes': ExtractMonth('data'),
+    'categoria_nome': F('categoria__nome'),
+    'fornecedor_nome': F('fornecedor__nome'),
+    'conta_bancaria_nome': F('conta_bancaria__nome_banco'),
+}
+
+MEDIDAS = ('soma', 'quantidade', 'media', 'minimo', 'maximo')
+
+DIMENSOES_PADRAO = ('tipo',)
+MEDIDAS_PADRAO = ('soma', 'quantidade')
+
+# Agregações feitas no banco; a média sai de soma / quantidade, o que
+# permite juntar receitas e despesas sem perder precisão
+AGREGACOES = {
+    'soma': lambda: Sum('valor'),
+    'quantidade': lambda: Count('id'),
+    'minimo': lambda: Min('valor'),
+    'maximo': lambda: Max('valor'),
+}
+
+
+def ler_lista(texto, validos, padrao, nome):
+    """Converte 'a,b' em ('a', 'b'), validando contra `validos`; ValueError se inválido"""
+    itens = tuple(dict.fromkeys(item.strip() for item in (texto or '').split(',') if item.strip()))
+    if not itens:
+        return padrao
+    invalidos = [item for item in itens if item not in validos]
+    if invalidos:
+        raise ValueError(f"{nome} inválido(s): {', '.join(invalidos)}. Use: {', '.join(validos)}")
+    return itens
+
+
+def colunas_dimensoes(dimensoes):
+    """Colunas do resultado para as dimensões, na ordem pedida"""
+    return [coluna for dimensao in dimensoes for coluna in DIMENSOES[dimensao]]
+
+
+def consulta_agrupada(querysets, dimensoes, medidas):
+    """
+    UNION ALL das tabelas, cada uma agrupada pelas colunas das dimensões.
+    Toda linha traz o `tipo`, mesmo que ele não seja uma das dimensões.
+    """
+    colunas = colunas_dimensoes(dimensoes)
+    campos = ['tipo'] + [coluna for coluna in colunas if coluna != 'tipo' and coluna not in EXPRESSOES]
+    expressoes = {coluna: EXPRESSOES[coluna] for coluna in colunas if coluna in EXPRESSOES}
+    agregacoes = {'soma', 'quantidade'} | (set(medidas) & set(AGREGACOES))
+
+    partes = []
+    for tipo, queryset in querysets.items():
+        partes.append(
+            queryset.order_by()
+            .annotate(tipo=Value(tipo, output_field=CharField(max_length=1)))
+            .values(*campos, **expressoes)
+            .annotate(**{nome: AGREGACOES[nome]() for nome in sorted(agregacoes)})
+        )
+    primeira, *demais = partes
+    return primeira.union(*demais, all=True) if demais else primeira
+
+
+def tabela_dinamica(querysets, dimensoes, medidas):
+    """
+    Linhas da tabela dinâmica: as colunas das dimensões seguidas das
+    medidas pedidas, ordenadas pelas dimensões.
+    `querysets` é um dicionário {tipo: queryset} já filtrado.
+    """
+    if not querysets:
+        return []
+    colunas = colunas_dimensoes(dimensoes)
+
+    grupos = {}
+    for linha in consulta_agrupada(querysets, dimensoes, medidas):
+        chave = tuple(linha[coluna] for coluna in colunas)
+        grupo = grupos.get(chave)
+        if grupo is None:
+            grupos[chave] = dict(linha)
+            continue
+        grupo['soma'] += linha['soma']
+        grupo['quantidade'] += linha['quantidade']
+        if 'minimo' in linha:
+            grupo['minimo'] = min(grupo['minimo'], linha['minimo'])
+        if 'maximo' in linha:
+            grupo['maximo'] = max(grupo['maximo'], linha['maximo'])
+
+    resultados = []
+    for chave in sorted(grupos, key=lambda chave: [(valor is None, valor) for valor in chave]):
+        grupo = grupos[chave]
+        if 'media' in medidas:
+            grupo['media'] = (grupo['soma'] / grupo['quantidade']).quantize(Decimal('0.01'))
+        linha = dict(zip(colunas, chave))
+        linha.update((medida, grupo[medida]) for medida in medidas)
+        resultados.append(linha)
+    return resultados
@@ -0,0 +1,94 @@
+"""
+Renderizador JSON rápido para a API
+
+JSONRapidoRenderer gera o JSON com o orjson (em C) quando o pacote está
+instalado e, sem ele, com o módulo json da biblioteca padrão; as duas saídas
+são idênticas. Em relação ao JSONRenderer do DRF:
+
+- Decimal vira texto exato ("1234.50"), como nos campos dos serializers,
+  em vez de float (totais, saldos e agregações);
+- date/datetime/time soltos seguem DATE_FORMAT/DATETIME_FORMAT/TIME_FORMAT
+  do REST_FRAMEWORK, como os campos dos serializers.
+
+É escolhido por requisição com ?format=json-rapido, ou para toda a API
+com API_JSON_RAPIDO_PADRAO = True nas configurações.
+"""
+import datetime
+import decimal
+import functools
+import json
+
+from rest_framework import serializers
+from rest_framework.compat import INDENT_SEPARATORS, LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Campos usados só para formatar datas soltas como nos serializers
+CAMPO_DATA_HORA = serializers.DateTimeField()
+CAMPO_DATA = serializers.DateField()
+CAMPO_HORA = serializers.TimeField()
+
+# Os demais tipos (textos traduzíveis, UUID, timedelta, querysets...) como no DRF
+_encoder_drf = JSONEncoder()
+
+
+@functools.lru_cache(maxsize=None)
+def _orjson():
+    """Módulo orjson, ou None se o pacote não estiver instalado"""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def valor_json(objeto):
+    """Conversão dos tipos que o JSON não tem (parâmetro `default` do json e do orjson)"""
+    if isinstance(objeto, decimal.Decimal):
+        # 'f' evita notação científica (Decimal('1E+2') -> '100')
+        return format(objeto, 'f')
+    if isinstance(objeto, datetime.datetime):
+        return CAMPO_DATA_HORA.to_representation(objeto)
+    if isinstance(objeto, datetime.date):
+        return CAMPO_DATA.to_representation(objeto)
+    if isinstance(objeto, datetime.time):
+        return CAMPO_HORA.to_representation(objeto)
+    return _encoder_drf.default(objeto)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """JSONRenderer com orjson (ou json) e Decimal/datas como nos serializers"""
+    format = 'json-rapido'
+
+    # False força o json da biblioteca padrão (usado no benchmark)
+    usar_orjson = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        orjson = _orjson() if self.usar_orjson else None
+        conteudo = None
+        # O orjson só gera JSON compacto, em UTF-8 e com indentação fixa
+        if orjson is not None and indent is None and self.compact and not self.ensure_ascii:
+            try:
+                conteudo = orjson.dumps(
+                    data, default=valor_json,
+                    option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+                )
+            except TypeError:
+                # Ex.: inteiros acima de 64 bits; o json trata ou dá o erro certo
+                conteudo = None
+        if conteudo is None:
+            if indent is None:
+                separadores = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+            else:
+                separadores = INDENT_SEPARATORS
+            conteudo = json.dumps(
+                data, default=valor_json, indent=indent, ensure_ascii=self.ensure_ascii,
+                allow_nan=not self.strict, separators=separadores,
+            ).encode('utf-8')
+
+        # Como no DRF: U+2028/U+2029 escapados para o JSON valer como JavaScript
+        return conteudo.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,207 @@
+"""
+Manutenção e leitura da tabela de resumos mensais (ResumoMensal)
+
+Cada Receita/Despesa contribui com (valor, 1) para um bucket
+usuario x ano x mes x tipo x categoria x fornecedor. Os signals em
+APP/signals.py chamam as funções deste módulo a cada gravação/exclusão,
+de forma que os relatórios leiam poucos registros indexados em vez de
+agregar as tabelas de lançamentos inteiras.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Despesa, Receita, ResumoMensal
+
+# Tipo do resumo para cada modelo de lançamento
+TIPO_POR_MODELO = {
+    Receita: 'R',
+    Despesa: 'D',
+}
+
+# Campos do lançamento que definem o bucket e o valor
+CAMPOS_RESUMO = ('usuario_id', 'data', 'categoria_id', 'fornecedor_id', 'valor')
+
+
+def estado_lancamento(instance):
+    """Extrai do lançamento os campos relevantes para o resumo, já normalizados"""
+    modelo = type(instance)
+    return {
+        'usuario_id': instance.usuario_id,
+        'data': modelo._meta.get_field('data').to_python(instance.data),
+        'categoria_id': instance.categoria_id,
+        'fornecedor_id': instance.fornecedor_id,
+        'valor': modelo._meta.get_field('valor').to_python(instance.valor),
+    }
+
+
+def chave_resumo(tipo, estado):
+    """Monta o filtro que identifica o bucket de um lançamento"""
+    return {
+        'usuario_id': estado['usuario_id'],
+        'ano': estado['data'].year,
+        'mes': estado['data'].month,
+        'tipo': tipo,
+        'categoria_id': estado['categoria_id'],
+        'fornecedor_id': estado['fornecedor_id'],
+    }
+
+
+def aplicar_delta(chave, valor, quantidade):
+    """
+    Soma (valor, quantidade) ao bucket indicado, criando-o se necessário.
+    O bucket é único (ver as restrições de ResumoMensal): o UPDATE com F()
+    é atômico e, se dois processos criarem o mesmo bucket ao mesmo tempo, o
+    segundo INSERT falha e vira UPDATE.
+    """
+    atualizados = ResumoMensal.objects.filter(**chave).update(
+        total=F('total') + valor,
+        quantidade=F('quantidade') + quantidade,
+    )
+    if not atualizados:
+        if quantidade <= 0:
+            return
+        try:
+            with transaction.atomic():
+                ResumoMensal.objects.create(total=valor, quantidade=quantidade, **chave)
+            return
+        except IntegrityError:
+            ResumoMensal.objects.filter(**chave).update(
+                total=F('total') + valor,
+                quantidade=F('quantidade') + quantidade,
+            )
+    if quantidade < 0:
+        # Remove o bucket só quando ficou realmente vazio
+        ResumoMensal.objects.filter(quantidade=0, total=0, **chave).delete()
+
+
+def mesclar_resumos(campo, objeto):
+    """
+    Move os resumos que apontam para a categoria/fornecedor `objeto` (campo
+    'categoria' ou 'fornecedor') para o bucket sem ela, antes da exclusão.
+    Sem isso o SET_NULL criaria um segundo bucket com a mesma chave.
+    """
+    with transaction.atomic():
+        for resumo in ResumoMensal.objects.filter(**{campo: objeto}).select_for_update():
+            chave = {
+                'usuario_id': resumo.usuario_id,
+                'ano': resumo.ano,
+                'mes': resumo.mes,
+                'tipo': resumo.tipo,
+                'categoria_id': resumo.categoria_id,
+                'fornecedor_id': resumo.fornecedor_id,
+                f'{campo}_id': None,
+            }
+            resumo.delete()
+            aplicar_delta(chave, resumo.total, resumo.quantidade)
+
+
+def registrar_alteracao(modelo, anterior, atual):
+    """
+    Atualiza os resumos a partir do estado anterior e do atual de um lançamento.
+    `anterior` é None em inclusões e `atual` é None em exclusões.
+    """
+    tipo = TIPO_POR_MODELO[modelo]
+    chave_anterior = chave_resumo(tipo, anterior) if anterior else None
+    chave_atual = chave_resumo(tipo, atual) if atual else None
+
+    if chave_anterior == chave_atual and anterior['valor'] == atual['valor']:
+        return
+
+    with transaction.atomic():
+        if chave_anterior is not None:
+            aplicar_delta(chave_anterior, -anterior['valor'], -1)
+        if chave_atual is not None:
+            aplicar_delta(chave_atual, atual['valor'], 1)
+
+
+def registrar_alteracoes(modelo, alteracoes):
+    """
+    Versão em lote de registrar_alteracao: `alteracoes` é uma lista de pares
+    (anterior, atual). As contribuições são somadas por bucket e cada bucket
+    afetado recebe um único UPDATE/INSERT.
+    """
+    tipo = TIPO_POR_MODELO[modelo]
+    deltas = defaultdict(lambda: [Decimal('0.00'), 0])
+    for anterior, atual in alteracoes:
+        if anterior:
+            delta = deltas[tuple(chave_resumo(tipo, anterior).items())]
+            delta[0] -= anterior['valor']
+            delta[1] -= 1
+        if atual:
+            delta = deltas[tuple(chave_resumo(tipo, atual).items())]
+            delta[0] += atual['valor']
+            delta[1] += 1
+
+    with transaction.atomic():
+        for chave, (valor, quantidade) in deltas.items():
+            if valor or quantidade:
+                aplicar_delta(dict(chave), valor, quantidade)
+
+
+def reconstruir_resumos(usuario=None):
+    """
+    Recalcula todos os resumos a partir dos lançamentos.
+    Se `usuario` for informado, reconstrói apenas os resumos dele.
+    Retorna a quantidade de buckets gravados.
+    """
+    novos = []
+    for modelo, tipo in TIPO_POR_MODELO.items():
+        lancamentos = modelo.objects.all()
+        if usuario is not None:
+            lancamentos = lancamentos.filter(usuario=usuario)
+
+        agrupados = lancamentos.annotate(
+            ano=ExtractYear('data'),
+            mes=ExtractMonth('data'),
+        ).values(
+            'usuario_id', 'ano', 'mes', 'categoria_id', 'fornecedor_id'
+        ).annotate(
+            soma=Sum('valor'),
+            qtd=Count('id'),
+        ).order_by()
+
+        for item in agrupados:
+            novos.append(ResumoMensal(
+                usuario_id=item['usuario_id'],
+                ano=item['ano'],
+                mes=item['mes'],
+                tipo=tipo,
+                categoria_id=item['categoria_id'],
+                fornecedor_id=item['fornecedor_id'],
+                total=item['soma'],
+                quantidade=item['qtd'],
+            ))
+
+    with transaction.atomic():
+        existentes = ResumoMensal.objects.all()
+        if usuario is not None:
+            existentes = existentes.filter(usuario=usuario)
+        existentes.delete()
+        ResumoMensal.objects.bulk_create(novos, batch_size=1000)
+
+    return len(novos)
+
+
+def totais_mensais(usuario, ano_inicio, ano_fim=None):
+    """
+    Retorna {(ano, mes): {'R': total, 'D': total}} para os anos do intervalo,
+    lido da tabela de resumos em uma única consulta.
+    Meses sem lançamentos não aparecem no dicionário.
+    """
+    if ano_fim is None:
+        ano_fim = ano_inicio
+
+    totais = defaultdict(lambda: {'R': Decimal('0.00'), 'D': Decimal('0.00')})
+    linhas = ResumoMensal.objects.filter(
+        usuario=usuario,
+        ano__gte=ano_inicio,
+        ano__lte=ano_fim,
+    ).values('ano', 'mes', 'tipo').annotate(soma=Sum('total')).order_by()
+
+    for linha in linhas:
+        totais[(linha['ano'], linha['mes'])][linha['tipo']] += linha['soma'] or Decimal('0.00')
+    return totais
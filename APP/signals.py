@@ -0,0 +1,126 @@
+"""
+Signals do ELC_Contabil
+Mantêm os dados derivados (resumos mensais, versão dos dados de cada
+usuário e registros de exclusão do feed de alterações) em dia a cada gravação
+
+Gravações em lote (APP/lotes.py) rodam dentro de operacao_em_lote(): os
+receivers de Receita/Despesa não fazem nada e o próprio lote atualiza os
+dados derivados uma vez só, ao final.
+"""
+import contextlib
+import contextvars
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Categoria, ContaBancaria, Despesa, Fornecedor, PerfilEmpresa, Receita, RegistroExclusao
+from .resumos import CAMPOS_RESUMO, estado_lancamento, mesclar_resumos, registrar_alteracao
+from .versoes import incrementar_todas, incrementar_versao
+
+_em_lote = contextvars.ContextVar('em_lote', default=False)
+
+
+@contextlib.contextmanager
+def operacao_em_lote():
+    """Suspende os receivers de Receita/Despesa durante uma gravação em lote"""
+    token = _em_lote.set(True)
+    try:
+        yield
+    finally:
+        _em_lote.reset(token)
+
+
+@receiver(pre_save, sender=Receita)
+@receiver(pre_save, sender=Despesa)
+def guardar_estado_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda o estado gravado no banco antes de uma edição"""
+    instance._estado_resumo_anterior = None
+    if raw or instance.pk is None or _em_lote.get():
+        return
+    instance._estado_resumo_anterior = (
+        sender.objects.filter(pk=instance.pk).values(*CAMPOS_RESUMO).first()
+    )
+
+
+@receiver(post_save, sender=Receita)
+@receiver(post_save, sender=Despesa)
+def atualizar_resumo_apos_salvar(sender, instance, raw=False, **kwargs):
+    """Atualiza os resumos mensais após incluir ou editar um lançamento"""
+    if raw or _em_lote.get():
+        return
+    anterior = getattr(instance, '_estado_resumo_anterior', None)
+    registrar_alteracao(sender, anterior, estado_lancamento(instance))
+    instance._estado_resumo_anterior = None
+
+
+@receiver(post_delete, sender=Receita)
+@receiver(post_delete, sender=Despesa)
+def atualizar_resumo_apos_excluir(sender, instance, **kwargs):
+    """Remove a contribuição do lançamento excluído dos resumos mensais"""
+    if _em_lote.get():
+        return
+    registrar_alteracao(sender, estado_lancamento(instance), None)
+
+
+@receiver(pre_delete, sender=Categoria)
+@receiver(pre_delete, sender=Fornecedor)
+def mesclar_resumos_antes_de_excluir(sender, instance, **kwargs):
+    """Junta os resumos da categoria/fornecedor excluído aos sem categoria/fornecedor"""
+    mesclar_resumos('categoria' if sender is Categoria else 'fornecedor', instance)
+
+
+# === VERSÃO DOS DADOS (cache de exportações) ===
+
+@receiver(post_save, sender=Receita)
+@receiver(post_save, sender=Despesa)
+@receiver(post_save, sender=Fornecedor)
+@receiver(post_save, sender=PerfilEmpresa)
+@receiver(post_delete, sender=Receita)
+@receiver(post_delete, sender=Despesa)
+@receiver(post_delete, sender=Fornecedor)
+@receiver(post_delete, sender=PerfilEmpresa)
+def incrementar_versao_usuario(sender, instance, **kwargs):
+    """Qualquer alteração nos dados do usuário invalida as exportações em cache"""
+    if _em_lote.get() and sender in (Receita, Despesa):
+        return
+    incrementar_versao(instance.usuario_id)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def incrementar_versao_categoria(sender, instance, **kwargs):
+    # Categorias padrão (sem usuário) aparecem nos relatórios de todos
+    if instance.usuario_id is None:
+        incrementar_todas()
+    else:
+        incrementar_versao(instance.usuario_id)
+
+
+@receiver(post_save, sender=ContaBancaria)
+@receiver(post_delete, sender=ContaBancaria)
+def incrementar_versao_conta(sender, instance, **kwargs):
+    """As contas aparecem no cabeçalho do PDF"""
+    usuario_id = PerfilEmpresa.objects.filter(pk=instance.perfil_empresa_id).values_list('usuario_id', flat=True).first()
+    incrementar_versao(usuario_id)
+
+
+# === REGISTROS DE EXCLUSÃO (feed de alterações) ===
+
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Fornecedor)
+@receiver(post_delete, sender=Receita)
+@receiver(post_delete, sender=Despesa)
+def registrar_exclusao(sender, instance, origin=None, **kwargs):
+    """Guarda a exclusão para o feed /api/v1/changes/"""
+    # Na exclusão do próprio usuário os registros iriam junto (e apontariam
+    # para um usuário que deixou de existir)
+    if isinstance(origin, User):
+        return
+    if _em_lote.get() and sender in (Receita, Despesa):
+        return
+    RegistroExclusao.objects.create(
+        usuario_id=instance.usuario_id,
+        modelo=sender._meta.model_name,
+        objeto_id=instance.pk,
+    )
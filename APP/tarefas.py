@@ -0,0 +1,216 @@
+"""
+Fila de exportações em segundo plano
+
+As exportações grandes (CSV, Excel e PDF) são registradas como
+ExportacaoJob e geradas por um ThreadPoolExecutor do próprio processo, sem
+broker externo: a requisição só cria o registro e devolve o id, a página de
+relatórios acompanha o andamento pelo endpoint de status e baixa o arquivo,
+gravado em MEDIA_ROOT/exportacoes/, quando fica pronto.
+
+Cada thread usa a sua própria conexão com o banco, fechada ao final.
+Enquanto um processo tem jobs na fila ou em andamento, uma thread renova o
+data_batimento deles a cada EXPORTACAO_BATIMENTO segundos. Jobs sem sinal
+de vida (o processo que os gerava terminou) são marcados como erro na
+próxima consulta de status, em qualquer processo (ver job_abandonado).
+"""
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .cache_exportacoes import CAMPOS_FILTRO, EXTENSOES, obter_ou_gerar
+from .exportacao import escrever_csv, escrever_excel, escrever_pdf, querysets_exportacao, totais_exportacao
+from .models import ExportacaoJob
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+STATUS_ATIVOS = ('pendente', 'processando')
+
+# Sem sinal de vida por este número de intervalos, o job é dado como interrompido
+BATIMENTOS_PERDIDOS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+# Jobs submetidos por este processo (os demais são de outros processos ou
+# de uma execução anterior)
+_jobs_do_processo = set()
+_batimento = None
+_identificador = (None, '')
+
+
+def identificador_processo():
+    """'host:pid:token' desta execução do processo (muda após fork ou reinício)"""
+    global _identificador
+    pid = os.getpid()
+    if _identificador[0] != pid:
+        _identificador = (pid, f'{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}')
+    return _identificador[1]
+
+
+def intervalo_batimento():
+    return getattr(settings, 'EXPORTACAO_BATIMENTO', 30)
+
+
+def executor():
+    """ThreadPoolExecutor compartilhado, criado no primeiro uso"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EXPORTACAO_WORKERS', 2),
+                thread_name_prefix='exportacao',
+            )
+        return _executor
+
+
+def criar_exportacao(usuario, formato, filtros):
+    """Registra o job e agenda a geração para depois do commit da transação"""
+    limpar_exportacoes_antigas(usuario)
+    job = ExportacaoJob.objects.create(
+        usuario=usuario,
+        formato=formato,
+        filtros={campo: filtros.get(campo) for campo in CAMPOS_FILTRO if filtros.get(campo)},
+        processo=identificador_processo(),
+        data_batimento=timezone.now(),
+    )
+    transaction.on_commit(lambda: enfileirar(job.pk))
+    return job
+
+
+def enfileirar(job_id):
+    global _batimento
+    _jobs_do_processo.add(job_id)
+    with _executor_lock:
+        if _batimento is None:
+            _batimento = threading.Thread(target=manter_batimento, name='exportacao-batimento', daemon=True)
+            _batimento.start()
+    executor().submit(executar_exportacao, job_id)
+
+
+def registrar_batimento(ids):
+    """Renova o sinal de vida dos jobs `ids` (deste processo)"""
+    ExportacaoJob.objects.filter(pk__in=ids, status__in=STATUS_ATIVOS).update(
+        processo=identificador_processo(), data_batimento=timezone.now(),
+    )
+
+
+def manter_batimento():
+    """Thread que renova o sinal de vida dos jobs deste processo enquanto houver algum"""
+    global _batimento
+    while True:
+        time.sleep(intervalo_batimento())
+        with _executor_lock:
+            ids = list(_jobs_do_processo)
+            if not ids:
+                _batimento = None
+                return
+        try:
+            close_old_connections()
+            registrar_batimento(ids)
+        except Exception:
+            logger.exception('Falha ao registrar o sinal de vida das exportações')
+        finally:
+            connection.close()
+
+
+def executar_exportacao(job_id):
+    """Gera o arquivo do job (roda em uma thread do executor)"""
+    close_old_connections()
+    # O status final só é gravado se o job ainda estiver ativo: a consulta de
+    # status pode tê-lo dado como interrompido (ver marcar_interrompido)
+    ativo = ExportacaoJob.objects.filter(pk=job_id, status__in=STATUS_ATIVOS)
+    try:
+        job = ExportacaoJob.objects.select_related('usuario').get(pk=job_id)
+        querysets = querysets_exportacao(job.usuario, job.filtros)
+        total = sum(quantidade for _, quantidade in totais_exportacao(querysets).values())
+        if not ativo.update(
+            status='processando', total=total, processo=identificador_processo(), data_batimento=timezone.now(),
+        ):
+            return
+
+        def progresso(processados):
+            ExportacaoJob.objects.filter(pk=job_id).update(processados=processados)
+
+        def escrever(destino):
+            if job.formato == 'excel':
+                escrever_excel(querysets, destino, progresso=progresso)
+            elif job.formato == 'pdf':
+                escrever_pdf(querysets, destino, job.usuario.perfilempresa, job.filtros, progresso=progresso)
+            else:
+                escrever_csv(querysets, destino, progresso=progresso)
+
+        # Um arquivo idêntico já gerado (mesmos filtros e dados) vem do cache
+        with obter_ou_gerar(job.usuario_id, job.formato, job.filtros, escrever) as arquivo:
+            job.arquivo.save(nome_arquivo(job), File(arquivo), save=False)
+
+        if not ativo.update(status='concluido', arquivo=job.arquivo.name, data_conclusao=timezone.now()):
+            # Interrompido durante a geração: ninguém vai baixar o arquivo
+            job.arquivo.delete(save=False)
+    except Exception as e:
+        logger.exception('Falha na exportação %s', job_id)
+        ativo.update(status='erro', erro=str(e), data_conclusao=timezone.now())
+    finally:
+        _jobs_do_processo.discard(job_id)
+        connection.close()
+
+
+def nome_arquivo(job):
+    return f'lancamentos_{job.usuario_id}_{job.pk}_{timezone.localtime():%Y%m%d_%H%M%S}.{EXTENSOES[job.formato]}'
+
+
+def job_abandonado(job):
+    """
+    Indica se o job pendente/em andamento não vai mais andar: o executor vive
+    em memória, então isso acontece quando o processo que o gerava terminou.
+    Um job registrado por este processo que não está mais na fila dele está
+    abandonado; os de outros processos (ou servidores), só depois de
+    BATIMENTOS_PERDIDOS intervalos sem sinal de vida, por mais longa que
+    seja a geração.
+    """
+    if job.status not in STATUS_ATIVOS or job.pk in _jobs_do_processo:
+        return False
+    if job.processo == identificador_processo():
+        return True
+    limite = datetime.timedelta(seconds=intervalo_batimento() * BATIMENTOS_PERDIDOS)
+    return timezone.now() - (job.data_batimento or job.data_criacao) > limite
+
+
+def marcar_interrompido(job):
+    """
+    Grava o job abandonado como erro e recarrega `job`. A gravação é
+    condicional: se a thread o concluiu (ou registrou o erro dela) depois
+    da leitura, o resultado dela é mantido.
+    """
+    ExportacaoJob.objects.filter(pk=job.pk, status__in=STATUS_ATIVOS).update(
+        status='erro', erro='A exportação foi interrompida. Gere o arquivo novamente.',
+        data_conclusao=timezone.now(),
+    )
+    job.refresh_from_db()
+
+
+def limpar_exportacoes_antigas(usuario):
+    """Remove os jobs (e arquivos) do usuário mais antigos que EXPORTACAO_RETENCAO_HORAS"""
+    limite = timezone.now() - datetime.timedelta(hours=getattr(settings, 'EXPORTACAO_RETENCAO_HORAS', 24))
+    vivos = timezone.now() - datetime.timedelta(seconds=intervalo_batimento() * BATIMENTOS_PERDIDOS)
+    antigos = ExportacaoJob.objects.filter(usuario=usuario, data_criacao__lt=limite).exclude(
+        pk__in=_jobs_do_processo
+    ).exclude(status__in=STATUS_ATIVOS, data_batimento__gte=vivos)
+    for job in antigos:
+        if job.arquivo:
+            job.arquivo.delete(save=False)
+        job.delete()
@@ -1,3 +1,1601 @@
-from django.test import TestCase
+import base64
+import datetime
+import gzip
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from APP.busca import filtrar_busca, filtrar_fornecedores, restaurar_triggers_busca
+from APP import tarefas
+from APP.cache_exportacoes import abrir_em_cache, caminho_exportacao, despejar, obter_ou_gerar
+from APP.compressao import (
+    PREENCHIMENTO_HTML, CompressaoMiddleware, codificacao_aceita, comprimir_arquivo, sem_preenchimento,
+)
+from APP.exportacao import escrever_excel, escrever_pdf, gerar_csv, linhas_lancamentos, querysets_exportacao
+from APP.importacao import hash_linha
+from APP.renderizadores import JSONRapidoRenderer
+from APP.lancamentos import LancamentosUnificados, chave_lancamento, codificar_cursor, filtro_apos_cursor
+from APP.periodos import filtro_periodo_formulario, intervalo_datas, intervalo_mes
+from APP.models import (
+    Categoria, ContaBancaria, Despesa, ExportacaoJob, Fornecedor, PerfilEmpresa, PreferenciaUsuario, Receita, RegistroExclusao,
+    ResumoMensal, VersaoLedger,
+)
+from APP.resumos import reconstruir_resumos, totais_mensais
+
+
+class DashboardConsultasTest(TestCase):
+    """O dashboard deve usar um número fixo de consultas, independente do volume"""
+
+    # sessão + usuário, 2 agregações mensais, perfil (alerta do ano anterior),
+    # preferências, 3 alertas, 2 gráficos pizza e o top 5 de despesas
+    CONSULTAS_DASHBOARD = 12
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        PreferenciaUsuario.objects.create(usuario=self.usuario)
+        self.client.force_login(self.usuario)
+
+    def criar_lancamentos(self, meses):
+        hoje = datetime.date.today()
+        for i in range(meses):
+            indice = hoje.year * 12 + hoje.month - 1 - i
+            data = datetime.date(indice // 12, indice % 12 + 1, 1)
+            Receita.objects.create(usuario=self.usuario, descricao='Venda', valor=Decimal('100.00'), data=data)
+            Despesa.objects.create(usuario=self.usuario, descricao='Compra', valor=Decimal('40.00'), data=data)
+
+    def test_numero_de_consultas_constante(self):
+        self.criar_lancamentos(13)
+        with self.assertNumQueries(self.CONSULTAS_DASHBOARD):
+            self.client.get(reverse('dashboard'))
+
+        self.criar_lancamentos(24)
+        with self.assertNumQueries(self.CONSULTAS_DASHBOARD):
+            self.client.get(reverse('dashboard'))
+
+    def test_totais_derivados_da_consulta_agrupada(self):
+        self.criar_lancamentos(24)
+        hoje = datetime.date.today()
+
+        response = self.client.get(reverse('dashboard'))
+        context = response.context
+
+        self.assertEqual(context['total_receitas'], Decimal('100.00'))
+        self.assertEqual(context['total_despesas'], Decimal('40.00'))
+        self.assertEqual(context['receitas_mes_anterior'], Decimal('100.00'))
+        self.assertEqual(context['faturamento_anual'], Decimal('100.00') * hoje.month)
+        self.assertEqual(context['faturamento_ano_anterior'], Decimal('1200.00'))
+        self.assertEqual(context['dados_receitas'], '[100.0, 100.0, 100.0, 100.0, 100.0, 100.0]')
+        self.assertEqual(context['dados_balanco_json'], '[60.0, 60.0, 60.0, 60.0, 60.0, 60.0]')
+
+
+class ResumosMensaisTest(TestCase):
+    """ResumoMensal mantido pelos signals deve bater com a reconstrução completa"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.data = datetime.date(2024, 3, 1)
+
+    def resumos(self):
+        return sorted(
+            ResumoMensal.objects.filter(usuario=self.usuario)
+            .values_list('ano', 'mes', 'tipo', 'categoria_id', 'fornecedor_id', 'total', 'quantidade'),
+            key=str,
+        )
+
+    def assertResumosCorretos(self):
+        mantidos = self.resumos()
+        reconstruir_resumos(self.usuario)
+        self.assertEqual(mantidos, self.resumos())
+
+    def test_inclusao_edicao_exclusao(self):
+        categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        receita = Receita.objects.create(usuario=self.usuario, descricao='Venda', valor=Decimal('10.00'), data=self.data)
+        Receita.objects.create(usuario=self.usuario, descricao='Venda', valor=Decimal('5.00'), data=self.data)
+        Despesa.objects.create(usuario=self.usuario, descricao='Luz', valor=Decimal('3.00'), data=self.data)
+        self.assertResumosCorretos()
+
+        receita.valor = Decimal('12.00')
+        receita.categoria = categoria
+        receita.data = datetime.date(2024, 4, 1)
+        receita.save()
+        self.assertResumosCorretos()
+
+        receita.delete()
+        self.assertResumosCorretos()
+        self.assertEqual(totais_mensais(self.usuario, 2024)[(2024, 3)], {'R': Decimal('5.00'), 'D': Decimal('3.00')})
+
+    def test_exclusao_de_categoria_e_fornecedor(self):
+        categoria = Categoria.objects.create(usuario=self.usuario, nome='X', tipo='R')
+        fornecedor = Fornecedor.objects.create(usuario=self.usuario, nome='Cliente')
+        Receita.objects.create(
+            usuario=self.usuario, descricao='a', valor=Decimal('10.00'), data=self.data,
+            categoria=categoria, fornecedor=fornecedor,
+        )
+        Receita.objects.create(usuario=self.usuario, descricao='b', valor=Decimal('7.00'), data=self.data,
+                               fornecedor=fornecedor)
+        vinte = Receita.objects.create(usuario=self.usuario, descricao='c', valor=Decimal('20.00'), data=self.data)
+
+        # Os buckets da categoria e do fornecedor vão para o sem categoria/fornecedor
+        categoria.delete()
+        self.assertResumosCorretos()
+        fornecedor.delete()
+        self.assertResumosCorretos()
+        self.assertEqual(ResumoMensal.objects.filter(usuario=self.usuario).count(), 1)
+
+        vinte.delete()
+        self.assertEqual(totais_mensais(self.usuario, 2024)[(2024, 3)]['R'], Decimal('17.00'))
+        self.assertResumosCorretos()
+
+    def test_rebuild_rollups(self):
+        Receita.objects.create(usuario=self.usuario, descricao='a', valor=Decimal('10.00'), data=self.data)
+        Despesa.objects.create(usuario=self.usuario, descricao='b', valor=Decimal('4.00'), data=self.data)
+        esperado = self.resumos()
+        ResumoMensal.objects.all().update(total=0)
+
+        saida = StringIO()
+        call_command('rebuild_rollups', '--usuario', 'teste', stdout=saida)
+        self.assertIn('2 resumo(s)', saida.getvalue())
+        self.assertEqual(self.resumos(), esperado)
+
+
+class ApiRelatorioAnualTest(TestCase):
+    """/relatorios/anual/: um ano ou intervalo de anos, lido dos resumos"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        Receita.objects.create(usuario=self.usuario, descricao='a', valor=Decimal('10.00'),
+                               data=datetime.date(2023, 12, 5), categoria=categoria)
+        Receita.objects.create(usuario=self.usuario, descricao='b', valor=Decimal('20.00'),
+                               data=datetime.date(2023, 12, 6))
+        Despesa.objects.create(usuario=self.usuario, descricao='c', valor=Decimal('4.00'),
+                               data=datetime.date(2024, 1, 2))
+        # A exclusão da categoria não pode alterar os totais
+        categoria.delete()
+
+    def test_um_ano(self):
+        dados = self.client.get('/api/v1/relatorios/anual/?ano=2023').json()
+        self.assertEqual(dados['ano'], 2023)
+        self.assertEqual(len(dados['meses']), 12)
+        self.assertEqual(dados['meses'][11], {'ano': 2023, 'mes': 12, 'receitas': 30.0, 'despesas': 0.0, 'saldo': 30.0})
+
+    def test_intervalo(self):
+        dados = self.client.get('/api/v1/relatorios/anual/?ano_inicio=2023&ano_fim=2024').json()
+        self.assertEqual((dados['ano_inicio'], dados['ano_fim']), (2023, 2024))
+        self.assertEqual(len(dados['meses']), 24)
+        self.assertEqual(dados['meses'][12]['despesas'], 4.0)
+        self.assertEqual(sum(mes['saldo'] for mes in dados['meses']), 26.0)
+
+    def test_limites(self):
+        self.assertEqual(self.client.get('/api/v1/relatorios/anual/?ano_inicio=1995&ano_fim=2024').status_code, 200)
+        for query in ('ano_inicio=1994&ano_fim=2024', 'ano_inicio=2024&ano_fim=2023', 'ano=abc'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/v1/relatorios/anual/?{query}').status_code, 400)
+
+
+class PeriodosTest(TestCase):
+    """Intervalos semiabertos [inicio, fim) a partir de datas com fim inclusivo"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        # Último dia de fevereiro (ano bissexto) e primeiro de março
+        for dia in (datetime.date(2024, 2, 29), datetime.date(2024, 3, 1)):
+            Receita.objects.create(usuario=self.usuario, descricao=str(dia), valor=Decimal('1.00'), data=dia)
+
+    def descricoes(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(receita['descricao'] for receita in response.json())
+
+    def test_intervalos(self):
+        self.assertEqual(intervalo_datas('2024-02-29', '2024-02-29'),
+                         (datetime.date(2024, 2, 29), datetime.date(2024, 3, 1)))
+        self.assertEqual(intervalo_mes(2024, 12), (datetime.date(2024, 12, 1), datetime.date(2025, 1, 1)))
+        # 9999-12-31 não tem dia seguinte: fim sem limite
+        self.assertEqual(intervalo_datas(None, '9999-12-31'), (None, None))
+        self.assertEqual(filtro_periodo_formulario('2024-02-30', '9999-12-31'), {})
+
+    def test_fim_inclusivo(self):
+        url = '/api/v1/receitas/periodo/?data_inicio=2024-02-01&data_fim='
+        self.assertEqual(self.descricoes(url + '2024-02-28'), [])
+        self.assertEqual(self.descricoes(url + '2024-02-29'), ['2024-02-29'])
+        self.assertEqual(self.descricoes(url + '2024-03-01'), ['2024-02-29', '2024-03-01'])
+        self.assertEqual(self.descricoes('/api/v1/receitas/periodo/?data_inicio=2024-03-01'), ['2024-03-01'])
+
+    def test_datas_extremas(self):
+        self.assertEqual(self.descricoes('/api/v1/receitas/periodo/?data_fim=9999-12-31'),
+                         ['2024-02-29', '2024-03-01'])
+        self.assertEqual(self.client.get('/api/v1/receitas/periodo/?data_fim=2024-02-30').status_code, 400)
+
+    def test_relatorios(self):
+        url = reverse('relatorios')
+        response = self.client.get(url, {'action': 'filtrar', 'data_inicio': '2024-02-29', 'data_fim': '2024-02-29'})
+        self.assertEqual([l.descricao for l in response.context['lancamentos']], ['2024-02-29'])
+        self.assertEqual(response.context['data_fim_fmt'], '29/02/2024')
+        # Datas inválidas ou sem dia seguinte são tratadas como filtro vazio
+        response = self.client.get(url, {'action': 'filtrar', 'data_inicio': '2024-13-01', 'data_fim': '9999-12-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['lancamentos']), 2)
+        self.assertEqual(response.context['data_inicio_fmt'], 'Início')
+
+
+class BuscaTextualTest(TestCase):
+    """Busca em descricao/observacoes pelo índice FTS5, sem acentos e por prefixo"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        for descricao, observacoes in (('Aluguel do escritório', ''), ('Conta de luz', 'Pagamento atrasado'),
+                                       ('Material de escritório', 'Papelaria São João')):
+            Despesa.objects.create(usuario=self.usuario, descricao=descricao, observacoes=observacoes,
+                                   valor=Decimal('10.00'), data=datetime.date(2024, 3, 1))
+
+    def buscar(self, termo):
+        return sorted(filtrar_busca(Despesa.objects.all(), termo).values_list('descricao', flat=True))
+
+    def test_prefixo_e_acentos(self):
+        self.assertEqual(self.buscar('alug'), ['Aluguel do escritório'])
+        self.assertEqual(self.buscar('ESCRITORIO'), ['Aluguel do escritório', 'Material de escritório'])
+        self.assertEqual(self.buscar('sao joao'), ['Material de escritório'])
+        # Todas as palavras precisam aparecer, em qualquer um dos campos
+        self.assertEqual(self.buscar('luz atras'), ['Conta de luz'])
+        self.assertEqual(self.buscar('luz escritorio'), [])
+        # Operadores do FTS5 são descartados
+        self.assertEqual(self.buscar('"luz"* ^('), ['Conta de luz'])
+
+    def test_indice_acompanha_gravacoes(self):
+        despesa = Despesa.objects.get(descricao='Conta de luz')
+        despesa.descricao = 'Conta de água'
+        despesa.save()
+        self.assertEqual(self.buscar('luz'), [])
+        self.assertEqual(self.buscar('agua'), ['Conta de água'])
+        despesa.delete()
+        self.assertEqual(self.buscar('agua'), [])
+
+    def test_sem_indice(self):
+        # Bancos sem o índice usam icontains: sem prefixo por palavra, mas acha substrings
+        with mock.patch('APP.busca.indice_disponivel', return_value=False):
+            self.assertEqual(self.buscar('ALUG'), ['Aluguel do escritório'])
+            self.assertEqual(self.buscar('luz atras'), ['Conta de luz'])
+            self.assertEqual(self.buscar('guel'), ['Aluguel do escritório'])
+
+    def test_triggers_recriados(self):
+        # Uma reconstrução da tabela pelo SQLite descarta os triggers
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER "APP_despesa_busca_ai"')
+        Despesa.objects.create(usuario=self.usuario, descricao='Internet', valor=Decimal('1.00'),
+                               data=datetime.date(2024, 3, 2))
+        self.assertEqual(self.buscar('internet'), [])
+
+        self.assertEqual(restaurar_triggers_busca(), ['APP_despesa_busca_ai'])
+        self.assertEqual(restaurar_triggers_busca(), [])
+        # O índice é reconstruído: inclui o que foi gravado sem o trigger
+        self.assertEqual(self.buscar('internet'), ['Internet'])
+        Despesa.objects.create(usuario=self.usuario, descricao='Internet móvel', valor=Decimal('1.00'),
+                               data=datetime.date(2024, 3, 3))
+        self.assertEqual(self.buscar('movel'), ['Internet móvel'])
+
+
+class BuscaFornecedoresTest(TestCase):
+    """Busca de fornecedores por substring nas colunas normalizadas, em dia em qualquer gravação"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        Fornecedor.objects.create(usuario=self.usuario, nome='João Silva', cpf_cnpj='123.456.789-09',
+                                  telefone='(11) 98765-4321')
+        Fornecedor.objects.create(usuario=self.usuario, nome='Papelaria Ltda', nome_fantasia='Papel & Cia',
+                                  email='Contato@Papelaria.com.br', cpf_cnpj='12.345.678/0001-90')
+
+    def buscar(self, termo):
+        return sorted(filtrar_fornecedores(Fornecedor.objects.all(), termo).values_list('nome', flat=True))
+
+    def test_substring(self):
+        self.assertEqual(self.buscar('Silva'), ['João Silva'])
+        self.assertEqual(self.buscar('joao'), ['João Silva'])
+        self.assertEqual(self.buscar('  PAPEL '), ['Papelaria Ltda'])
+        self.assertEqual(self.buscar('& cia'), ['Papelaria Ltda'])
+        self.assertEqual(self.buscar('papelaria.com'), ['Papelaria Ltda'])
+        # Documento e telefone com ou sem pontuação, também no meio
+        self.assertEqual(self.buscar('456.789'), ['João Silva'])
+        self.assertEqual(self.buscar('0001'), ['Papelaria Ltda'])
+        self.assertEqual(self.buscar('98765-4321'), ['João Silva'])
+        self.assertEqual(self.buscar('Souza'), [])
+
+    def test_api(self):
+        response = self.client.get('/api/v1/fornecedores/', {'search': 'silva'})
+        self.assertEqual([f['nome'] for f in response.json()['results']], ['João Silva'])
+
+    def test_gravacoes_em_lote(self):
+        criados = Fornecedor.objects.bulk_create([
+            Fornecedor(usuario=self.usuario, nome='Ótica Visão', cpf_cnpj='55.444.333/0001-22'),
+        ])
+        self.assertEqual(self.buscar('otica'), ['Ótica Visão'])
+        self.assertEqual(self.buscar('55444333'), ['Ótica Visão'])
+
+        criados[0].nome = 'Óptica Visão'
+        Fornecedor.objects.bulk_update(criados, ['nome'])
+        self.assertEqual(self.buscar('optica'), ['Óptica Visão'])
+
+        Fornecedor.objects.filter(nome='João Silva').update(nome='José Souza', telefone='3333-4444')
+        self.assertEqual(self.buscar('jose'), ['José Souza'])
+        self.assertEqual(self.buscar('33334444'), ['José Souza'])
+
+        # Expressões só são conhecidas no banco: as colunas são recalculadas em seguida
+        Fornecedor.objects.filter(nome='José Souza').update(nome=Concat(Value('Dr. '), F('nome')))
+        self.assertEqual(self.buscar('dr. jose'), ['Dr. José Souza'])
+        self.assertEqual(Fornecedor.objects.get(nome='Papelaria Ltda').nome_busca, 'papelaria ltda')
+
+
+class ApiLancamentosConsultasTest(TestCase):
+    """Listagens da API de receitas/despesas não podem fazer consultas por linha"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        # Versão já criada: cada requisição só a lê (ETag)
+        VersaoLedger.objects.create(usuario=self.usuario)
+        self.data = datetime.date(2024, 3, 10)
+
+    def criar_lancamentos(self, quantidade):
+        # Categoria e fornecedor distintos por linha: sem select_related cada
+        # linha custaria uma consulta para cada relacionado
+        for i in range(quantidade):
+            categoria = Categoria.objects.create(usuario=self.usuario, nome=f'Categoria {Categoria.objects.count()}', tipo='R')
+            fornecedor = Fornecedor.objects.create(usuario=self.usuario, nome=f'Fornecedor {i}')
+            for modelo in (Receita, Despesa):
+                modelo.objects.create(
+                    usuario=self.usuario, descricao='Lançamento', valor=Decimal('10.00'),
+                    data=self.data, categoria=categoria, fornecedor=fornecedor,
+                )
+
+    def assertConsultasConstantes(self, url, consultas):
+        self.criar_lancamentos(2)
+        with self.assertNumQueries(consultas):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.criar_lancamentos(10)
+        with self.assertNumQueries(consultas):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_listagem(self):
+        # sessão + usuário, versão (ETag), count da paginação e a página
+        for url in ('/api/v1/receitas/', '/api/v1/despesas/'):
+            with self.subTest(url=url):
+                response = self.assertConsultasConstantes(url, 5)
+                primeiro = response.json()['results'][0]
+                self.assertTrue(primeiro['categoria_nome'].startswith('Categoria'))
+                self.assertTrue(primeiro['fornecedor_nome'].startswith('Fornecedor'))
+                self.assertEqual(primeiro['usuario_username'], 'teste')
+
+    def test_periodo(self):
+        # sessão + usuário, versão (ETag) e os lançamentos do período
+        for url in ('/api/v1/receitas/periodo/', '/api/v1/despesas/periodo/'):
+            with self.subTest(url=url):
+                response = self.assertConsultasConstantes(f'{url}?data_inicio=2024-03-01&data_fim=2024-03-31', 4)
+                self.assertEqual(len(response.json()), Receita.objects.count())
+
+    def test_mensal(self):
+        # sessão + usuário, versão (ETag), receitas, despesas e uma agregação por tabela
+        response = self.assertConsultasConstantes('/api/v1/relatorios/mensal/?mes=3&ano=2024', 7)
+        dados = response.json()
+        self.assertEqual(dados['resumo']['quantidade_receitas'], 12)
+        self.assertEqual(dados['resumo']['quantidade_despesas'], 12)
+        self.assertEqual(len(dados['despesas']), 12)
+
+
+class ApiListagemRapidaTest(TestCase):
+    """?mode=fast devolve exatamente o mesmo que o serializer"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        fornecedor = Fornecedor.objects.create(usuario=self.usuario, nome='Cliente')
+        # Mais que uma página (PAGE_SIZE = 25)
+        for i in range(30):
+            Receita.objects.create(
+                usuario=self.usuario, descricao=f'Receita {i}', valor=Decimal('10.50') * (i + 1),
+                data=datetime.date(2024, 3, 10 + i % 2),
+                categoria=categoria if i % 2 else None, fornecedor=fornecedor if i % 3 else None,
+                comprovante=f'comprovantes/receitas/2024/03/nota {i}.pdf' if i % 2 else '',
+            )
+
+    def assertMesmaResposta(self, url):
+        normal = self.client.get(url)
+        rapida = self.client.get(f'{url}&mode=fast' if '?' in url else f'{url}?mode=fast')
+        self.assertEqual(normal.status_code, 200)
+        # Os links de paginação mantêm o mode=fast; o resto é idêntico
+        self.assertEqual(rapida.content.replace(b'mode=fast&', b'').replace(b'&mode=fast', b''), normal.content)
+        return rapida.json()
+
+    def test_listagem(self):
+        dados = self.assertMesmaResposta('/api/v1/receitas/')
+        self.assertEqual(dados['count'], 30)
+
+    def test_listagem_por_cursor(self):
+        dados = self.assertMesmaResposta('/api/v1/receitas/?cursor=')
+        self.assertEqual(len(dados['results']), 25)
+        # O cursor gerado no modo rápido aponta para o mesmo lugar
+        proxima = dados['next'].replace('http://testserver', '').replace('&mode=fast', '')
+        dados = self.assertMesmaResposta(proxima)
+        self.assertEqual(len(dados['results']), 5)
+
+    def test_periodo(self):
+        dados = self.assertMesmaResposta('/api/v1/receitas/periodo/?data_inicio=2024-03-01&data_fim=2024-03-31')
+        self.assertEqual(len(dados), 30)
+        self.assertTrue(any(item['comprovante_url'] for item in dados))
+
+
+class ApiLoteTest(TestCase):
+    """Endpoints /lote/: tudo ou nada, resumos e dados derivados em dia"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        self.categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        self.fornecedor = Fornecedor.objects.create(usuario=self.usuario, nome='Cliente')
+        VersaoLedger.objects.create(usuario=self.usuario)
+
+    def itens(self, quantidade):
+        return [
+            {
+                'descricao': f'Receita {i}', 'valor': f'{i + 1}.50', 'data': f'2024-0{i % 3 + 1}-10',
+                'categoria': self.categoria.pk if i % 2 else None, 'fornecedor': self.fornecedor.pk,
+            }
+            for i in range(quantidade)
+        ]
+
+    def enviar(self, metodo, dados):
+        return getattr(self.client, metodo)('/api/v1/receitas/lote/', dados, content_type='application/json')
+
+    def assertResumosCorretos(self):
+        # Os resumos mantidos pelo lote são iguais aos recalculados do zero
+        campos = ('ano', 'mes', 'tipo', 'categoria_id', 'fornecedor_id', 'total', 'quantidade')
+        mantidos = set(ResumoMensal.objects.values_list(*campos))
+        reconstruir_resumos(self.usuario)
+        self.assertEqual(mantidos, set(ResumoMensal.objects.values_list(*campos)))
+
+    def test_incluir(self):
+        # sessão + usuário, categorias e fornecedores citados, um INSERT, por
+        # bucket de resumo novo (6) UPDATE + INSERT em savepoint (4), versão e
+        # 2 savepoints: nada por item
+        with self.assertNumQueries(34):
+            response = self.enviar('post', self.itens(50))
+        self.assertEqual(response.status_code, 201)
+        resultados = response.json()['resultados']
+        self.assertEqual([r['indice'] for r in resultados], list(range(50)))
+        self.assertEqual(Receita.objects.filter(usuario=self.usuario).count(), 50)
+        self.assertEqual(VersaoLedger.objects.get(usuario=self.usuario).versao, 1)
+        self.assertResumosCorretos()
+
+    def test_item_invalido_nao_grava_nada(self):
+        outro = User.objects.create_user(username='outro', password='senha-teste-123')
+        alheia = Categoria.objects.create(usuario=outro, nome='Alheia', tipo='R')
+        itens = self.itens(3)
+        itens[1]['valor'] = 'abc'
+        itens[2]['categoria'] = alheia.pk
+        response = self.enviar('post', itens)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['indice'] for r in response.json()['resultados']], [1, 2])
+        self.assertFalse(Receita.objects.exists())
+
+    def test_editar(self):
+        ids = [r['id'] for r in self.enviar('post', self.itens(6)).json()['resultados']]
+        antes = Receita.objects.get(pk=ids[0]).data_atualizacao
+        response = self.enviar('patch', [
+            {'id': pk, 'valor': '99.00', 'data': '2024-05-01'} for pk in ids[:3]
+        ])
+        self.assertEqual(response.status_code, 200)
+        receita = Receita.objects.get(pk=ids[0])
+        self.assertEqual(receita.valor, Decimal('99.00'))
+        self.assertGreater(receita.data_atualizacao, antes)
+        self.assertEqual(VersaoLedger.objects.get(usuario=self.usuario).versao, 2)
+        self.assertResumosCorretos()
+
+        response = self.enviar('patch', [{'id': ids[0], 'valor': '1.00'}, {'id': 0, 'valor': '1.00'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Receita.objects.get(pk=ids[0]).valor, Decimal('99.00'))
+
+    def test_excluir(self):
+        ids = [r['id'] for r in self.enviar('post', self.itens(6)).json()['resultados']]
+        response = self.enviar('delete', ids[:4])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Receita.objects.count(), 2)
+        self.assertEqual(
+            sorted(RegistroExclusao.objects.filter(modelo='receita').values_list('objeto_id', flat=True)),
+            sorted(ids[:4]),
+        )
+        self.assertResumosCorretos()
+
+    def test_limite(self):
+        with self.settings(API_LOTE_MAXIMO=2):
+            response = self.enviar('post', self.itens(3))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Receita.objects.exists())
+
+
+class ImportacaoExtratoTest(TestCase):
+    """Importação de extratos OFX/CSV: lançamentos na conta, sem duplicar"""
+
+    OFX = (
+        'OFXHEADER:100\nDATA:OFXSGML\nCHARSET:1252\n\n'
+        '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+        '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240305120000[-3:BRT]<TRNAMT>1500.00'
+        '<FITID>A1<MEMO>Venda à vista\n</STMTTRN>\n'
+        '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240306<TRNAMT>-89.90<FITID>A2<NAME>Energia\n</STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    ).encode('cp1252')
+
+    CSV = (
+        'Data;Histórico;Docto.;Crédito (R$);Débito (R$)\n'
+        '01/03/2024;SALDO ANTERIOR;;;\n'
+        '02/03/2024;PIX RECEBIDO;123;1.234,56;\n'
+        '02/03/2024;TARIFA;;;-10,00\n'
+        '02/03/2024;TARIFA;;;-10,00\n'
+        '03/03/2024;ESTORNO;;abc;\n'
+    ).encode('utf-8')
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        perfil = PerfilEmpresa.objects.create(usuario=self.usuario)
+        self.conta = ContaBancaria.objects.create(
+            perfil_empresa=perfil, nome_banco='Banco', codigo_banco='001', agencia='1', conta_corrente='2'
+        )
+
+    def importar(self, nome, conteudo):
+        return self.client.post(reverse('importar_extrato'), {
+            'conta': self.conta.pk,
+            'arquivo': SimpleUploadedFile(nome, conteudo),
+        })
+
+    def test_ofx(self):
+        response = self.importar('extrato.ofx', self.OFX)
+        self.assertEqual(response.status_code, 200)
+        resultado = response.context['resultado']
+        self.assertEqual((resultado.receitas, resultado.despesas), (1, 1))
+
+        receita = Receita.objects.get()
+        self.assertEqual(receita.descricao, 'Venda à vista')
+        self.assertEqual(receita.valor, Decimal('1500.00'))
+        self.assertEqual(receita.data, datetime.date(2024, 3, 5))
+        self.assertEqual(receita.conta_bancaria, self.conta)
+        self.assertEqual(Despesa.objects.get().valor, Decimal('89.90'))
+
+        # Importar de novo não duplica nada
+        resultado = self.importar('extrato.ofx', self.OFX).context['resultado']
+        self.assertEqual((resultado.inseridas, resultado.duplicadas), (0, 2))
+        self.assertEqual(Receita.objects.count() + Despesa.objects.count(), 2)
+
+    def test_csv(self):
+        resultado = self.importar('extrato.csv', self.CSV).context['resultado']
+        # Linhas iguais no mesmo dia são lançamentos distintos; saldo é ignorado
+        self.assertEqual((resultado.receitas, resultado.despesas), (1, 2))
+        self.assertEqual((resultado.ignoradas, resultado.invalidas), (1, 1))
+        self.assertEqual(Receita.objects.get().valor, Decimal('1234.56'))
+
+        resultado = self.importar('extrato.csv', self.CSV).context['resultado']
+        self.assertEqual((resultado.inseridas, resultado.duplicadas), (0, 3))
+
+        # Os resumos mensais acompanham a importação
+        self.assertEqual(
+            ResumoMensal.objects.filter(usuario=self.usuario, tipo='D').get().total, Decimal('20.00')
+        )
+
+    def test_linhas_iguais_fora_de_ordem(self):
+        # Extrato com as datas intercaladas: a segunda TARIFA do dia 02 vem
+        # depois de uma linha do dia 03 e não pode repetir a ocorrência da primeira
+        intercalado = (
+            'Data;Histórico;Docto.;Crédito (R$);Débito (R$)\n'
+            '02/03/2024;TARIFA;;;-10,00\n'
+            '03/03/2024;TARIFA;;;-10,00\n'
+            '02/03/2024;TARIFA;;;-10,00\n'
+        ).encode('utf-8')
+        resultado = self.importar('extrato.csv', intercalado).context['resultado']
+        self.assertEqual((resultado.despesas, resultado.duplicadas), (3, 0))
+        self.assertEqual(Despesa.objects.filter(data=datetime.date(2024, 3, 2)).count(), 2)
+
+        # Reimportar (em qualquer ordem) não duplica
+        ordenado = (
+            'Data;Histórico;Docto.;Crédito (R$);Débito (R$)\n'
+            '02/03/2024;TARIFA;;;-10,00\n'
+            '02/03/2024;TARIFA;;;-10,00\n'
+            '03/03/2024;TARIFA;;;-10,00\n'
+        ).encode('utf-8')
+        for conteudo in (intercalado, ordenado):
+            resultado = self.importar('extrato.csv', conteudo).context['resultado']
+            self.assertEqual((resultado.inseridas, resultado.duplicadas), (0, 3))
+        self.assertEqual(Despesa.objects.count(), 3)
+
+    def test_importacoes_simultaneas(self):
+        extrato = (
+            'Data;Histórico;Docto.;Crédito (R$);Débito (R$)\n'
+            '02/03/2024;TARIFA;;;-10,00\n'
+            '03/03/2024;ENERGIA;;;-80,00\n'
+            '04/03/2024;ÁGUA;;;-40,00\n'
+        ).encode('utf-8')
+        # Outra importação gravou a TARIFA depois da consulta das linhas já
+        # importadas: a consulta não a vê e o INSERT do lote viola o índice único
+        Despesa.objects.create(
+            usuario=self.usuario, conta_bancaria=self.conta, descricao='TARIFA', valor=Decimal('10.00'),
+            data=datetime.date(2024, 3, 2),
+            hash_importacao=hash_linha(self.conta.pk, datetime.date(2024, 3, 2), 'TARIFA', Decimal('-10.00'), '', 1),
+        )
+        ResumoMensal.objects.all().delete()
+        with mock.patch.object(Despesa.objects, 'filter', return_value=Despesa.objects.none()):
+            resultado = self.importar('extrato.csv', extrato).context['resultado']
+        self.assertEqual((resultado.despesas, resultado.duplicadas), (2, 1))
+        self.assertEqual(Despesa.objects.count(), 3)
+        # Os resumos só contam as linhas gravadas por esta importação
+        self.assertEqual(
+            ResumoMensal.objects.filter(usuario=self.usuario, tipo='D').get().total, Decimal('120.00')
+        )
+
+    def test_cabecalho_invalido(self):
+        response = self.importar('extrato.csv', b'a;b;c\n1;2;3\n')
+        self.assertTrue(response.context['form'].errors['arquivo'])
+        self.assertFalse(Receita.objects.exists())
+
+
+class ApiRespostaCondicionalTest(TestCase):
+    """ETag/Last-Modified pela versão do ledger: 304 sem consultar os lançamentos"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        Receita.objects.create(
+            usuario=self.usuario, descricao='Venda', valor=Decimal('10.00'), data=datetime.date(2024, 3, 10)
+        )
+
+    def test_nao_modificado(self):
+        for url in ('/api/v1/receitas/', '/api/v1/despesas/', '/api/v1/relatorios/dashboard/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+                self.assertTrue(response.has_header('Last-Modified'))
+
+                # sessão + usuário e a versão: nenhuma consulta aos lançamentos
+                with self.assertNumQueries(3):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_alteracao_muda_etag(self):
+        etag = self.client.get('/api/v1/receitas/')['ETag']
+        Despesa.objects.create(
+            usuario=self.usuario, descricao='Luz', valor=Decimal('5.00'), data=datetime.date(2024, 3, 11)
+        )
+        response = self.client.get('/api/v1/receitas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified_apos_gravacao(self):
+        Despesa.objects.create(
+            usuario=self.usuario, descricao='Luz', valor=Decimal('5.00'), data=datetime.date(2024, 3, 11)
+        )
+        response = self.client.get('/api/v1/receitas/')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/v1/receitas/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_por_url(self):
+        # Outra página/filtro é outro recurso
+        self.assertNotEqual(
+            self.client.get('/api/v1/receitas/')['ETag'],
+            self.client.get('/api/v1/receitas/?mode=fast')['ETag'],
+        )
+
+
+class LancamentosUnificadosTest(TestCase):
+    """UNION ALL de receitas e despesas: paginação por OFFSET e por cursor na mesma ordem total"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        PreferenciaUsuario.objects.create(usuario=self.usuario, itens_por_pagina=3)
+        cadastro = datetime.datetime(2024, 3, 10, 12, 0, tzinfo=datetime.timezone.utc)
+        # Mesma data, com data_cadastro igual entre receitas e despesas (desempate
+        # por tipo e id), nula (registros antigos) e diferente
+        for i, (dia, instante) in enumerate([
+            (10, cadastro), (10, cadastro), (10, None), (10, None),
+            (10, cadastro - datetime.timedelta(hours=1)), (9, None), (9, cadastro), (11, cadastro),
+        ]):
+            for modelo in (Receita, Despesa):
+                lancamento = modelo.objects.create(
+                    usuario=self.usuario, descricao=f'{modelo.__name__} {i}', valor=Decimal('1.00'),
+                    data=datetime.date(2024, 3, dia),
+                )
+                modelo.objects.filter(pk=lancamento.pk).update(data_cadastro=instante)
+
+        self.unificados = LancamentosUnificados({
+            'R': Receita.objects.filter(usuario=self.usuario),
+            'D': Despesa.objects.filter(usuario=self.usuario),
+        })
+        # Ordem esperada: data e data_cadastro decrescentes (nulos no fim), receitas antes de despesas, id decrescente
+        todos = list(Receita.objects.all()) + list(Despesa.objects.all())
+        todos.sort(reverse=True, key=lambda l: (
+            l.data, l.data_cadastro is not None, l.data_cadastro or cadastro, isinstance(l, Receita), l.pk,
+        ))
+        self.esperado = [chave_lancamento(l) for l in todos]
+
+    def chaves(self, lancamentos):
+        return [chave_lancamento(l) for l in lancamentos]
+
+    def test_paginacao_offset(self):
+        self.assertEqual(self.unificados.count(), 16)
+        for inicio in range(0, 16, 5):
+            with self.subTest(inicio=inicio):
+                self.assertEqual(self.chaves(self.unificados[inicio:inicio + 5]), self.esperado[inicio:inicio + 5])
+
+    def test_paginacao_cursor(self):
+        # Todos os tamanhos de página: o cursor cai em cada tipo de empate
+        for tamanho in range(1, 6):
+            with self.subTest(tamanho=tamanho):
+                visitados, cursor = [], None
+                while True:
+                    pagina, cursor = self.unificados.pagina_apos(cursor, tamanho)
+                    visitados += self.chaves(pagina)
+                    if cursor is None:
+                        break
+                self.assertEqual(visitados, self.esperado)
+
+    def test_filtro_apos_cursor(self):
+        # Cada chave filtra exatamente os lançamentos que vêm depois dela, nas duas tabelas
+        for posicao, chave in enumerate(self.esperado):
+            with self.subTest(chave=chave):
+                depois = [
+                    chave_lancamento(l)
+                    for modelo, tipo in ((Receita, 'R'), (Despesa, 'D'))
+                    for l in modelo.objects.filter(filtro_apos_cursor(chave, tipo))
+                ]
+                self.assertCountEqual(depois, self.esperado[posicao + 1:])
+
+    def test_listagem(self):
+        url = reverse('listar_lancamentos')
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(response.context['total_lancamentos'], 16)
+        self.assertEqual(self.chaves(response.context['lancamentos']), self.esperado[3:6])
+
+        # Por cursor não há COUNT: o total fica oculto
+        cursor = codificar_cursor(self.esperado[2])
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertIsNone(response.context['total_lancamentos'])
+        self.assertEqual(self.chaves(response.context['lancamentos']), self.esperado[3:6])
+        self.assertContains(response, 'Exibindo 3 lançamento(s) nesta página')
+
+
+class ApiLancamentosUnificadosTest(TestCase):
+    """/api/v1/lancamentos/: receitas e despesas em uma listagem com saldo acumulado"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        self.categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        for dia in range(1, 11):
+            Receita.objects.create(
+                usuario=self.usuario, descricao=f'Venda {dia}', valor=Decimal('100.00'),
+                data=datetime.date(2024, 3, dia), categoria=self.categoria if dia % 2 else None,
+            )
+            Despesa.objects.create(
+                usuario=self.usuario, descricao=f'Aluguel {dia}', valor=Decimal('30.00') + dia,
+                data=datetime.date(2024, 3, dia),
+            )
+
+    def paginas(self, url):
+        while url:
+            dados = self.client.get(url).json()
+            yield dados
+            url = dados['next']
+
+    def test_ordem_e_saldo_acumulado(self):
+        itens = []
+        for dados in self.paginas('/api/v1/lancamentos/?page_size=3'):
+            self.assertLessEqual(len(dados['results']), 3)
+            itens.extend(dados['results'])
+        self.assertEqual(len(itens), 20)
+        self.assertEqual([item['data'] for item in itens], sorted((item['data'] for item in itens), reverse=True))
+        self.assertEqual({item['tipo'] for item in itens}, {'R', 'D'})
+
+        # Do mais antigo para o mais recente, como em um extrato
+        saldo = Decimal('0.00')
+        for item in reversed(itens):
+            saldo += Decimal(item['valor']) if item['tipo'] == 'R' else -Decimal(item['valor'])
+            self.assertEqual(Decimal(str(item['saldo_acumulado'])), saldo)
+        self.assertEqual(saldo, Decimal('1000.00') - Decimal('355.00'))
+
+    def test_totais_da_pagina(self):
+        dados = self.client.get('/api/v1/lancamentos/?page_size=4').json()
+        totais = {chave: Decimal(str(valor)) for chave, valor in dados['totais'].items()}
+        # Dias 10 e 9: 2 receitas de 100 e despesas de 40 e 39
+        self.assertEqual(totais['receitas'], Decimal('200.00'))
+        self.assertEqual(totais['despesas'], Decimal('79.00'))
+        self.assertEqual(totais['saldo_acumulado'], Decimal('645.00'))
+        self.assertEqual(totais['saldo_anterior'] + totais['saldo'], totais['saldo_acumulado'])
+
+    def test_filtros(self):
+        dados = self.client.get('/api/v1/lancamentos/?tipo=D&valor_min=35&valor_max=38').json()
+        self.assertEqual([item['valor'] for item in dados['results']], ['38.00', '37.00', '36.00', '35.00'])
+
+        dados = self.client.get(f'/api/v1/lancamentos/?categoria={self.categoria.pk}').json()
+        self.assertEqual(len(dados['results']), 5)
+
+        dados = self.client.get('/api/v1/lancamentos/?search=alug&data_inicio=2024-03-09').json()
+        self.assertEqual([item['descricao'] for item in dados['results']], ['Aluguel 10', 'Aluguel 9'])
+        self.assertIsNone(dados['next'])
+
+    def test_parametros_invalidos(self):
+        for query in ('tipo=X', 'valor_min=abc', 'categoria=abc', 'data_inicio=2024-13-01'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/v1/lancamentos/?{query}').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/lancamentos/?cursor=xyz').status_code, 404)
+
+
+class ApiPivotTest(TestCase):
+    """/api/v1/relatorios/pivot/: agrupamento no banco, em uma consulta"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        self.categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        for mes in (1, 2, 4):
+            Receita.objects.create(
+                usuario=self.usuario, descricao='Venda', valor=Decimal('100.00') * mes,
+                data=datetime.date(2024, mes, 5), categoria=self.categoria,
+            )
+            Receita.objects.create(
+                usuario=self.usuario, descricao='Juros', valor=Decimal('1.00'), data=datetime.date(2024, mes, 6)
+            )
+            Despesa.objects.create(
+                usuario=self.usuario, descricao='Aluguel', valor=Decimal('50.00'), data=datetime.date(2024, mes, 10)
+            )
+        VersaoLedger.objects.get_or_create(usuario=self.usuario)
+
+    def test_padrao_por_tipo(self):
+        # sessão + usuário, versão e o UNION agrupado
+        with self.assertNumQueries(4):
+            dados = self.client.get('/api/v1/relatorios/pivot/').json()
+        self.assertEqual(dados['resultados'], [
+            {'tipo': 'D', 'soma': 150.0, 'quantidade': 3},
+            {'tipo': 'R', 'soma': 703.0, 'quantidade': 6},
+        ])
+
+    def test_dimensoes_e_medidas(self):
+        dados = self.client.get(
+            '/api/v1/relatorios/pivot/?dimensoes=trimestre,categoria&medidas=soma,media,minimo,maximo,quantidade'
+        ).json()
+        linhas = {(linha['trimestre'], linha['categoria_id']): linha for linha in dados['resultados']}
+        self.assertEqual(set(linhas), {(1, self.categoria.pk), (1, None), (2, self.categoria.pk), (2, None)})
+
+        # Sem a dimensão tipo, receitas e despesas sem categoria vão juntas
+        sem_categoria = linhas[(1, None)]
+        self.assertEqual(sem_categoria['quantidade'], 4)
+        self.assertEqual(Decimal(str(sem_categoria['soma'])), Decimal('102.00'))
+        self.assertEqual(Decimal(str(sem_categoria['media'])), Decimal('25.50'))
+        self.assertEqual((sem_categoria['minimo'], sem_categoria['maximo']), (1.0, 50.0))
+        self.assertEqual(linhas[(2, self.categoria.pk)]['categoria_nome'], 'Vendas')
+
+    def test_filtros(self):
+        dados = self.client.get('/api/v1/relatorios/pivot/?dimensoes=mes&tipo=R&valor_min=10').json()
+        self.assertEqual(
+            [(linha['mes'], linha['soma']) for linha in dados['resultados']],
+            [(1, 100.0), (2, 200.0), (4, 400.0)],
+        )
+
+    def test_parametros_invalidos(self):
+        for query in ('dimensoes=dia', 'medidas=mediana', 'tipo=X'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/v1/relatorios/pivot/?{query}').status_code, 400)
+
+
+def textos_pdf(conteudo):
+    """Textos desenhados em cada página de um PDF do reportlab (ASCII85 + Flate)"""
+    paginas = []
+    for bruto in re.findall(rb'/Filter \[ /ASCII85Decode /FlateDecode \] /Length \d+\s*>>\s*stream\r?\n(.*?)endstream',
+                            conteudo, re.S):
+        fluxo = zlib.decompress(base64.a85decode(bruto.strip().removesuffix(b'~>')))
+        paginas.append([
+            re.sub(rb'\\([0-7]{1,3}|.)', lambda escape: (
+                bytes([int(escape.group(1), 8)]) if escape.group(1).isdigit() else escape.group(1)
+            ), texto).decode('cp1252')
+            for texto in re.findall(rb'\(((?:\\.|[^\\)])*)\) Tj', fluxo)
+        ])
+    return paginas
+
+
+class ExportacaoTest(TestCase):
+    """CSV em streaming, Excel write-only e PDF desenhado no canvas"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        self.perfil = PerfilEmpresa.objects.create(usuario=self.usuario, razao_social='ELC Ltda', cnpj='12.345.678/0001-90')
+        categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        fornecedor = Fornecedor.objects.create(usuario=self.usuario, nome='Papelaria', cpf_cnpj='98.765.432/0001-10')
+        Receita.objects.create(usuario=self.usuario, descricao='Venda; à vista', valor=Decimal('1234.50'),
+                               data=datetime.date(2024, 3, 10), categoria=categoria)
+        Despesa.objects.create(usuario=self.usuario, descricao='Papel', valor=Decimal('30.25'),
+                               data=datetime.date(2024, 3, 5), fornecedor=fornecedor)
+        Receita.objects.create(usuario=self.usuario, descricao='Serviço', valor=Decimal('100.00'),
+                               data=datetime.date(2024, 2, 1))
+
+    def querysets(self, **filtros):
+        return querysets_exportacao(self.usuario, filtros)
+
+    def test_csv(self):
+        blocos = gerar_csv(linhas_lancamentos(self.querysets()), linhas_por_bloco=2)
+        # O cabeçalho sai antes de qualquer consulta
+        with self.assertNumQueries(0):
+            self.assertEqual(next(blocos), 'Data;Descricao;Tipo;Categoria;Fornecedor;CNPJ/CPF;Valor\r\n')
+        restantes = list(blocos)
+        self.assertEqual(len(restantes), 2)
+        self.assertEqual(''.join(restantes).splitlines(), [
+            '10/03/2024;"Venda; à vista";Receita;Vendas;-;-;1234,50',
+            '05/03/2024;Papel;Despesa;Sem Categoria;Papelaria;98.765.432/0001-10;30,25',
+            '01/02/2024;Serviço;Receita;Sem Categoria;-;-;100,00',
+        ])
+
+    def test_csv_filtros(self):
+        # Datas inválidas são ignoradas; o fim do período é inclusivo
+        querysets = self.querysets(tipo_lancamento='R', data_inicio='2024-02-31', data_fim='2024-03-10')
+        linhas = [linha[1] for linha in linhas_lancamentos(querysets)]
+        self.assertEqual(linhas, ['Venda; à vista', 'Serviço'])
+
+    def test_csv_download(self):
+        with tempfile.TemporaryDirectory() as diretorio, self.settings(EXPORTACAO_CACHE_DIR=diretorio):
+            response = self.client.get(reverse('exportar_csv'))
+            self.assertTrue(response.streaming)
+            conteudo = b''.join(response.streaming_content)
+            self.assertEqual(len(conteudo.decode('utf-8').splitlines()), 4)
+            # O segundo download vem do arquivo gravado durante o primeiro
+            response = self.client.get(reverse('exportar_csv'))
+            self.assertEqual(b''.join(response.streaming_content), conteudo)
+            self.assertEqual(len(os.listdir(diretorio)), 1)
+
+    def test_excel(self):
+        from openpyxl import load_workbook
+
+        destino = BytesIO()
+        self.assertEqual(escrever_excel(self.querysets(), destino), 3)
+        ws = load_workbook(destino)['Lançamentos']
+        self.assertEqual(list(ws.iter_rows(values_only=True)), [
+            ('Data', 'Tipo', 'Descrição', 'Categoria', 'Fornecedor', 'CPF/CNPJ', 'Valor'),
+            ('01/02/2024', 'Receita', 'Serviço', '-', '-', '-', 100),
+            ('10/03/2024', 'Receita', 'Venda; à vista', 'Vendas', '-', '-', 1234.5),
+            ('05/03/2024', 'Despesa', 'Papel', '-', 'Papelaria', '98.765.432/0001-10', -30.25),
+            (None,) * 7,
+            (None,) * 5 + ('Total Receitas:', 1334.5),
+            (None,) * 5 + ('Total Despesas:', -30.25),
+            (None,) * 5 + ('BALANÇO:', 1304.25),
+        ])
+
+        # Os estilos são aplicados copiando o StyleArray de cada NamedStyle
+        # (atributos internos do openpyxl 3.1): confere o resultado no arquivo
+        cabecalho = ws['A1']
+        self.assertEqual(cabecalho.style, 'cabecalho')
+        self.assertTrue(cabecalho.font.b)
+        self.assertEqual(cabecalho.font.color.rgb, '00FFFFFF')
+        self.assertEqual(cabecalho.fill.fgColor.rgb, '004472C4')
+        self.assertEqual(cabecalho.alignment.horizontal, 'center')
+        self.assertEqual(ws['C2'].style, 'celula')
+        self.assertEqual(ws['C2'].border.left.style, 'thin')
+        for referencia, estilo, cor in (('G2', 'valor_receita', '00198754'), ('G4', 'valor_despesa', '00DC3545'),
+                                        ('G8', 'balanco_positivo', '00198754')):
+            with self.subTest(celula=referencia):
+                self.assertEqual(ws[referencia].style, estilo)
+                self.assertEqual(ws[referencia].number_format, 'R$ #,##0.00')
+                self.assertEqual(ws[referencia].font.color.rgb, cor)
+        self.assertEqual(ws.column_dimensions['C'].width, 40)
+
+    def test_pdf(self):
+        Despesa.objects.bulk_create([
+            Despesa(usuario=self.usuario, descricao=f'Item {i}', valor=Decimal('1.00'), data=datetime.date(2024, 1, 1))
+            for i in range(80)
+        ])
+        destino = BytesIO()
+        self.assertEqual(escrever_pdf(self.querysets(), destino, self.perfil, {'data_fim': '2024-12-31'}), 83)
+
+        paginas = textos_pdf(destino.getvalue())
+        self.assertEqual(len(paginas), 3)
+        primeira = paginas[0]
+        self.assertIn('RELATÓRIO FINANCEIRO', primeira)
+        self.assertIn('ELC Ltda - CNPJ: 12.345.678/0001-90', primeira)
+        self.assertIn('Até 31/12/2024', primeira)
+        self.assertIn('Receitas: R$ 1.334,50', primeira)
+        self.assertIn('Balanço: R$ 1.224,25', primeira)
+        self.assertIn('Lançamentos: 83', primeira)
+        # Mais recentes primeiro, com o sinal e a cor de cada tipo
+        self.assertEqual(primeira[primeira.index('Valor') + 1:][:5],
+                         ['10/03/2024', 'Vendas', '-', '-', '+ R$ 1.234,50'])
+        self.assertIn('- R$ 30,25', primeira)
+        # Cada página tem o cabeçalho da tabela e a numeração
+        linhas = 0
+        for numero, pagina in enumerate(paginas, 1):
+            self.assertIn(f'Pág. {numero}', pagina)
+            self.assertIn('Data', pagina)
+            linhas += sum(1 for texto in pagina if re.fullmatch(r'[+-] R\$ [\d.,]+', texto))
+        self.assertEqual(linhas, 83)
+
+
+class ExportacaoJobTest(TestCase):
+    """Jobs de exportação abandonados: pelo próprio processo ou sem sinal de vida"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+
+    def job(self, processo='outro-host:123:abcd', batimento=datetime.timedelta(0), **campos):
+        return ExportacaoJob.objects.create(
+            usuario=self.usuario, formato='csv', processo=processo,
+            data_batimento=timezone.now() - batimento, **campos,
+        )
+
+    def status(self, job):
+        return self.client.get(reverse('status_exportacao', args=[job.pk])).json()
+
+    def test_outro_processo(self):
+        # Geração longa em outro processo, com sinal de vida recente: segue em andamento
+        job = self.job(status='processando', batimento=datetime.timedelta(seconds=60))
+        ExportacaoJob.objects.filter(pk=job.pk).update(data_criacao=timezone.now() - datetime.timedelta(hours=5))
+        self.assertEqual(self.status(job)['status'], 'processando')
+
+        # Sem sinal por 4 intervalos de EXPORTACAO_BATIMENTO (30 s): o processo terminou
+        job = self.job(status='processando', batimento=datetime.timedelta(seconds=121))
+        dados = self.status(job)
+        self.assertEqual(dados['status'], 'erro')
+        self.assertIn('interrompida', dados['erro'])
+
+    def test_mesmo_processo(self):
+        # Registrado por este processo, mas fora da fila dele: não vai mais andar
+        job = self.job(processo=tarefas.identificador_processo())
+        self.assertTrue(tarefas.job_abandonado(job))
+        tarefas._jobs_do_processo.add(job.pk)
+        try:
+            self.assertFalse(tarefas.job_abandonado(job))
+        finally:
+            tarefas._jobs_do_processo.discard(job.pk)
+
+        concluido = self.job(processo=tarefas.identificador_processo(), status='concluido')
+        self.assertFalse(tarefas.job_abandonado(concluido))
+
+    def test_concluido_durante_a_consulta(self):
+        # A thread conclui o job (e o tira da fila) entre a leitura feita pela
+        # consulta de status e a verificação de abandono
+        job = self.job(processo=tarefas.identificador_processo(), status='processando')
+        job_abandonado = tarefas.job_abandonado
+
+        def concluir_e_verificar(lido):
+            ExportacaoJob.objects.filter(pk=lido.pk).update(status='concluido', arquivo='exportacoes/a.csv')
+            return job_abandonado(lido)
+
+        with mock.patch('APP.tarefas.job_abandonado', side_effect=concluir_e_verificar):
+            dados = self.status(job)
+        self.assertEqual(dados['status'], 'concluido')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.erro), ('concluido', ''))
+
+    def test_batimento(self):
+        job = self.job(batimento=datetime.timedelta(hours=1))
+        concluido = self.job(status='concluido', batimento=datetime.timedelta(hours=1))
+        tarefas.registrar_batimento([job.pk, concluido.pk])
+        job.refresh_from_db()
+        concluido.refresh_from_db()
+        self.assertEqual(job.processo, tarefas.identificador_processo())
+        self.assertLess(timezone.now() - job.data_batimento, datetime.timedelta(seconds=5))
+        self.assertGreater(timezone.now() - concluido.data_batimento, datetime.timedelta(minutes=59))
+
+    def test_limpeza_preserva_jobs_vivos(self):
+        antigo = timezone.now() - datetime.timedelta(hours=25)
+        vivo = self.job(status='processando')
+        parado = self.job(status='processando', batimento=datetime.timedelta(hours=2))
+        concluido = self.job(status='concluido')
+        ExportacaoJob.objects.update(data_criacao=antigo)
+        tarefas.limpar_exportacoes_antigas(self.usuario)
+        self.assertEqual(list(ExportacaoJob.objects.values_list('pk', flat=True)), [vivo.pk])
+        self.assertFalse(ExportacaoJob.objects.filter(pk__in=[parado.pk, concluido.pk]).exists())
+
+
+class ExportacaoCicloTest(TransactionTestCase):
+    """Ciclo completo: criação, geração na thread do executor, status e download"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        for dia in range(1, 6):
+            Receita.objects.create(usuario=self.usuario, descricao=f'Venda {dia}', valor=Decimal('10.00'),
+                                   data=datetime.date(2024, 3, dia))
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        configuracoes = self.settings(
+            MEDIA_ROOT=self.media.name, EXPORTACAO_CACHE_DIR=os.path.join(self.media.name, 'cache'),
+        )
+        configuracoes.enable()
+        self.addCleanup(configuracoes.disable)
+
+    def aguardar(self, url):
+        for _ in range(100):
+            dados = self.client.get(url).json()
+            if dados['status'] not in tarefas.STATUS_ATIVOS:
+                return dados
+            time.sleep(0.05)
+        self.fail('A exportação não terminou')
+
+    def test_concluida(self):
+        response = self.client.post(reverse('criar_exportacao'), {'formato': 'csv', 'data_fim': '2024-03-03'})
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], 'pendente')
+
+        dados = self.aguardar(job['url_status'])
+        self.assertEqual(dados['status'], 'concluido')
+        self.assertEqual((dados['processados'], dados['total'], dados['percentual']), (3, 3, 100))
+        download = self.client.get(dados['url_download'])
+        linhas = b''.join(download.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(linhas[1:], [f'0{dia}/03/2024;Venda {dia};Receita;Sem Categoria;-;-;10,00' for dia in (3, 2, 1)])
+
+    def test_erro(self):
+        with mock.patch('APP.tarefas.escrever_csv', side_effect=RuntimeError('<b>disco cheio</b>')), \
+                self.assertLogs('APP.tarefas', 'ERROR'):
+            job = self.client.post(reverse('criar_exportacao'), {'formato': 'csv'}).json()
+            dados = self.aguardar(job['url_status'])
+        self.assertEqual(dados['status'], 'erro')
+        # A página mostra a mensagem com textContent: o texto vai como está
+        self.assertEqual(dados['erro'], '<b>disco cheio</b>')
+        self.assertEqual(self.client.get(reverse('baixar_exportacao', args=[job['id']])).status_code, 404)
+
+    def test_interrompida_durante_a_geracao(self):
+        # Dada como interrompida (ex.: por outro processo) enquanto a thread
+        # gerava o arquivo: a thread não sobrescreve o erro
+        def interromper(querysets, destino, progresso=None):
+            tarefas.marcar_interrompido(ExportacaoJob.objects.get())
+            destino.write(b'x')
+
+        with mock.patch('APP.tarefas.escrever_csv', side_effect=interromper):
+            job = self.client.post(reverse('criar_exportacao'), {'formato': 'csv'}).json()
+            dados = self.aguardar(job['url_status'])
+        self.assertEqual(dados['status'], 'erro')
+        self.assertIn('interrompida', dados['erro'])
+        # A thread termina depois de o status já aparecer como erro
+        for _ in range(100):
+            if job['id'] not in tarefas._jobs_do_processo:
+                break
+            time.sleep(0.05)
+        job = ExportacaoJob.objects.get()
+        self.assertEqual((job.status, job.arquivo.name), ('erro', ''))
+        self.assertEqual(os.listdir(os.path.join(self.media.name, 'exportacoes')), [])
+
+    def test_pdf_sem_perfil(self):
+        response = self.client.post(reverse('criar_exportacao'), {'formato': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ExportacaoJob.objects.exists())
+
+
+class CacheExportacoesTest(TestCase):
+    """Cache em disco das exportações: acerto, invalidação pela versão dos dados e despejo"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        PerfilEmpresa.objects.create(usuario=self.usuario, razao_social='ELC Ltda')
+        Receita.objects.create(usuario=self.usuario, descricao='Venda', valor=Decimal('10.00'),
+                               data=datetime.date(2024, 3, 1))
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+        configuracoes = self.settings(EXPORTACAO_CACHE_DIR=self.diretorio)
+        configuracoes.enable()
+        self.addCleanup(configuracoes.disable)
+        self.geracoes = 0
+
+    def escrever(self, conteudo):
+        def escrever(destino):
+            self.geracoes += 1
+            destino.write(conteudo)
+        return escrever
+
+    def obter(self, filtros, conteudo=b'conteudo'):
+        with obter_ou_gerar(self.usuario.pk, 'csv', filtros, self.escrever(conteudo)) as arquivo:
+            return arquivo.read()
+
+    def test_acerto_e_invalidacao(self):
+        self.assertEqual(self.obter({'data_inicio': '2024-01-01'}, b'um'), b'um')
+        self.assertEqual(self.obter({'data_inicio': '2024-01-01'}, b'dois'), b'um')
+        self.assertEqual(self.geracoes, 1)
+        # Outros filtros e outra versão dos dados são outras entradas
+        self.assertEqual(self.obter({'data_inicio': '2024-02-01'}, b'tres'), b'tres')
+        Receita.objects.create(usuario=self.usuario, descricao='Outra', valor=Decimal('1.00'),
+                               data=datetime.date(2024, 3, 2))
+        self.assertEqual(self.obter({'data_inicio': '2024-01-01'}, b'quatro'), b'quatro')
+        self.assertEqual(self.geracoes, 3)
+
+    def test_despejo(self):
+        with self.settings(EXPORTACAO_CACHE_LIMITE=10):
+            antigo = caminho_exportacao(self.usuario.pk, 'csv', {'categoria': '1'})
+            self.obter({'categoria': '1'}, b'123456')
+            os.utime(antigo, (0, 0))
+            # O novo arquivo não cabe junto com o antigo: sai o menos usado
+            self.obter({'categoria': '2'}, b'123456')
+            self.assertFalse(os.path.exists(antigo))
+            # Maior que o limite sozinho: fica no cache, pois acabou de ser gravado
+            self.assertEqual(self.obter({'categoria': '3'}, b'x' * 20), b'x' * 20)
+            self.assertTrue(os.path.exists(caminho_exportacao(self.usuario.pk, 'csv', {'categoria': '3'})))
+
+    def test_arquivo_aberto_sobrevive_ao_despejo(self):
+        self.obter({}, b'conteudo')
+        arquivo = abrir_em_cache(caminho_exportacao(self.usuario.pk, 'csv', {}))
+        self.addCleanup(arquivo.close)
+        despejar(limite=0)
+        self.assertIsNone(abrir_em_cache(caminho_exportacao(self.usuario.pk, 'csv', {})))
+        self.assertEqual(arquivo.read(), b'conteudo')
+
+    def test_pdf_reaproveitado(self):
+        url = reverse('exportar_pdf')
+        primeiro = b''.join(self.client.get(url).streaming_content)
+        segundo = b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(primeiro, segundo)
+        # O rodapé traz a data dos dados, que faz parte da chave, e não a da geração
+        atualizado = timezone.localtime(VersaoLedger.objects.get(usuario=self.usuario).data_atualizacao)
+        self.assertIn(f"Dados atualizados em: {atualizado:%d/%m/%Y %H:%M} | ELC Contábil", textos_pdf(primeiro)[0])
+
+
+class ApiColunarTest(TestCase):
+    """/relatorios/colunar/: lançamentos em Parquet ou Arrow IPC, com tipos nativos"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        categoria = Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R')
+        Receita.objects.create(usuario=self.usuario, descricao='Venda', valor=Decimal('1234.56'),
+                               data=datetime.date(2024, 3, 10), categoria=categoria)
+        Despesa.objects.create(usuario=self.usuario, descricao='Luz', valor=Decimal('80.00'),
+                               data=datetime.date(2024, 3, 5))
+        Despesa.objects.create(usuario=self.usuario, descricao='Antiga', valor=Decimal('1.00'),
+                               data=datetime.date(2023, 1, 1))
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracoes = self.settings(EXPORTACAO_CACHE_DIR=diretorio.name)
+        configuracoes.enable()
+        self.addCleanup(configuracoes.disable)
+
+    def baixar(self, **parametros):
+        response = self.client.get('/api/v1/relatorios/colunar/', parametros)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        response, conteudo = self.baixar(formato='parquet', data_inicio='2024-01-01')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        tabela = pq.read_table(pa.BufferReader(conteudo))
+        self.assertEqual(tabela.schema.field('valor').type, pa.decimal128(10, 2))
+        self.assertEqual(tabela.schema.field('data').type, pa.date32())
+        linhas = tabela.to_pylist()
+        self.assertEqual([(l['tipo'], l['descricao'], l['valor'], l['categoria']) for l in linhas], [
+            ('R', 'Venda', Decimal('1234.56'), 'Vendas'),
+            ('D', 'Luz', Decimal('80.00'), None),
+        ])
+        self.assertEqual(linhas[0]['data'], datetime.date(2024, 3, 10))
+
+        # Mesmos filtros e dados: o mesmo arquivo, vindo do cache
+        self.assertEqual(self.baixar(formato='parquet', data_inicio='2024-01-01')[1], conteudo)
+
+    def test_arrow(self):
+        import pyarrow as pa
+
+        response, conteudo = self.baixar(formato='arrow', tipo_lancamento='D')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.file')
+        tabela = pa.ipc.open_file(pa.BufferReader(conteudo)).read_all()
+        self.assertEqual(tabela.column('descricao').to_pylist(), ['Luz', 'Antiga'])
+
+    def test_parametros_invalidos(self):
+        for parametros in ({'formato': 'xlsx'}, {'data_inicio': '2024-02-30'}):
+            with self.subTest(parametros=parametros):
+                response = self.client.get('/api/v1/relatorios/colunar/', parametros)
+                self.assertEqual(response.status_code, 400)
+
+    def test_sem_pyarrow(self):
+        # None em sys.modules faz o import levantar ImportError
+        with mock.patch.dict(sys.modules, {'pyarrow': None}):
+            response = self.client.get('/api/v1/relatorios/colunar/')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('pyarrow', response.json()['error'])
+
+
+class ApiAlteracoesTest(TestCase):
+    """/api/v1/changes/: alterações em ordem total, retomada pelo cursor e exclusões"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        configuracoes = self.settings(CHANGES_ATRASO_SEGUNDOS=0)
+        configuracoes.enable()
+        self.addCleanup(configuracoes.disable)
+        self.instante = timezone.now() - datetime.timedelta(hours=1)
+
+    def marcar(self, objeto, minutos):
+        """Fixa data_atualizacao (update() não passa pelo auto_now)"""
+        type(objeto).objects.filter(pk=objeto.pk).update(
+            data_atualizacao=self.instante + datetime.timedelta(minutes=minutos)
+        )
+        return objeto
+
+    def feed(self, **parametros):
+        # Sem alterações ainda não há cursor: a sincronização começa do início
+        response = self.client.get('/api/v1/changes/', {k: v for k, v in parametros.items() if v is not None})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def percorrer(self, **parametros):
+        """Todas as páginas a partir de `parametros`; retorna (itens, último cursor)"""
+        itens = []
+        while True:
+            dados = self.feed(**parametros)
+            itens += [(item['modelo'], item['operacao'], item['id']) for item in dados['results']]
+            parametros = {'cursor': dados['cursor'], 'page_size': parametros.get('page_size', 500)}
+            if dados['next'] is None:
+                return itens, dados['cursor']
+
+    def test_ordem(self):
+        categoria = self.marcar(Categoria.objects.create(usuario=self.usuario, nome='Vendas', tipo='R'), 3)
+        fornecedor = self.marcar(Fornecedor.objects.create(usuario=self.usuario, nome='Cliente'), 1)
+        receitas = [
+            self.marcar(Receita.objects.create(usuario=self.usuario, descricao=f'R{i}', valor=Decimal('1.00'),
+                                               data=datetime.date(2024, 3, 1)), 2)
+            for i in range(2)
+        ]
+        despesa = self.marcar(Despesa.objects.create(usuario=self.usuario, descricao='D', valor=Decimal('1.00'),
+                                                     data=datetime.date(2024, 3, 1)), 2)
+
+        # Por data; no empate, pela ordem das fontes (categoria, fornecedor,
+        # receita, despesa, exclusão) e depois pelo id
+        esperado = [
+            ('fornecedor', 'upsert', fornecedor.pk),
+            ('receita', 'upsert', receitas[0].pk),
+            ('receita', 'upsert', receitas[1].pk),
+            ('despesa', 'upsert', despesa.pk),
+            ('categoria', 'upsert', categoria.pk),
+        ]
+        dados = self.feed()
+        self.assertEqual([(i['modelo'], i['operacao'], i['id']) for i in dados['results']], esperado)
+        self.assertEqual(dados['results'][1]['dados']['descricao'], 'R0')
+        # Páginas de qualquer tamanho cortam os empates sem repetir nem pular
+        for tamanho in (1, 2, 3):
+            with self.subTest(page_size=tamanho):
+                self.assertEqual(self.percorrer(page_size=tamanho)[0], esperado)
+
+        since = (self.instante + datetime.timedelta(minutes=2)).isoformat()
+        self.assertEqual(self.percorrer(since=since)[0], esperado[1:])
+
+    def test_retomada_e_exclusoes(self):
+        receita = Receita.objects.create(usuario=self.usuario, descricao='Venda', valor=Decimal('1.00'),
+                                         data=datetime.date(2024, 3, 1))
+        itens, cursor = self.percorrer()
+        self.assertEqual(itens, [('receita', 'upsert', receita.pk)])
+
+        # Sem novidades: página vazia e o mesmo cursor
+        dados = self.feed(cursor=cursor)
+        self.assertEqual((dados['results'], dados['cursor'], dados['next']), ([], cursor, None))
+
+        receita.descricao = 'Venda editada'
+        receita.save()
+        dados = self.feed(cursor=cursor)
+        self.assertEqual([(i['operacao'], i['id'], i['dados']['descricao']) for i in dados['results']],
+                         [('upsert', receita.pk, 'Venda editada')])
+
+        # Excluído: só o registro de exclusão, sem dados
+        pk = receita.pk
+        receita.delete()
+        dados = self.feed(cursor=dados['cursor'])
+        self.assertEqual([(i['modelo'], i['operacao'], i['id'], i['dados']) for i in dados['results']],
+                         [('receita', 'delete', pk, None)])
+        self.assertEqual(self.percorrer()[0], [('receita', 'delete', pk)])
+        self.assertEqual(self.feed(cursor=dados['cursor'])['results'], [])
+
+    def test_lote_e_importacao(self):
+        _, cursor = self.percorrer()
+        response = self.client.post('/api/v1/despesas/lote/', [
+            {'descricao': f'Despesa {i}', 'valor': '2.00', 'data': '2024-03-01'} for i in range(3)
+        ], content_type='application/json')
+        ids = [resultado['id'] for resultado in response.json()['resultados']]
+        itens, cursor = self.percorrer(cursor=cursor, page_size=2)
+        self.assertEqual(itens, [('despesa', 'upsert', pk) for pk in ids])
+
+        # bulk_update grava data_atualizacao explicitamente
+        self.client.patch('/api/v1/despesas/lote/', [{'id': ids[0], 'valor': '3.00'}], content_type='application/json')
+        itens, cursor = self.percorrer(cursor=cursor)
+        self.assertEqual(itens, [('despesa', 'upsert', ids[0])])
+
+        self.client.delete('/api/v1/despesas/lote/', ids[1:], content_type='application/json')
+        itens, cursor = self.percorrer(cursor=cursor)
+        self.assertCountEqual(itens, [('despesa', 'delete', pk) for pk in ids[1:]])
+
+        perfil = PerfilEmpresa.objects.create(usuario=self.usuario)
+        conta = ContaBancaria.objects.create(perfil_empresa=perfil, nome_banco='Banco', codigo_banco='001',
+                                             agencia='1', conta_corrente='2')
+        self.client.post(reverse('importar_extrato'), {
+            'conta': conta.pk,
+            'arquivo': SimpleUploadedFile('extrato.csv', ImportacaoExtratoTest.CSV),
+        })
+        itens, _ = self.percorrer(cursor=cursor)
+        self.assertEqual(sorted(modelo for modelo, _, _ in itens), ['despesa', 'despesa', 'receita'])
+
+    def test_update_de_fornecedores(self):
+        fornecedores = [
+            self.marcar(Fornecedor.objects.create(usuario=self.usuario, nome=f'Fornecedor {i}'), i) for i in range(2)
+        ]
+        _, cursor = self.percorrer()
+        etag = self.client.get('/api/v1/fornecedores/')['ETag']
+
+        # Renomeação em massa, sem passar pelo save()
+        Fornecedor.objects.filter(usuario=self.usuario).update(nome=Concat(Value('Novo '), F('nome')))
+        itens, _ = self.percorrer(cursor=cursor)
+        self.assertCountEqual(itens, [('fornecedor', 'upsert', fornecedor.pk) for fornecedor in fornecedores])
+        response = self.client.get('/api/v1/fornecedores/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_atraso_e_parametros(self):
+        Receita.objects.create(usuario=self.usuario, descricao='Agora', valor=Decimal('1.00'),
+                               data=datetime.date(2024, 3, 1))
+        # Alterações recentes demais esperam: uma transação aberta ainda pode gravar antes delas
+        with self.settings(CHANGES_ATRASO_SEGUNDOS=60):
+            self.assertEqual(self.feed()['results'], [])
+        for parametros in ({'cursor': 'invalido'}, {'since': 'ontem'}, {'page_size': 'x'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get('/api/v1/changes/', parametros).status_code, 400)
+
+
+class CompressaoTest(TestCase):
+    """Brotli/gzip negociados pelo Accept-Encoding e estáticos pré-comprimidos"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        for dia in range(1, 29):
+            Receita.objects.create(
+                usuario=self.usuario, descricao=f'Venda {dia}', valor=Decimal('10.00'), data=datetime.date(2024, 3, dia)
+            )
+
+    def test_negociacao(self):
+        self.assertEqual(codificacao_aceita('gzip, deflate, br'), 'br')
+        self.assertEqual(codificacao_aceita('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(codificacao_aceita('br;q=0, *'), 'gzip')
+        self.assertIsNone(codificacao_aceita('identity'))
+        self.assertIsNone(codificacao_aceita(''))
+
+    def test_api_comprimida(self):
+        import brotli
+
+        original = self.client.get('/api/v1/receitas/')
+        self.assertFalse(original.has_header('Content-Encoding'))
+
+        for codificacao, descomprimir in (('br', brotli.decompress), ('gzip', gzip.decompress)):
+            with self.subTest(codificacao=codificacao):
+                response = self.client.get('/api/v1/receitas/', HTTP_ACCEPT_ENCODING=codificacao)
+                self.assertEqual(response['Content-Encoding'], codificacao)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(response['ETag'], 'W/' + original['ETag'])
+                self.assertLess(len(response.content), len(original.content))
+                self.assertEqual(json.loads(descomprimir(response.content)), original.json())
+
+        # O ETag fraco continua valendo para o GET condicional
+        response = self.client.get(
+            '/api/v1/receitas/', HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH='W/' + original['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_tamanho_aleatorio(self):
+        import brotli
+
+        # Contra BREACH o tamanho comprimido do HTML e do JSON varia a cada requisição
+        for url in (reverse('dashboard'), '/api/v1/receitas/'):
+            for codificacao in ('br', 'gzip'):
+                with self.subTest(url=url, codificacao=codificacao):
+                    tamanhos = set()
+                    for _ in range(10):
+                        response = self.client.get(url, HTTP_ACCEPT_ENCODING=codificacao)
+                        self.assertEqual(response['Content-Encoding'], codificacao)
+                        tamanhos.add(len(response.content))
+                    self.assertGreater(len(tamanhos), 1)
+
+        # No Brotli a variação vem de um comentário no fim do HTML e de
+        # espaços no fim do JSON
+        html = brotli.decompress(self.client.get(reverse('dashboard'), HTTP_ACCEPT_ENCODING='br').content)
+        self.assertRegex(html, PREENCHIMENTO_HTML)
+        self.assertTrue(sem_preenchimento(html).endswith(b'</html>'))
+        original = self.client.get('/api/v1/receitas/').content
+        corpo = brotli.decompress(self.client.get('/api/v1/receitas/', HTTP_ACCEPT_ENCODING='br').content)
+        self.assertEqual(sem_preenchimento(corpo), original)
+
+    def test_tipo_sem_preenchimento_so_com_gzip(self):
+        with self.settings(COMPRESSAO_TIPOS=('text/html', 'application/json', 'text/csv')):
+            middleware = CompressaoMiddleware(lambda request: HttpResponse('a;b\n' * 1000, content_type='text/csv'))
+            response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br, gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_resposta_pequena_nao_comprimida(self):
+        response = self.client.get('/api/v1/despesas/', HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_estaticos(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'app.js')
+            with open(caminho, 'w') as arquivo:
+                arquivo.write('console.log("ELC Contábil");\n' * 200)
+            pequeno = os.path.join(pasta, 'pequeno.js')
+            with open(pequeno, 'w') as arquivo:
+                arquivo.write('let a = 1;')
+
+            self.assertTrue(comprimir_arquivo(caminho))
+            self.assertFalse(comprimir_arquivo(pequeno))
+            with open(caminho, 'rb') as arquivo:
+                conteudo = arquivo.read()
+            with open(caminho + '.gz', 'rb') as arquivo:
+                self.assertEqual(gzip.decompress(arquivo.read()), conteudo)
+            self.assertTrue(os.path.exists(caminho + '.br'))
+            self.assertFalse(os.path.exists(pequeno + '.gz'))
+
+
+class JSONRapidoRendererTest(TestCase):
+    """?format=json-rapido: mesmo JSON dos serializers, Decimal como texto exato"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        for dia in (1, 2):
+            Receita.objects.create(
+                usuario=self.usuario, descricao=f'Venda ção {dia}', valor=Decimal('1234.50'),
+                data=datetime.date(2024, 3, dia),
+            )
+
+    def test_mesma_listagem(self):
+        normal = self.client.get('/api/v1/receitas/')
+        rapida = self.client.get('/api/v1/receitas/?format=json-rapido')
+        self.assertEqual(rapida['Content-Type'], 'application/json')
+        self.assertEqual(rapida.json()['results'], normal.json()['results'])
+
+    def test_decimal_como_texto(self):
+        dados = self.client.get('/api/v1/receitas/total/?format=json-rapido').json()
+        self.assertIsInstance(dados['total'], str)
+        self.assertEqual(Decimal(dados['total']), Decimal('2469.00'))
+        self.assertEqual(self.client.get('/api/v1/receitas/total/').json()['total'], 2469.0)
+
+    def test_orjson_e_json_iguais(self):
+        dados = {
+            'valor': Decimal('1E+2'), 'data': datetime.date(2024, 3, 1),
+            'momento': datetime.datetime(2024, 3, 1, 10, 30, 15, 123456),
+            'texto': 'ação\u2028', 1: [None, True, 2.5],
+        }
+        python = JSONRapidoRenderer()
+        python.usar_orjson = False
+        esperado = (
+            b'{"valor":"100","data":"2024-03-01","momento":"2024-03-01 10:30:15",'
+            b'"texto":"a\xc3\xa7\xc3\xa3o\\u2028","1":[null,true,2.5]}'
+        )
+        self.assertEqual(python.render(dados), esperado)
+        self.assertEqual(JSONRapidoRenderer().render(dados), esperado)
@@ -8,8 +8,12 @@ urlpatterns = [
     path('relatorios/exportar_csv/', views.exportar_csv, name='exportar_csv'),
     path('relatorios/exportar_pdf/', views.exportar_pdf, name='exportar_pdf'),
     path('relatorios/exportar_excel/', views.exportar_excel, name='exportar_excel'),
+    path('relatorios/exportacoes/', views.criar_exportacao, name='criar_exportacao'),
+    path('relatorios/exportacoes/<int:pk>/', views.status_exportacao, name='status_exportacao'),
+    path('relatorios/exportacoes/<int:pk>/download/', views.baixar_exportacao, name='baixar_exportacao'),
     path('despesa/adicionar/', views.adicionar_despesa, name='adicionar_despesa'),
     path('receita/adicionar/', views.adicionar_receita, name='adicionar_receita'),
+    path('lancamentos/importar/', views.importar_extrato, name='importar_extrato'),
     
     # Edição e exclusão de lançamentos
     path('receita/<int:pk>/editar/', views.editar_receita, name='editar_receita'),
@@ -0,0 +1,50 @@
+"""
+Versão dos dados de cada usuário (VersaoLedger)
+
+Um contador por usuário, incrementado pelos signals em APP/signals.py
+sempre que algo que aparece nos relatórios muda: lançamentos, categorias,
+fornecedores, perfil da empresa e contas bancárias. Quem guarda resultados
+derivados (o cache de exportações, por exemplo) usa a versão na chave: uma
+versão nova invalida tudo o que foi gerado antes, sem precisar apagar nada.
+
+O incremento roda na mesma transação da alteração, então é desfeito junto
+se ela for revertida.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import VersaoLedger
+
+
+def versao_ledger(usuario_id):
+    """
+    (versão, data da última alteração) dos dados do usuário. O registro é
+    criado na primeira leitura: os signals só fazem UPDATE, então um usuário
+    sem registro ainda não tem nada derivado que precise ser invalidado.
+    A data entra nas chaves junto com o número, para que um banco recriado
+    (versões recomeçando do zero) não reaproveite entradas antigas.
+    """
+    versao = VersaoLedger.objects.filter(usuario_id=usuario_id).values_list('versao', 'data_atualizacao').first()
+    if versao is not None:
+        return versao
+    try:
+        with transaction.atomic():
+            registro = VersaoLedger.objects.create(usuario_id=usuario_id)
+    except IntegrityError:
+        # Outra requisição criou o registro ao mesmo tempo
+        registro = VersaoLedger.objects.get(usuario_id=usuario_id)
+    return registro.versao, registro.data_atualizacao
+
+
+def incrementar_versao(usuario_id):
+    """Incrementa a versão do usuário (se ele já tiver uma)"""
+    if usuario_id is not None:
+        VersaoLedger.objects.filter(usuario_id=usuario_id).update(
+            versao=F('versao') + 1, data_atualizacao=timezone.now()
+        )
+
+
+def incrementar_todas():
+    """Incrementa a versão de todos os usuários (categorias padrão, compartilhadas)"""
+    VersaoLedger.objects.update(versao=F('versao') + 1, data_atualizacao=timezone.now())
@@ -1,6 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .forms import DespesaForm, ReceitaForm, CategoriaForm, PerfilEmpresaForm, ContaBancariaForm, FornecedorForm, DASN_SIMEIForm
-from .models import Despesa, Receita, Categoria, PerfilEmpresa, ContaBancaria, DeclaracaoAnual, Fornecedor, PreferenciaUsuario, DASN_SIMEI
+from .forms import DespesaForm, ReceitaForm, CategoriaForm, PerfilEmpresaForm, ContaBancariaForm, FornecedorForm, DASN_SIMEIForm, ImportacaoExtratoForm
+from .models import Despesa, Receita, Categoria, PerfilEmpresa, ContaBancaria, DeclaracaoAnual, Fornecedor, PreferenciaUsuario, DASN_SIMEI, ExportacaoJob
+from . import importacao, tarefas
+from .busca import filtrar_busca, filtrar_fornecedores
+from .cache_exportacoes import abrir_em_cache, caminho_exportacao, gravar_em_fluxo, obter_ou_gerar
+from .exportacao import escrever_excel, escrever_pdf, gerar_csv, linhas_lancamentos, querysets_exportacao
+from .lancamentos import LancamentosUnificados
+from .periodos import converter_data, deslocar_mes, filtro_periodo, filtro_periodo_formulario, intervalo_ano, intervalo_mes
 from django.contrib.auth.models import User
 from django.contrib import messages
 from itertools import chain
@@ -9,19 +15,30 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 import datetime
 from django.db.models import Sum, Q
+from django.db.models.functions import TruncMonth
 import json
 import calendar
+import os
 import requests
-from django.http import HttpResponse, JsonResponse
-import csv
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+def _totais_por_mes(modelo, usuario, inicio, fim):
+    """
+    Soma os lançamentos de `modelo` por mês no intervalo [inicio, fim) em uma
+    única consulta agrupada. Retorna {date(ano, mes, 1): total}.
+    """
+    linhas = modelo.objects.filter(
+        usuario=usuario, **filtro_periodo(inicio, fim)
+    ).annotate(
+        mes=TruncMonth('data')
+    ).values('mes').annotate(
+        total=Sum('valor')
+    ).order_by()
+    return {linha['mes']: linha['total'] or 0 for linha in linhas}
 
-# --- NOVAS IMPORTAÇÕES CORRIGIDAS ---
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4 # Corrigido para 'A4' maiúsculo
-from reportlab.lib.units import cm
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
 
 @login_required
 def dashboard(request):
@@ -29,14 +46,28 @@ def dashboard(request):
     ano_corrente = hoje.year
     ano_anterior = ano_corrente - 1
     
-    receitas_mes_atual = Receita.objects.filter(usuario=request.user, data__year=hoje.year, data__month=hoje.month)
-    despesas_mes_atual = Despesa.objects.filter(usuario=request.user, data__year=hoje.year, data__month=hoje.month)
-    total_receitas = receitas_mes_atual.aggregate(Sum('valor'))['valor__sum'] or 0
-    total_despesas = despesas_mes_atual.aggregate(Sum('valor'))['valor__sum'] or 0
+    inicio_mes_atual, inicio_proximo_mes = intervalo_mes(ano_corrente, hoje.month)
+    inicio_mes_anterior = deslocar_mes(hoje, -1)
+    
+    # Uma consulta agrupada por mês para cada modelo, cobrindo desde janeiro do
+    # ano anterior (>= 13 meses): todos os cards, alertas e gráficos de
+    # evolução são derivados destes dois dicionários em memória.
+    inicio_janela, _ = intervalo_ano(ano_anterior)
+    receitas_por_mes = _totais_por_mes(Receita, request.user, inicio_janela, inicio_proximo_mes)
+    despesas_por_mes = _totais_por_mes(Despesa, request.user, inicio_janela, inicio_proximo_mes)
+    
+    despesas_mes_atual = Despesa.objects.filter(
+        usuario=request.user, **filtro_periodo(inicio_mes_atual, inicio_proximo_mes)
+    )
+    total_receitas = receitas_por_mes.get(inicio_mes_atual, 0)
+    total_despesas = despesas_por_mes.get(inicio_mes_atual, 0)
     balanco = total_receitas - total_despesas
 
-    faturamento_anual = Receita.objects.filter(usuario=request.user, data__year=ano_corrente).aggregate(Sum('valor'))['valor__sum'] or 0
-    faturamento_ano_anterior = Receita.objects.filter(usuario=request.user, data__year=ano_anterior).aggregate(Sum('valor'))['valor__sum'] or 0
+    faturamento_anual = sum(total for mes, total in receitas_por_mes.items() if mes.year == ano_corrente)
+    faturamento_ano_anterior = sum(total for mes, total in receitas_por_mes.items() if mes.year == ano_anterior)
+
+    receitas_mes_anterior = receitas_por_mes.get(inicio_mes_anterior, 0)
+    despesas_mes_anterior = despesas_por_mes.get(inicio_mes_anterior, 0)
 
     alerta_ano_anterior = False
     if hoje.year > ano_anterior and faturamento_ano_anterior > 0:
@@ -75,15 +106,6 @@ def dashboard(request):
             })
         
         # Alerta 3: Comparação com mês anterior
-        mes_anterior = hoje.month - 1 if hoje.month > 1 else 12
-        ano_mes_anterior = hoje.year if hoje.month > 1 else hoje.year - 1
-        
-        despesas_mes_anterior = Despesa.objects.filter(
-            usuario=request.user, 
-            data__year=ano_mes_anterior, 
-            data__month=mes_anterior
-        ).aggregate(Sum('valor'))['valor__sum'] or 0
-        
         if despesas_mes_anterior > 0 and total_despesas > 0:
             variacao = ((total_despesas - despesas_mes_anterior) / despesas_mes_anterior) * 100
             if variacao > 20:  # Aumento de mais de 20%
@@ -126,17 +148,18 @@ def dashboard(request):
             })
     # === FIM SISTEMA DE ALERTAS ===
 
-    labels_grafico, dados_receitas, dados_despesas = [], [], []
-    for i in range(6):
-        mes, ano = (hoje.month - i, hoje.year)
-        if mes <= 0: mes += 12; ano -= 1
-        nome_mes_pt = calendar.month_name[mes][:3].capitalize()
-        labels_grafico.append(f'{nome_mes_pt}/{ano}')
-        receitas_do_mes = Receita.objects.filter(usuario=request.user, data__year=ano, data__month=mes).aggregate(Sum('valor'))['valor__sum'] or 0
-        dados_receitas.append(float(receitas_do_mes))
-        despesas_do_mes = Despesa.objects.filter(usuario=request.user, data__year=ano, data__month=mes).aggregate(Sum('valor'))['valor__sum'] or 0
-        dados_despesas.append(float(despesas_do_mes))
-    labels_grafico.reverse(); dados_receitas.reverse(); dados_despesas.reverse()
+    # Evolução dos últimos 6 meses (receitas, despesas e balanço)
+    labels_grafico, dados_receitas, dados_despesas, dados_balanco = [], [], [], []
+    for i in range(-5, 1):
+        inicio_mes = deslocar_mes(hoje, i)
+        nome_mes_pt = calendar.month_name[inicio_mes.month][:3].capitalize()
+        labels_grafico.append(f'{nome_mes_pt}/{inicio_mes.year}')
+        rec_mes = receitas_por_mes.get(inicio_mes, 0)
+        desp_mes = despesas_por_mes.get(inicio_mes, 0)
+        dados_receitas.append(float(rec_mes))
+        dados_despesas.append(float(desp_mes))
+        dados_balanco.append(float(rec_mes - desp_mes))
+    labels_balanco = list(labels_grafico)
 
     # --- INÍCIO: NOVOS CÁLCULOS PARA GRÁFICOS PIZZA ---
 
@@ -152,7 +175,10 @@ def dashboard(request):
         dados_pie_mes.append(float(item['total']))
 
     # 2. Gráfico Pizza Anual
-    despesas_ano_categoria = Despesa.objects.filter(usuario=request.user, data__year=hoje.year) \
+    despesas_ano_categoria = Despesa.objects.filter(
+        usuario=request.user,
+        **filtro_periodo(*intervalo_ano(ano_corrente))
+    ) \
         .values('categoria__nome') \
         .annotate(total=Sum('valor')) \
         .order_by('-total')
@@ -173,50 +199,9 @@ def dashboard(request):
     valores_top5 = [float(d.valor) for d in top5_despesas]
     
     # 4. Comparação Mês Atual vs Anterior
-    mes_anterior = hoje.month - 1 if hoje.month > 1 else 12
-    ano_mes_anterior = hoje.year if hoje.month > 1 else hoje.year - 1
-    
-    receitas_mes_anterior = Receita.objects.filter(
-        usuario=request.user, 
-        data__year=ano_mes_anterior, 
-        data__month=mes_anterior
-    ).aggregate(Sum('valor'))['valor__sum'] or 0
-    
-    despesas_mes_anterior = Despesa.objects.filter(
-        usuario=request.user, 
-        data__year=ano_mes_anterior, 
-        data__month=mes_anterior
-    ).aggregate(Sum('valor'))['valor__sum'] or 0
-    
     balanco_mes_anterior = receitas_mes_anterior - despesas_mes_anterior
     
-    # 5. Evolução do Balanço (6 meses)
-    labels_balanco = []
-    dados_balanco = []
-    for i in range(6):
-        mes, ano = (hoje.month - i, hoje.year)
-        if mes <= 0: 
-            mes += 12
-            ano -= 1
-        nome_mes_pt = calendar.month_name[mes][:3].capitalize()
-        labels_balanco.append(f'{nome_mes_pt}/{ano}')
-        
-        rec_mes = Receita.objects.filter(
-            usuario=request.user, 
-            data__year=ano, 
-            data__month=mes
-        ).aggregate(Sum('valor'))['valor__sum'] or 0
-        
-        desp_mes = Despesa.objects.filter(
-            usuario=request.user, 
-            data__year=ano, 
-            data__month=mes
-        ).aggregate(Sum('valor'))['valor__sum'] or 0
-        
-        dados_balanco.append(float(rec_mes - desp_mes))
-    
-    labels_balanco.reverse()
-    dados_balanco.reverse()
+    # 5. Evolução do Balanço (6 meses): calculada junto com o gráfico de barras
     
     # === FIM NOVOS GRÁFICOS ===
 
@@ -340,8 +325,9 @@ def listar_lancamentos(request):
     
     # Aplicar filtros
     if busca:
-        receitas = receitas.filter(Q(descricao__icontains=busca) | Q(observacoes__icontains=busca))
-        despesas = despesas.filter(Q(descricao__icontains=busca) | Q(observacoes__icontains=busca))
+        # Índice de busca textual (FTS5/tsvector), sem acentos
+        receitas = filtrar_busca(receitas, busca)
+        despesas = filtrar_busca(despesas, busca)
     
     if categoria_id:
         receitas = receitas.filter(categoria_id=categoria_id)
@@ -351,13 +337,10 @@ def listar_lancamentos(request):
         receitas = receitas.filter(fornecedor_id=fornecedor_id)
         despesas = despesas.filter(fornecedor_id=fornecedor_id)
     
-    if data_inicio:
-        receitas = receitas.filter(data__gte=data_inicio)
-        despesas = despesas.filter(data__gte=data_inicio)
-    
-    if data_fim:
-        receitas = receitas.filter(data__lte=data_fim)
-        despesas = despesas.filter(data__lte=data_fim)
+    periodo = filtro_periodo_formulario(data_inicio, data_fim)
+    if periodo:
+        receitas = receitas.filter(**periodo)
+        despesas = despesas.filter(**periodo)
     
     if valor_min:
         receitas = receitas.filter(valor__gte=valor_min)
@@ -367,28 +350,40 @@ def listar_lancamentos(request):
         receitas = receitas.filter(valor__lte=valor_max)
         despesas = despesas.filter(valor__lte=valor_max)
     
-    # Filtrar por tipo
+    # Filtrar por tipo (o UNION, a ordenação e a paginação rodam no banco)
     if tipo == 'R':
-        todos_lancamentos = list(receitas)
+        todos_lancamentos = LancamentosUnificados({'R': receitas})
     elif tipo == 'D':
-        todos_lancamentos = list(despesas)
+        todos_lancamentos = LancamentosUnificados({'D': despesas})
     else:
-        todos_lancamentos = sorted(
-            chain(receitas, despesas),
-            key=attrgetter('data'),
-            reverse=True
-        )
-    
-    # Paginação
-    paginator = Paginator(todos_lancamentos, itens_por_pagina)
-    page = request.GET.get('page', 1)
+        todos_lancamentos = LancamentosUnificados({'R': receitas, 'D': despesas})
     
-    try:
-        lancamentos_paginados = paginator.page(page)
-    except PageNotAnInteger:
-        lancamentos_paginados = paginator.page(1)
-    except EmptyPage:
-        lancamentos_paginados = paginator.page(paginator.num_pages)
+    # Paginação por cursor (opcional, ?cursor=): sem OFFSET nem COUNT, custo
+    # constante mesmo em páginas profundas
+    modo_cursor = 'cursor' in request.GET
+    proximo_cursor = None
+    if modo_cursor:
+        try:
+            lancamentos_paginados, proximo_cursor = todos_lancamentos.pagina_apos(
+                request.GET['cursor'], itens_por_pagina
+            )
+        except ValueError:
+            # Cursor inválido: volta para o início
+            lancamentos_paginados, proximo_cursor = todos_lancamentos.pagina_apos(None, itens_por_pagina)
+        # Sem COUNT: o total não é conhecido, só os itens desta página
+        total_lancamentos = None
+    else:
+        # Paginação
+        paginator = Paginator(todos_lancamentos, itens_por_pagina)
+        page = request.GET.get('page', 1)
+        
+        try:
+            lancamentos_paginados = paginator.page(page)
+        except PageNotAnInteger:
+            lancamentos_paginados = paginator.page(1)
+        except EmptyPage:
+            lancamentos_paginados = paginator.page(paginator.num_pages)
+        total_lancamentos = paginator.count
     
     # Dados para filtros
     categorias = Categoria.objects.filter(
@@ -415,7 +410,9 @@ def listar_lancamentos(request):
             'valor_max': valor_max,
             'per_page': itens_por_pagina,
         },
-        'total_lancamentos': len(todos_lancamentos),
+        'total_lancamentos': total_lancamentos,
+        'modo_cursor': modo_cursor,
+        'proximo_cursor': proximo_cursor,
     }
     return render(request, 'APP/lancamento_list.html', context)
 
@@ -469,6 +466,39 @@ def adicionar_receita(request):
         form = ReceitaForm(user=request.user)
     return render(request, 'APP/receita_form.html', {'form': form})
 
+@login_required
+def importar_extrato(request):
+    """Importa um extrato OFX/CSV como receitas e despesas (APP/importacao.py)"""
+    resultado = None
+    if request.method == 'POST':
+        form = ImportacaoExtratoForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            try:
+                resultado = importacao.importar_extrato(
+                    form.cleaned_data['arquivo'],
+                    request.user,
+                    form.cleaned_data['conta'],
+                    form.cleaned_data['formato'] or None,
+                )
+            except importacao.ErroImportacao as erro:
+                form.add_error('arquivo', str(erro))
+            else:
+                messages.success(
+                    request,
+                    f'Extrato importado: {resultado.receitas} receitas e {resultado.despesas} despesas criadas.'
+                )
+    else:
+        form = ImportacaoExtratoForm(user=request.user)
+    return render(request, 'APP/importar_extrato.html', {'form': form, 'resultado': resultado})
+
+def data_formatada(valor, padrao):
+    """'AAAA-MM-DD' como DD/MM/AAAA; vazio ou inválido (filtro ignorado) vira `padrao`"""
+    try:
+        data = converter_data(valor)
+    except ValueError:
+        data = None
+    return data.strftime('%d/%m/%Y') if data else padrao
+
 @login_required
 def relatorios(request):
     data_inicio_str = request.GET.get('data_inicio')
@@ -484,17 +514,11 @@ def relatorios(request):
     balanco_periodo = 0
 
     if filtros_aplicados:
-        data_inicio = datetime.datetime.strptime(data_inicio_str, '%Y-%m-%d').date() if data_inicio_str else None
-        data_fim = datetime.datetime.strptime(data_fim_str, '%Y-%m-%d').date() if data_fim_str else None
-
         receitas = Receita.objects.filter(usuario=request.user)
         despesas = Despesa.objects.filter(usuario=request.user)
-        if data_inicio:
-            receitas = receitas.filter(data__gte=data_inicio)
-            despesas = despesas.filter(data__gte=data_inicio)
-        if data_fim:
-            receitas = receitas.filter(data__lte=data_fim)
-            despesas = despesas.filter(data__lte=data_fim)
+        periodo = filtro_periodo_formulario(data_inicio_str, data_fim_str)
+        receitas = receitas.filter(**periodo)
+        despesas = despesas.filter(**periodo)
         if categoria_id:
             receitas = receitas.filter(categoria_id=categoria_id)
             despesas = despesas.filter(categoria_id=categoria_id)
@@ -531,194 +555,92 @@ def relatorios(request):
         'tipo_lancamento_value': tipo_lancamento,
         'categoria_id_value': categoria_id,
         # Variáveis de data formatada para o cabeçalho
-        'data_inicio_fmt': datetime.datetime.strptime(data_inicio_str, '%Y-%m-%d').strftime('%d/%m/%Y') if data_inicio_str else "Início",
-        'data_fim_fmt': datetime.datetime.strptime(data_fim_str, '%Y-%m-%d').strftime('%d/%m/%Y') if data_fim_str else "Fim",
+        'data_inicio_fmt': data_formatada(data_inicio_str, "Início"),
+        'data_fim_fmt': data_formatada(data_fim_str, "Fim"),
     }
     return render(request, 'APP/relatorios.html', context)
 
 @login_required
 def exportar_excel(request):
     """Exporta lançamentos para Excel formatado"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from datetime import datetime
-    
-    # Obter filtros
-    data_inicio = request.GET.get('data_inicio')
-    data_fim = request.GET.get('data_fim')
-    tipo_lancamento = request.GET.get('tipo_lancamento')
-    categoria_id = request.GET.get('categoria')
-    
-    # Query base
-    receitas_query = Receita.objects.filter(usuario=request.user)
-    despesas_query = Despesa.objects.filter(usuario=request.user)
-    
-    # Aplicar filtros
-    if data_inicio:
-        receitas_query = receitas_query.filter(data__gte=data_inicio)
-        despesas_query = despesas_query.filter(data__gte=data_inicio)
-    if data_fim:
-        receitas_query = receitas_query.filter(data__lte=data_fim)
-        despesas_query = despesas_query.filter(data__lte=data_fim)
-    if categoria_id:
-        receitas_query = receitas_query.filter(categoria_id=categoria_id)
-        despesas_query = despesas_query.filter(categoria_id=categoria_id)
-    
-    # Criar workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Lançamentos"
-    
-    # Estilos
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    # A planilha é gerada em modo write_only direto no cache de exportações
+    # (ver APP/cache_exportacoes.py): um novo download com os mesmos filtros,
+    # sem alterações nos dados, reaproveita o arquivo
+    querysets = querysets_exportacao(request.user, request.GET)
+    arquivo = obter_ou_gerar(request.user.pk, 'excel', request.GET, lambda destino: escrever_excel(querysets, destino))
+
+    filename = f'lancamentos_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    
-    # Cabeçalho
-    headers = ['Data', 'Tipo', 'Descrição', 'Categoria', 'Fornecedor', 'CPF/CNPJ', 'Valor']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = border
-    
-    # Dados
-    row = 2
-    total_receitas = 0
-    total_despesas = 0
-    
-    # Adicionar receitas
-    if tipo_lancamento != 'D':
-        for receita in receitas_query.select_related('categoria', 'fornecedor').order_by('data'):
-            ws.cell(row=row, column=1, value=receita.data.strftime('%d/%m/%Y'))
-            ws.cell(row=row, column=2, value='Receita')
-            ws.cell(row=row, column=3, value=receita.descricao)
-            ws.cell(row=row, column=4, value=receita.categoria.nome if receita.categoria else '-')
-            ws.cell(row=row, column=5, value=receita.fornecedor.nome if receita.fornecedor else '-')
-            ws.cell(row=row, column=6, value=receita.fornecedor.cpf_cnpj if receita.fornecedor else '-')
-            ws.cell(row=row, column=7, value=float(receita.valor))
-            
-            total_receitas += float(receita.valor)
-            
-            # Estilo receita (verde)
-            for col in range(1, 8):
-                cell = ws.cell(row=row, column=col)
-                cell.border = border
-                if col == 7:
-                    cell.number_format = 'R$ #,##0.00'
-                    cell.font = Font(color="198754", bold=True)
-            row += 1
-    
-    # Adicionar despesas
-    if tipo_lancamento != 'R':
-        for despesa in despesas_query.select_related('categoria', 'fornecedor').order_by('data'):
-            ws.cell(row=row, column=1, value=despesa.data.strftime('%d/%m/%Y'))
-            ws.cell(row=row, column=2, value='Despesa')
-            ws.cell(row=row, column=3, value=despesa.descricao)
-            ws.cell(row=row, column=4, value=despesa.categoria.nome if despesa.categoria else '-')
-            ws.cell(row=row, column=5, value=despesa.fornecedor.nome if despesa.fornecedor else '-')
-            ws.cell(row=row, column=6, value=despesa.fornecedor.cpf_cnpj if despesa.fornecedor else '-')
-            ws.cell(row=row, column=7, value=-float(despesa.valor))
-            
-            total_despesas += float(despesa.valor)
-            
-            # Estilo despesa (vermelho)
-            for col in range(1, 8):
-                cell = ws.cell(row=row, column=col)
-                cell.border = border
-                if col == 7:
-                    cell.number_format = 'R$ #,##0.00'
-                    cell.font = Font(color="DC3545", bold=True)
-            row += 1
-    
-    # Resumo financeiro
-    row += 1
-    ws.cell(row=row, column=6, value='Total Receitas:').font = Font(bold=True, color="198754")
-    ws.cell(row=row, column=7, value=total_receitas).number_format = 'R$ #,##0.00'
-    ws.cell(row=row, column=7).font = Font(bold=True, color="198754")
-    
-    row += 1
-    ws.cell(row=row, column=6, value='Total Despesas:').font = Font(bold=True, color="DC3545")
-    ws.cell(row=row, column=7, value=-total_despesas).number_format = 'R$ #,##0.00'
-    ws.cell(row=row, column=7).font = Font(bold=True, color="DC3545")
-    
-    row += 1
-    balanco = total_receitas - total_despesas
-    ws.cell(row=row, column=6, value='BALANÇO:').font = Font(bold=True, size=12)
-    ws.cell(row=row, column=7, value=balanco).number_format = 'R$ #,##0.00'
-    ws.cell(row=row, column=7).font = Font(bold=True, size=12, color="198754" if balanco >= 0 else "DC3545")
-    
-    # Ajustar larguras
-    ws.column_dimensions['A'].width = 12
-    ws.column_dimensions['B'].width = 10
-    ws.column_dimensions['C'].width = 40
-    ws.column_dimensions['D'].width = 25
-    ws.column_dimensions['E'].width = 35
-    ws.column_dimensions['F'].width = 20
-    ws.column_dimensions['G'].width = 15
-    
-    # Resposta HTTP
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    filename = f'lancamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    
-    wb.save(response)
-    return response
 
 @login_required
 def exportar_csv(request):
-    response = HttpResponse(content_type='text/csv')
+    # Streaming: o banco ordena e faz os JOINs, e as linhas são enviadas
+    # conforme são lidas, sem montar a lista inteira em memória. O que é
+    # enviado também vai para o cache, usado nos downloads seguintes
+    caminho = caminho_exportacao(request.user.pk, 'csv', request.GET)
+    arquivo = abrir_em_cache(caminho)
+    if arquivo is not None:
+        response = FileResponse(arquivo, content_type='text/csv')
+    else:
+        querysets = querysets_exportacao(request.user, request.GET)
+        blocos = gerar_csv(linhas_lancamentos(querysets))
+        response = StreamingHttpResponse(gravar_em_fluxo(caminho, blocos), content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="relatorio_contabil_{datetime.date.today()}.csv"'
-    
-    data_inicio = request.GET.get('data_inicio')
-    data_fim = request.GET.get('data_fim')
-    tipo_lancamento = request.GET.get('tipo_lancamento')
-    categoria_id = request.GET.get('categoria')
+    return response
 
-    receitas = Receita.objects.filter(usuario=request.user)
-    despesas = Despesa.objects.filter(usuario=request.user)
+# ==================== EXPORTAÇÕES EM SEGUNDO PLANO ====================
+
+def _dados_exportacao(job):
+    dados = {
+        'id': job.pk,
+        'formato': job.formato,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'processados': job.processados,
+        'total': job.total,
+        'percentual': job.percentual,
+    }
+    if job.status == 'concluido':
+        dados['url_download'] = reverse('baixar_exportacao', args=[job.pk])
+    if job.status == 'erro':
+        dados['erro'] = job.erro or 'Falha ao gerar a exportação'
+    return dados
 
-    if data_inicio:
-        receitas = receitas.filter(data__gte=data_inicio)
-        despesas = despesas.filter(data__gte=data_inicio)
-    if data_fim:
-        receitas = receitas.filter(data__lte=data_fim)
-        despesas = despesas.filter(data__lte=data_fim)
-    if categoria_id:
-        receitas = receitas.filter(categoria_id=categoria_id)
-        despesas = despesas.filter(categoria_id=categoria_id)
+@login_required
+@require_POST
+def criar_exportacao(request):
+    """Agenda a exportação com os filtros da tela de relatórios e devolve o id do job"""
+    formato = request.POST.get('formato')
+    if formato not in dict(ExportacaoJob.FORMATO_CHOICES):
+        return JsonResponse({'error': 'Formato de exportação inválido'}, status=400)
+    if formato == 'pdf' and not PerfilEmpresa.objects.filter(usuario=request.user).exists():
+        return JsonResponse({'error': 'Cadastre o perfil da empresa para exportar em PDF'}, status=400)
+    job = tarefas.criar_exportacao(request.user, formato, request.POST)
+    dados = _dados_exportacao(job)
+    dados['url_status'] = reverse('status_exportacao', args=[job.pk])
+    return JsonResponse(dados, status=202)
 
-    if tipo_lancamento == 'R':
-        lancamentos_filtrados = list(receitas)
-    elif tipo_lancamento == 'D':
-        lancamentos_filtrados = list(despesas)
-    else:
-        lancamentos_filtrados = list(chain(receitas, despesas))
-
-    lancamentos_filtrados.sort(key=attrgetter('data'), reverse=True)
-
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow(['Data', 'Descricao', 'Tipo', 'Categoria', 'Fornecedor', 'CNPJ/CPF', 'Valor'])
-
-    for lancamento in lancamentos_filtrados:
-        tipo = 'Receita' if isinstance(lancamento, Receita) else 'Despesa'
-        valor_formatado = str(lancamento.valor).replace('.', ',')
-        writer.writerow([
-            lancamento.data.strftime('%d/%m/%Y'),
-            lancamento.descricao,
-            tipo,
-            lancamento.categoria.nome if lancamento.categoria else 'Sem Categoria',
-            lancamento.fornecedor.nome if lancamento.fornecedor else '-',
-            lancamento.fornecedor.cpf_cnpj if lancamento.fornecedor else '-',
-            valor_formatado
-        ])
-    return response
+@login_required
+def status_exportacao(request, pk):
+    job = get_object_or_404(ExportacaoJob, pk=pk, usuario=request.user)
+    if tarefas.job_abandonado(job):
+        tarefas.marcar_interrompido(job)
+    return JsonResponse(_dados_exportacao(job))
+
+@login_required
+def baixar_exportacao(request, pk):
+    job = get_object_or_404(ExportacaoJob, pk=pk, usuario=request.user, status='concluido')
+    return FileResponse(
+        job.arquivo.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.arquivo.name),
+        content_type=tarefas.CONTENT_TYPES[job.formato],
+    )
 
 @login_required
 def listar_categorias(request):
@@ -866,206 +788,17 @@ def excluir_conta(request, pk):
 @login_required
 def exportar_pdf(request):
     """Gera relatório PDF em paisagem com paginação correta"""
-    from reportlab.lib.pagesizes import landscape, A4
-    from reportlab.lib.units import cm
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    
-    # Coleta de dados
-    data_inicio_str = request.GET.get('data_inicio')
-    data_fim_str = request.GET.get('data_fim')
-    tipo_lancamento = request.GET.get('tipo_lancamento')
-    categoria_id = request.GET.get('categoria')
-
-    data_inicio = datetime.datetime.strptime(data_inicio_str, '%Y-%m-%d').date() if data_inicio_str else None
-    data_fim = datetime.datetime.strptime(data_fim_str, '%Y-%m-%d').date() if data_fim_str else None
-
-    receitas = Receita.objects.filter(usuario=request.user)
-    despesas = Despesa.objects.filter(usuario=request.user)
-
-    if data_inicio:
-        receitas = receitas.filter(data__gte=data_inicio)
-        despesas = despesas.filter(data__gte=data_inicio)
-    if data_fim:
-        receitas = receitas.filter(data__lte=data_fim)
-        despesas = despesas.filter(data__lte=data_fim)
-    if categoria_id:
-        receitas = receitas.filter(categoria_id=categoria_id)
-        despesas = despesas.filter(categoria_id=categoria_id)
-
-    if tipo_lancamento == 'R':
-        lista_final = list(receitas)
-    elif tipo_lancamento == 'D':
-        lista_final = list(despesas)
-    else:
-        lista_final = list(chain(receitas, despesas))
-    
-    lista_final.sort(key=attrgetter('data'), reverse=True)
-    
+    # O PDF é gerado por escrever_pdf (APP/exportacao.py) e gravado no
+    # cache de exportações
     perfil = request.user.perfilempresa
-    contas = perfil.contas.all().order_by('-preferencial', 'nome_banco')
-    
-    total_receitas = sum(l.valor for l in lista_final if isinstance(l, Receita))
-    total_despesas = sum(l.valor for l in lista_final if isinstance(l, Despesa))
-    balanco = total_receitas - total_despesas
+    querysets = querysets_exportacao(request.user, request.GET)
+    arquivo = obter_ou_gerar(
+        request.user.pk, 'pdf', request.GET,
+        lambda destino: escrever_pdf(querysets, destino, perfil, request.GET),
+    )
 
-    # Configuração PDF
-    response = HttpResponse(content_type='application/pdf')
     filename = f"relatorio_{perfil.razao_social or 'empresa'}_{datetime.date.today()}.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    pagesize = landscape(A4)
-    p = canvas.Canvas(response, pagesize=pagesize)
-    width, height = pagesize
-    
-    cor_verde = colors.Color(0, 0.6, 0)
-    cor_vermelha = colors.Color(0.8, 0, 0)
-    cor_cinza = colors.Color(0.3, 0.3, 0.3)
-    
-    MARGEM = 1.5 * cm
-    
-    def cabecalho(y, pag):
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(MARGEM, y, "RELATÓRIO FINANCEIRO")
-        p.drawRightString(width - MARGEM, y, f"Pág. {pag}")
-        y -= 0.4 * cm
-        
-        p.setFont("Helvetica", 7)
-        info = f"{perfil.razao_social or 'Empresa'}"
-        if perfil.cnpj:
-            info += f" - CNPJ: {perfil.cnpj}"
-        p.drawString(MARGEM, y, info)
-        
-        if data_inicio and data_fim:
-            periodo = f"{data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-        elif data_inicio:
-            periodo = f"Desde {data_inicio.strftime('%d/%m/%Y')}"
-        elif data_fim:
-            periodo = f"Até {data_fim.strftime('%d/%m/%Y')}"
-        else:
-            periodo = "Todos os registros"
-        p.drawRightString(width - MARGEM, y, periodo)
-        y -= 0.3 * cm
-        
-        p.setStrokeColor(colors.grey)
-        p.line(MARGEM, y, width - MARGEM, y)
-        return y - 0.3 * cm
-    
-    def rodape():
-        p.setFont("Helvetica", 6)
-        p.drawCentredString(width / 2, 0.7 * cm, 
-            f"Emitido: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')} | ELC Contábil")
-    
-    # Primeira página
-    pagina = 1
-    y = height - 1 * cm
-    y = cabecalho(y, pagina)
-    
-    # Resumo
-    p.setFont("Helvetica", 7)
-    p.setFillColor(cor_verde)
-    p.drawString(MARGEM, y, f"Receitas: R$ {total_receitas:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    p.setFillColor(cor_vermelha)
-    p.drawString(MARGEM + 5*cm, y, f"Despesas: R$ {total_despesas:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    p.setFillColor(cor_verde if balanco >= 0 else cor_vermelha)
-    p.drawString(MARGEM + 10*cm, y, f"Balanço: R$ {balanco:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    p.setFillColor(colors.black)
-    y -= 0.6 * cm
-    
-    # Contas (máx 2)
-    if contas.exists():
-        p.setFont("Helvetica", 6)
-        for conta in contas[:2]:
-            p.drawString(MARGEM, y, f"• {conta.nome_banco} Ag:{conta.agencia} CC:{conta.conta_corrente}")
-            y -= 0.25 * cm
-        y -= 0.2 * cm
-    
-    p.setFont("Helvetica-Bold", 7)
-    p.drawString(MARGEM, y, f"Lançamentos: {len(lista_final)}")
-    y -= 0.35 * cm
-    
-    # Preparar tabela
-    dados = [['Data', 'Categoria', 'Fornecedor', 'CNPJ/CPF', 'Valor']]
-    for lanc in lista_final:
-        valor_fmt = f"{lanc.valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        prefixo = "+ " if isinstance(lanc, Receita) else "- "
-        
-        cat = (lanc.categoria.nome[:23]+'..') if lanc.categoria and len(lanc.categoria.nome)>23 else (lanc.categoria.nome if lanc.categoria else '-')
-        forn = (lanc.fornecedor.nome[:33]+'..') if lanc.fornecedor and len(lanc.fornecedor.nome)>33 else (lanc.fornecedor.nome if lanc.fornecedor else '-')
-        
-        dados.append([
-            lanc.data.strftime('%d/%m/%Y'),
-            cat,
-            forn,
-            lanc.fornecedor.cpf_cnpj if lanc.fornecedor else '-',
-            prefixo + 'R$ ' + valor_fmt
-        ])
-    
-    larguras = [2.2*cm, 4.5*cm, 6.5*cm, 3.8*cm, 3*cm]
-    tabela = Table(dados, colWidths=larguras, repeatRows=1)
-    
-    estilo = TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), cor_cinza),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 7),
-        ('BOTTOMPADDING', (0,0), (-1,0), 5),
-        ('TOPPADDING', (0,0), (-1,0), 5),
-        ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-        ('FONTSIZE', (0,1), (-1,-1), 6),
-        ('TOPPADDING', (0,1), (-1,-1), 3),
-        ('BOTTOMPADDING', (0,1), (-1,-1), 3),
-        ('ALIGN', (0,0), (0,-1), 'CENTER'),
-        ('ALIGN', (1,1), (1,-1), 'LEFT'),
-        ('ALIGN', (2,1), (2,-1), 'LEFT'),
-        ('ALIGN', (3,1), (3,-1), 'CENTER'),
-        ('ALIGN', (4,0), (4,-1), 'RIGHT'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.Color(0.95,0.95,0.95)])
-    ])
-    tabela.setStyle(estilo)
-    
-    for i, lanc in enumerate(lista_final, 1):
-        cor = cor_verde if isinstance(lanc, Receita) else cor_vermelha
-        tabela.setStyle(TableStyle([('TEXTCOLOR', (4, i), (4, i), cor)]))
-    
-    # Desenhar com paginação
-    tabela.wrapOn(p, width - 2*MARGEM, height)
-    altura_total = tabela._height
-    
-    linhas_por_pag = 24
-    linha_atual = 1
-    total_linhas = len(dados) - 1
-    
-    while linha_atual <= total_linhas:
-        linhas_nesta = min(linhas_por_pag, total_linhas - linha_atual + 1)
-        dados_pag = [dados[0]] + dados[linha_atual:linha_atual + linhas_nesta]
-        
-        tab_pag = Table(dados_pag, colWidths=larguras)
-        tab_pag.setStyle(estilo)
-        
-        for idx in range(1, len(dados_pag)):
-            if linha_atual + idx - 1 <= total_linhas:
-                lanc = lista_final[linha_atual + idx - 2]
-                cor = cor_verde if isinstance(lanc, Receita) else cor_vermelha
-                tab_pag.setStyle(TableStyle([('TEXTCOLOR', (4, idx), (4, idx), cor)]))
-        
-        tab_pag.wrapOn(p, width - 2*MARGEM, height)
-        tab_pag.drawOn(p, MARGEM, y - tab_pag._height)
-        
-        rodape()
-        
-        linha_atual += linhas_nesta
-        if linha_atual <= total_linhas:
-            p.showPage()
-            pagina += 1
-            y = height - 1 * cm
-            y = cabecalho(y, pagina)
-            y -= 0.3 * cm
-            linhas_por_pag = 24
-    
-    p.save()
-    return response
+    return FileResponse(arquivo, as_attachment=True, filename=filename, content_type='application/pdf')
 
 # ==================== VIEWS DE FORNECEDORES ====================
 
@@ -1092,11 +825,8 @@ def lista_fornecedores(request):
         fornecedores = fornecedores.filter(ativo=False)
     
     if busca:
-        fornecedores = fornecedores.filter(
-            Q(nome__icontains=busca) |
-            Q(nome_fantasia__icontains=busca) |
-            Q(cpf_cnpj__icontains=busca)
-        )
+        # Colunas normalizadas: sem acentos e documento só com dígitos
+        fornecedores = filtrar_fornecedores(fornecedores, busca)
     
     # Paginação
     paginator = Paginator(fornecedores, itens_por_pagina)
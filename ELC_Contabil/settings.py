@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'APP.compressao.CompressaoMiddleware',  # Brotli/gzip - antes dos que leem ou alteram o corpo
     'corsheaders.middleware.CorsMiddleware',  # CORS - deve vir antes de CommonMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -131,6 +132,17 @@ STATIC_URL = 'static/'
 # ALTERADO PARA DESENVOLVIMENTO LOCAL
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# O collectstatic grava versões .gz (zopfli) e .br ao lado dos estáticos de
+# texto, para o servidor web entregá-las já comprimidas (APP/compressao.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'APP.compressao.ArmazenamentoEstaticoComprimido',
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -144,6 +156,29 @@ MEDIA_URL = '/media/'
 # Caminho no sistema de arquivos onde os uploads serão salvos
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# --- EXPORTAÇÕES EM SEGUNDO PLANO (APP/tarefas.py) ---
+# Threads que geram exportações ao mesmo tempo, por processo
+EXPORTACAO_WORKERS = 2
+# Arquivos gerados ficam em MEDIA_ROOT/exportacoes/ por este tempo
+EXPORTACAO_RETENCAO_HORAS = 24
+# Intervalo (segundos) do sinal de vida dos jobs em andamento; um job sem
+# sinal por 4 intervalos é considerado interrompido
+EXPORTACAO_BATIMENTO = 30
+# Cache dos arquivos exportados (APP/cache_exportacoes.py) e seu tamanho máximo
+EXPORTACAO_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'exportacoes')
+EXPORTACAO_CACHE_LIMITE = 500 * 1024 * 1024
+
+# --- COMPRESSÃO DE RESPOSTAS (APP/compressao.py) ---
+# Respostas destes tipos e com ao menos este tamanho (bytes) são comprimidas
+# com Brotli ou gzip, conforme o Accept-Encoding do cliente. O Brotli só vale
+# para os tipos com preenchimento contra BREACH (PREENCHIMENTOS); os demais vão com gzip
+COMPRESSAO_TIPOS = ('text/html', 'application/json')
+COMPRESSAO_TAMANHO_MINIMO = 1024
+# Nível do Brotli nas respostas (0-11): 5 comprime melhor que o gzip e ainda é rápido
+COMPRESSAO_BROTLI_QUALIDADE = 5
+# Iterações do zopfli nos estáticos (só no collectstatic)
+COMPRESSAO_ZOPFLI_ITERACOES = 15
+
 # --- CONFIGURAÇÕES DE AUTENTICAÇÃO ---
 LOGIN_REDIRECT_URL = '/' # Para onde ir após o login (página inicial)
 # ALTERADO: Para onde ir após o logout (página de login)
@@ -151,6 +186,19 @@ LOGOUT_REDIRECT_URL = 'login'
 LOGIN_URL = 'login' # O nome da URL de login
 
 # --- CONFIGURAÇÕES DA API REST ---
+# JSON rápido (APP/renderizadores.py, orjson se instalado): escolhido por
+# requisição com ?format=json-rapido; com True vira o padrão de toda a API.
+# Decimais saem como texto exato ("1234.50") em vez de número.
+API_JSON_RAPIDO_PADRAO = False
+
+RENDERIZADORES_JSON = [
+    'rest_framework.renderers.JSONRenderer',
+    'APP.renderizadores.JSONRapidoRenderer',
+]
+if API_JSON_RAPIDO_PADRAO:
+    # O primeiro da lista atende Accept: application/json e */*
+    RENDERIZADORES_JSON.reverse()
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -167,13 +215,21 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        *RENDERIZADORES_JSON,
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
     'DATE_FORMAT': '%Y-%m-%d',
 }
 
+# Feed /api/v1/changes/: só entrega alterações mais antigas que este atraso
+# (segundos), para não passar por transações ainda não confirmadas
+CHANGES_ATRASO_SEGUNDOS = 5
+
+# Endpoints em lote (/api/v1/receitas/lote/ e /api/v1/despesas/lote/):
+# máximo de itens por requisição
+API_LOTE_MAXIMO = 1000
+
 # --- CONFIGURAÇÕES DO SWAGGER ---
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {